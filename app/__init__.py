@@ -2,6 +2,16 @@
 Iris classifier API package.
 """
 
-from app.models import PredictionRequest, PredictionResponse
+from app.models import (
+    BatchPredictionRequest,
+    BatchPredictionResponse,
+    PredictionRequest,
+    PredictionResponse,
+)
 
-__all__ = ["PredictionRequest", "PredictionResponse"]
+__all__ = [
+    "BatchPredictionRequest",
+    "BatchPredictionResponse",
+    "PredictionRequest",
+    "PredictionResponse",
+]
@@ -0,0 +1,229 @@
+"""
+Admission control of the prediction routes.
+
+At most ``max_in_flight`` prediction requests are handled at once. Up to
+``max_queue`` more wait, first come first served, for at most
+``queue_timeout`` seconds or until their deadline. Anything beyond is
+rejected straight away with ``Retry-After``: 429 when the queue is full,
+503 when a request waited too long or its deadline passed. Latency of
+accepted requests hence stays bounded under overload, and the health
+endpoints, which are not admission-controlled, keep answering probes.
+
+Clients may send a time budget in milliseconds in
+``ModelConfig.DEADLINE_HEADER``. It is checked when the request is
+admitted and again right before inference, so work nobody waits for
+anymore is dropped.
+"""
+
+import asyncio
+import contextvars
+import time
+from collections import deque
+from typing import Deque, Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_QUEUE_WAIT,
+    ADMISSION_REJECTIONS,
+)
+from model.config import ModelConfig
+
+# Deadline of the request handled by the current task, perf_counter based
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+
+class AdmissionRejectedError(RuntimeError):
+    """Raised when a request is not admitted, or past its deadline."""
+
+    def __init__(self, reason: str, status_code: int, detail: str):
+        """Initialize the error with the rejection reason label and status."""
+        super().__init__(detail)
+        self.reason = reason
+        self.status_code = status_code
+
+
+def parse_deadline(value: Optional[str], now: float) -> Optional[float]:
+    """
+    Turn the time budget a client sent into a deadline.
+
+    Args:
+        value: Header value in milliseconds, None if not sent
+        now: Arrival time of the request (``perf_counter``)
+
+    Returns:
+        Deadline, None without a valid budget
+    """
+    if not value:
+        return None
+    try:
+        budget = float(value)
+    except ValueError:
+        return None
+    if budget != budget or budget < 0:
+        return None
+    return now + budget / 1000
+
+
+def _rejection(reason: str, status_code: int, detail: str) -> AdmissionRejectedError:
+    """Count a rejection and build its error."""
+    ADMISSION_REJECTIONS.labels(reason).inc()
+    return AdmissionRejectedError(reason, status_code, detail)
+
+
+def check_deadline() -> None:
+    """
+    Drop the current request if its deadline has passed.
+
+    Raises:
+        AdmissionRejectedError: If the deadline of the request has passed
+    """
+    deadline = _deadline.get()
+    if deadline is not None and time.perf_counter() > deadline:
+        raise _rejection("deadline", 503, "Request deadline exceeded before inference")
+
+
+class AdmissionController:
+    """Bounds the requests in flight, with a bounded FIFO wait queue."""
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float):
+        """
+        Initialize the controller.
+
+        Args:
+            max_in_flight: Requests handled at once
+            max_queue: Requests waiting for a slot at most
+            queue_timeout: Seconds a request waits for a slot at most
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        """Number of requests waiting for a slot."""
+        return len(self._waiters)
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        """Give up the place of a request in the queue."""
+        waiter.cancel()
+        self._waiters.remove(waiter)
+        ADMISSION_QUEUE_DEPTH.dec()
+
+    async def acquire(self, deadline: Optional[float] = None) -> None:
+        """
+        Wait for a slot, which must be given back with ``release``.
+
+        Args:
+            deadline: ``perf_counter`` time after which the request is dropped
+
+        Raises:
+            AdmissionRejectedError: If the queue is full, the wait timed out
+                or the deadline passed
+        """
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            ADMISSION_IN_FLIGHT.inc()
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise _rejection("queue_full", 429, "Too many requests, try again later")
+
+        start = time.perf_counter()
+        timeout = self.queue_timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline - start)
+        if timeout <= 0:
+            raise _rejection("deadline", 503, "Request deadline exceeded while queued")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        ADMISSION_QUEUE_DEPTH.inc()
+        try:
+            await asyncio.wait((waiter,), timeout=timeout)
+        except BaseException:
+            # Cancelled while waiting, e.g. as the client went away
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._abandon(waiter)
+            raise
+        ADMISSION_QUEUE_WAIT.observe(time.perf_counter() - start)
+        if waiter.done():
+            # The slot of a finished request was handed over
+            return
+
+        self._abandon(waiter)
+        if deadline is not None and time.perf_counter() >= deadline:
+            raise _rejection("deadline", 503, "Request deadline exceeded while queued")
+        raise _rejection("queue_timeout", 503, "Server overloaded, try again later")
+
+    def release(self) -> None:
+        """Hand the slot of a finished request to the next waiting one."""
+        if self._waiters:
+            waiter = self._waiters.popleft()
+            ADMISSION_QUEUE_DEPTH.dec()
+            waiter.set_result(None)
+            return
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.dec()
+
+
+def is_admission_controlled(path: str) -> bool:
+    """Whether a request path is a prediction route."""
+    return path.startswith("/api/v1/predict") or (
+        path.startswith("/api/v1/models/") and path.endswith("/predict")
+    )
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying admission control to the prediction routes.
+
+    The slot is held until the response is fully sent, streamed responses
+    included.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        """Wrap an ASGI app."""
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Admit, queue or reject a request."""
+        if scope["type"] != "http" or not is_admission_controlled(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        now = time.perf_counter()
+        header = ModelConfig.DEADLINE_HEADER.lower().encode()
+        value = next(
+            (v.decode("latin-1") for k, v in scope["headers"] if k == header), None
+        )
+        deadline = parse_deadline(value, now)
+        try:
+            await self.controller.acquire(deadline)
+        except AdmissionRejectedError as e:
+            await rejection_response(e)(scope, receive, send)
+            return
+
+        token = _deadline.set(deadline)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
+            self.controller.release()
+
+
+def rejection_response(error: AdmissionRejectedError) -> JSONResponse:
+    """Response rejecting a request, telling the client when to retry."""
+    return JSONResponse(
+        status_code=error.status_code,
+        content={"detail": str(error)},
+        headers={"Retry-After": str(ModelConfig.ADMISSION_RETRY_AFTER_SECONDS)},
+    )
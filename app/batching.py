@@ -0,0 +1,129 @@
+"""
+Adaptive micro-batching of concurrent single-row prediction requests.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.metrics import MICRO_BATCH_QUEUE_WAIT, MICRO_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+PredictionResult = Tuple[int, str, List[float]]
+PredictBatchFn = Callable[
+    [List[Dict[str, float]]], Awaitable[Tuple[str, List[PredictionResult]]]
+]
+
+
+class MicroBatcher:
+    """Coalesces concurrent prediction requests into vectorized model calls.
+
+    Requests are queued and scored together once ``max_batch_size`` rows are
+    pending or ``window_ms`` has elapsed since the first row of the batch.
+
+    With ``adaptive`` (the default) the window is only waited for when the
+    previous batch coalesced more than one request, so an idle service adds
+    no latency. The trade-off is that a batch of one switches the window off
+    until requests pile up on their own, which rarely happens when inference
+    takes well under a millisecond. Disable ``adaptive`` to always wait for
+    the full window and coalesce more aggressively.
+    """
+
+    def __init__(
+        self,
+        predict_batch: PredictBatchFn,
+        window_ms: float = 2.0,
+        max_batch_size: int = 64,
+        adaptive: bool = True,
+    ):
+        """Initialize the micro-batcher."""
+        self._predict_batch = predict_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.adaptive = adaptive
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_batch_size = 0
+
+    def _ensure_started(self) -> None:
+        """Start the batching task on the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._task = loop.create_task(self._run())
+
+    async def submit(
+        self, features: Dict[str, float]
+    ) -> Tuple[str, PredictionResult]:
+        """Queue a single row and wait for its model version and prediction."""
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._queue.put_nowait((features, future, time.perf_counter()))
+        return await future
+
+    async def stop(self) -> None:
+        """Stop the batching task, failing any requests queued or in flight."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped"))
+        self._task = None
+
+    async def _run(self) -> None:
+        """Collect queued requests into batches and score them."""
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.window
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - self._loop.time()
+                if timeout <= 0 or (self.adaptive and self._last_batch_size <= 1):
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Dict[str, float], Any, float]]) -> None:
+        """Score a batch and resolve each caller's future with its own row."""
+        now = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            MICRO_BATCH_QUEUE_WAIT.observe(now - enqueued_at)
+        MICRO_BATCH_SIZE.observe(len(batch))
+        self._last_batch_size = len(batch)
+
+        try:
+            version, results = await self._predict_batch(
+                [features for features, _, _ in batch]
+            )
+        except asyncio.CancelledError:
+            # Stopped while scoring, do not leave the callers waiting
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Micro-batcher stopped"))
+            raise
+        except Exception as e:
+            logger.error(f"Error scoring micro-batch: {str(e)}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result((version, result))
@@ -0,0 +1,183 @@
+"""
+Binary request and response formats for high-volume scoring.
+
+Producers holding feature matrices as NumPy or Arrow buffers can send them
+as-is instead of encoding every value as JSON:
+
+- ``application/octet-stream``: little-endian float64 rows (float32 with the
+  ``dtype=float32`` media type parameter) in ``ModelConfig.FEATURE_NAMES``
+  order. The response holds one row per input row in the same dtype: the
+  predicted class followed by the class probabilities. Rows with invalid
+  measurements get class -1 and NaN probabilities.
+- ``application/vnd.apache.arrow.stream``: Arrow IPC stream of record
+  batches with one column per feature. The response is an Arrow IPC stream
+  with ``prediction``, ``prediction_label``, one ``probability_{label}``
+  column per class and ``error``. Requires pyarrow.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.utils import ModelLoader
+from model.config import ModelConfig
+
+BINARY_MEDIA_TYPE = "application/octet-stream"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+BINARY_DTYPES = {"float32": np.dtype("<f4"), "float64": np.dtype("<f8")}
+INVALID_ROW_ERROR = "Measurements must be finite and positive"
+
+
+class BinaryFormatError(ValueError):
+    """Raised when a binary request body cannot be decoded."""
+
+
+class BinaryFormatUnavailableError(BinaryFormatError):
+    """Raised when a format needs an optional dependency that is missing."""
+
+
+def parse_media_type(content_type: str) -> Tuple[str, Dict[str, str]]:
+    """Split a Content-Type header into the media type and its parameters."""
+    media_type, *params = content_type.split(";")
+    parameters = {}
+    for param in params:
+        name, _, value = param.partition("=")
+        parameters[name.strip().lower()] = value.strip().strip('"')
+    return media_type.strip().lower(), parameters
+
+
+def binary_dtype(parameters: Dict[str, str]) -> np.dtype:
+    """Resolve the float dtype of an octet-stream body from its parameters."""
+    name = parameters.get("dtype", "float64")
+    if name not in BINARY_DTYPES:
+        raise BinaryFormatError(
+            f"Unsupported dtype: {name}, expected float32 or float64"
+        )
+    return BINARY_DTYPES[name]
+
+
+def decode_binary(body: bytes, dtype: np.dtype) -> np.ndarray:
+    """
+    View a raw little-endian float body as an N x F feature matrix.
+
+    The matrix is a read-only view of the body, no values are copied.
+
+    Raises:
+        BinaryFormatError: If the body is not a whole number of rows
+    """
+    row_bytes = dtype.itemsize * len(ModelConfig.FEATURE_NAMES)
+    if not body or len(body) % row_bytes:
+        raise BinaryFormatError(
+            f"Body must hold whole rows of {len(ModelConfig.FEATURE_NAMES)} "
+            f"{dtype.name} values ({row_bytes} bytes per row)"
+        )
+    X = np.frombuffer(body, dtype=dtype)
+    return X.reshape(-1, len(ModelConfig.FEATURE_NAMES))
+
+
+def encode_binary(
+    predictions: np.ndarray, probabilities: Optional[np.ndarray], dtype: np.dtype
+) -> bytes:
+    """Encode predicted classes and probabilities as rows of ``dtype`` values."""
+    n_classes = len(ModelConfig.PREDICTION_LABELS)
+    output = np.full((len(predictions), 1 + n_classes), np.nan, dtype=dtype)
+    output[:, 0] = predictions
+    if probabilities is not None:
+        output[:, 1 : 1 + probabilities.shape[1]] = probabilities
+    return output.tobytes()
+
+
+def _require_pyarrow():
+    """Import pyarrow, which the Arrow format needs."""
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        raise BinaryFormatUnavailableError(
+            "Arrow IPC requires pyarrow to be installed"
+        )
+    return pa
+
+
+def decode_arrow(body: bytes) -> np.ndarray:
+    """
+    Read an Arrow IPC stream into an N x F feature matrix.
+
+    Feature columns without nulls are viewed without copying and gathered
+    into the matrix in one pass; nulls become NaN and fail validation.
+
+    Raises:
+        BinaryFormatError: If the stream is invalid or misses feature columns
+    """
+    pa = _require_pyarrow()
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    except pa.ArrowInvalid as e:
+        raise BinaryFormatError(f"Invalid Arrow IPC stream: {str(e)}")
+
+    missing = [
+        name for name in ModelConfig.FEATURE_NAMES if name not in table.column_names
+    ]
+    if missing:
+        raise BinaryFormatError(f"Missing feature columns: {', '.join(missing)}")
+
+    X = np.empty((table.num_rows, len(ModelConfig.FEATURE_NAMES)), dtype=np.float64)
+    for index, name in enumerate(ModelConfig.FEATURE_NAMES):
+        column = table.column(name).cast(pa.float64())
+        X[:, index] = column.to_numpy(zero_copy_only=False)
+    return X
+
+
+def encode_arrow(
+    predictions: np.ndarray, probabilities: Optional[np.ndarray]
+) -> bytes:
+    """Encode predictions as an Arrow IPC stream, invalid rows have class -1."""
+    pa = _require_pyarrow()
+    valid = predictions >= 0
+    columns = {
+        "prediction": pa.array(predictions, type=pa.int64()),
+        "prediction_label": pa.array(
+            [
+                ModelLoader.label_for(prediction) if prediction >= 0 else None
+                for prediction in predictions.tolist()
+            ],
+            type=pa.string(),
+        ),
+    }
+    for index, label in enumerate(ModelConfig.PREDICTION_LABELS):
+        values = (
+            probabilities[:, index]
+            if probabilities is not None and index < probabilities.shape[1]
+            else np.full(len(predictions), np.nan)
+        )
+        columns[f"probability_{label}"] = pa.array(values, type=pa.float64())
+    columns["error"] = pa.array(
+        [None if ok else INVALID_ROW_ERROR for ok in valid.tolist()], type=pa.string()
+    )
+    table = pa.table(columns)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def merge_results(
+    valid: np.ndarray, predictions: np.ndarray, probabilities: Optional[np.ndarray]
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Spread the results of the valid rows back over all input rows.
+
+    Returns:
+        Tuple of (classes with -1 for invalid rows, probabilities with NaN
+        for invalid rows or None)
+    """
+    if valid.all():
+        return np.asarray(predictions), probabilities
+    merged = np.full(len(valid), -1, dtype=np.int64)
+    merged[valid] = predictions
+    merged_probabilities = None
+    if probabilities is not None:
+        merged_probabilities = np.full((len(valid), probabilities.shape[1]), np.nan)
+        merged_probabilities[valid] = probabilities
+    return merged, merged_probabilities
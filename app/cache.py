@@ -0,0 +1,87 @@
+"""
+In-process LRU/TTL cache for prediction results.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Sequence, Tuple
+
+from app.metrics import (
+    PREDICTION_CACHE_EVICTIONS,
+    PREDICTION_CACHE_HITS,
+    PREDICTION_CACHE_MISSES,
+)
+
+
+class PredictionCache:
+    """Bounded prediction cache keyed by model version and feature values.
+
+    Entries are evicted least-recently-used first once ``max_size`` is
+    reached, and expire ``ttl_seconds`` after being stored (0 disables
+    expiry). When ``precision`` is set, feature values are rounded to that
+    many decimals before keying so near-identical measurements share an entry.
+    """
+
+    def __init__(
+        self, max_size: int, ttl_seconds: float = 0, precision: Optional[int] = None
+    ):
+        """Initialize the prediction cache."""
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.precision = precision
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, version: str, values: Sequence[float]) -> Tuple:
+        """Build the cache key for a row of feature values."""
+        if self.precision is not None:
+            return (version, *(round(float(v), self.precision) for v in values))
+        return (version, *(float(v) for v in values))
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for a key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if not self.ttl or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    PREDICTION_CACHE_HITS.inc()
+                    return value
+                del self._entries[key]
+                PREDICTION_CACHE_EVICTIONS.labels("expired").inc()
+        PREDICTION_CACHE_MISSES.inc()
+        return None
+
+    def get_many(
+        self, version: str, rows: Sequence[Sequence[float]]
+    ) -> Tuple[List[Tuple], List[Optional[Any]]]:
+        """
+        Look up several rows of feature values at once.
+
+        Returns:
+            Tuple of (cache keys, cached values or None), in row order
+        """
+        keys = [self.key(version, values) for values in rows]
+        return keys, [self.get(key) for key in keys]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries if full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                PREDICTION_CACHE_EVICTIONS.labels("size").inc()
+
+    def clear(self) -> None:
+        """Drop all entries, e.g. when the model is swapped."""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+        if count:
+            PREDICTION_CACHE_EVICTIONS.labels("invalidated").inc(count)
@@ -0,0 +1,270 @@
+"""
+Capture of the rows scored by the server, for incident analysis and replay.
+
+Every sampled inference call is appended to a bounded in-memory ring, with
+its model version and time, by reference: the feature rows, predictions
+and class probabilities are neither copied nor converted on the serving
+path, and must therefore not be mutated after they are recorded. Calls
+are sampled at ``sample_rate`` before anything is recorded.
+
+A background thread flushes the ring every ``flush_interval`` seconds, or
+as soon as it holds ``segment_rows`` rows, to columnar segment files:
+``.npz`` archives of one array per column, named so that they sort by
+time. The oldest segments are deleted beyond ``max_segments``. When the
+flusher falls behind, the oldest calls are dropped beyond ``capacity``
+rows, so capture never blocks serving nor grows its memory.
+"""
+
+import glob
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.metrics import CAPTURE_DROPPED_ROWS, CAPTURE_ROWS, CAPTURE_SEGMENTS
+from model.artifacts import write_atomic
+from model.config import ModelConfig
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "capture-"
+SEGMENT_SUFFIX = ".npz"
+
+# Columns of a segment, with one row per scored row
+ROW_COLUMNS = ("timestamp", "features", "prediction", "probabilities", "version")
+
+
+def list_segments(directory: str) -> List[str]:
+    """Paths of the segments of a capture directory, oldest first."""
+    pattern = os.path.join(directory, f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}")
+    return sorted(glob.glob(pattern))
+
+
+def read_segment(path: str) -> Dict[str, np.ndarray]:
+    """
+    Read a segment written by ``CaptureStore``.
+
+    Returns:
+        Dictionary of the ``ROW_COLUMNS`` arrays, plus ``versions``, the
+        model version of each ``version`` index, and ``feature_names``
+    """
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def _as_list(values: Any) -> list:
+    """Rows or values of an array or list, as a list."""
+    return values.tolist() if isinstance(values, np.ndarray) else values
+
+
+class CaptureStore:
+    """Buffers scored rows in memory and writes them out in segments."""
+
+    def __init__(
+        self,
+        directory: str,
+        capacity: int = 65536,
+        segment_rows: int = 8192,
+        flush_interval: float = 5.0,
+        max_segments: int = 100,
+        sample_rate: float = 1.0,
+    ):
+        """
+        Initialize the store, which captures nothing until started.
+
+        Args:
+            directory: Directory the segments are written to
+            capacity: Rows buffered at most, the oldest calls are dropped
+                beyond
+            segment_rows: Rows per segment, a flush is started as soon as
+                that many rows are buffered
+            flush_interval: Seconds between flushes at most
+            max_segments: Segments kept, 0 keeps all of them
+            sample_rate: Fraction of calls captured
+        """
+        self.directory = directory
+        self.capacity = capacity
+        self.segment_rows = segment_rows
+        self.flush_interval = flush_interval
+        self.max_segments = max_segments
+        self.sample_rate = sample_rate
+        # Calls as (time, version, features, predictions, probabilities)
+        self._calls: Deque[Tuple[float, str, Any, Any, Any]] = deque()
+        self._buffered = 0
+        self._sequence = 0
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    @property
+    def buffered(self) -> int:
+        """Rows buffered and not yet flushed."""
+        return self._buffered
+
+    def sample(self) -> bool:
+        """Whether to capture the current call, False until started."""
+        if self._thread is None:
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def record(
+        self,
+        version: str,
+        X: Any,
+        predictions: Any,
+        probabilities: Optional[Any] = None,
+    ) -> None:
+        """
+        Buffer the rows of a call that ``sample`` selected.
+
+        Args:
+            version: Version of the model that scored the rows
+            X: N x F feature matrix, or list of rows
+            predictions: Prediction class of each row
+            probabilities: N x C class probabilities, None if not available
+        """
+        dropped = 0
+        with self._lock:
+            self._calls.append((time.time(), version, X, predictions, probabilities))
+            self._buffered += len(predictions)
+            while self._buffered > self.capacity:
+                rows = len(self._calls.popleft()[3])
+                self._buffered -= rows
+                dropped += rows
+            if self._buffered >= self.segment_rows and not self._wake.is_set():
+                self._wake.set()
+        if dropped:
+            CAPTURE_DROPPED_ROWS.inc(dropped)
+
+    def start(self) -> None:
+        """Start capturing, and the thread flushing the buffer."""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name="capture-flusher", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Capturing scored rows to {self.directory}")
+
+    def stop(self) -> None:
+        """Stop capturing and flush the rows still buffered."""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        thread.join()
+        self.flush()
+
+    def _run(self) -> None:
+        """Flush the buffer periodically and whenever a segment is full."""
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Serving goes on, the rows are dropped beyond the capacity
+                logger.error(f"Error writing capture segment: {str(e)}")
+
+    def flush(self) -> List[str]:
+        """
+        Write the buffered rows out, in segments of ``segment_rows`` at most.
+
+        Returns:
+            Paths of the segments written
+        """
+        paths = []
+        with self._flush_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            while True:
+                columns = self._take()
+                if columns is None:
+                    break
+                paths.append(self._write(columns))
+            self._rotate()
+        return paths
+
+    def _take(self) -> Optional[Dict[str, np.ndarray]]:
+        """Take the oldest calls, up to ``segment_rows`` rows, as columns."""
+        calls = []
+        rows = 0
+        with self._lock:
+            while self._calls and (
+                not calls or rows + len(self._calls[0][3]) <= self.segment_rows
+            ):
+                calls.append(self._calls.popleft())
+                rows += len(calls[-1][3])
+            self._buffered -= rows
+        if not calls:
+            return None
+
+        # Converted a segment at a time, off the serving path
+        timestamps: List[float] = []
+        features: list = []
+        predictions: list = []
+        probabilities: list = []
+        versions: List[int] = []
+        version_ids: Dict[str, int] = {}
+        missing = [math.nan] * len(ModelConfig.PREDICTION_LABELS)
+        for now, version, X, call_predictions, call_probabilities in calls:
+            count = len(call_predictions)
+            timestamps.extend([now] * count)
+            version_id = version_ids.setdefault(version, len(version_ids))
+            versions.extend([version_id] * count)
+            features.extend(_as_list(X))
+            predictions.extend(_as_list(call_predictions))
+            if call_probabilities is None:
+                probabilities.extend([missing] * count)
+            else:
+                probabilities.extend(_as_list(call_probabilities))
+        return {
+            "timestamp": np.array(timestamps, dtype=np.float64),
+            "features": np.array(features, dtype=np.float64).reshape(
+                rows, len(ModelConfig.FEATURE_NAMES)
+            ),
+            "prediction": np.array(predictions, dtype=np.int64),
+            "probabilities": np.array(probabilities, dtype=np.float64),
+            "version": np.array(versions, dtype=np.int32),
+            "versions": np.array(list(version_ids), dtype=str),
+            "feature_names": np.array(ModelConfig.FEATURE_NAMES, dtype=str),
+        }
+
+    def _write(self, columns: Dict[str, np.ndarray]) -> str:
+        """Write a segment file, named after the time of its first row."""
+        self._sequence += 1
+        name = (
+            f"{SEGMENT_PREFIX}{int(columns['timestamp'][0] * 1000):013d}"
+            f"-{os.getpid()}-{self._sequence:06d}{SEGMENT_SUFFIX}"
+        )
+        path = os.path.join(self.directory, name)
+        try:
+            write_atomic(path, lambda f: np.savez(f, **columns))
+        except Exception:
+            CAPTURE_SEGMENTS.labels("error").inc()
+            raise
+        CAPTURE_SEGMENTS.labels("success").inc()
+        CAPTURE_ROWS.inc(len(columns["prediction"]))
+        return path
+
+    def _rotate(self) -> None:
+        """Delete the oldest segments beyond ``max_segments``."""
+        if self.max_segments <= 0:
+            return
+        segments = list_segments(self.directory)
+        for path in segments[: max(len(segments) - self.max_segments, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                # Deleted meanwhile, e.g. by another server process
+                pass
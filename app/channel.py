@@ -0,0 +1,226 @@
+"""
+Persistent WebSocket prediction channel for high-rate clients.
+
+Each message carries one row and a client-chosen correlation ID::
+
+    {"id": "42", "features": {"sepal_length": 5.1, ...}}
+
+Messages are pipelined: clients send without waiting for responses. Rows
+that arrive while the channel is busy are scored together with one
+vectorized model call, and each response is sent as soon as its group is
+scored, tagged with the ID of its request, so responses may come back out of
+order::
+
+    {"id": "42", "prediction": 0, "prediction_label": "setosa", ...}
+    {"id": "43", "error": "features.petal_width: Field required"}
+
+At most ``max_in_flight`` rows per connection are read and not yet
+answered. Beyond that the channel stops reading, so a client sending faster
+than it is served is slowed down by TCP backpressure instead of growing the
+server's memory.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+import numpy as np
+from pydantic import ValidationError
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from app.codec import dumps, loads, validation_detail
+from app.metrics import (
+    INFERENCE_COUNT,
+    INFERENCE_LATENCY,
+    INFERENCE_PREDICTION_DISTRIBUTION,
+    WEBSOCKET_CONNECTIONS,
+    WEBSOCKET_FLOW_CONTROL_WAITS,
+    WEBSOCKET_GROUP_SIZE,
+    WEBSOCKET_MESSAGES,
+)
+from app.models import PredictionRequest
+from app.utils import ModelLoader
+from model.config import ModelConfig
+
+logger = logging.getLogger(__name__)
+
+PredictArrayFn = Callable[
+    [np.ndarray], Awaitable[Tuple[str, np.ndarray, Optional[np.ndarray]]]
+]
+
+
+def parse_message(data: Any) -> Tuple[Any, Optional[List[float]], Optional[str]]:
+    """
+    Decode and validate a prediction message.
+
+    Args:
+        data: Text or bytes of a WebSocket message
+
+    Returns:
+        Tuple of (correlation ID, feature values in model order or None,
+        error detail or None)
+    """
+    try:
+        message = loads(data)
+    except ValueError as e:
+        return None, None, f"Invalid JSON: {str(e)}"
+    if not isinstance(message, dict) or "id" not in message:
+        return None, None, "Message must be an object with an id and features"
+
+    # Valid rows are checked with plain comparisons, like single-row requests
+    features = message.get("features")
+    try:
+        values = [features[name] for name in ModelConfig.FEATURE_NAMES]
+    except (KeyError, TypeError):
+        values = None
+    if values is not None and all(
+        type(value) in (float, int) and 0 < value < math.inf for value in values
+    ):
+        return message["id"], values, None
+
+    # Let the model coerce the row or describe what is wrong with it
+    try:
+        row = PredictionRequest.model_validate(features)
+    except ValidationError as e:
+        return message["id"], None, f"features: {validation_detail(e)}"
+    values = [getattr(row, name) for name in ModelConfig.FEATURE_NAMES]
+    return message["id"], values, None
+
+
+class PredictionChannel:
+    """Serves pipelined prediction messages of one WebSocket connection."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        predict_array: PredictArrayFn,
+        max_in_flight: int = 256,
+        max_group_size: int = 64,
+    ):
+        """
+        Initialize the channel of an accepted connection.
+
+        Args:
+            websocket: Accepted WebSocket
+            predict_array: Coroutine scoring a feature matrix
+            max_in_flight: Rows read and not yet answered at most
+            max_group_size: Rows scored per model call at most
+        """
+        self.websocket = websocket
+        self._predict_array = predict_array
+        self.max_group_size = max_group_size
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._send_lock = asyncio.Lock()
+        self._pending: List[Tuple[Any, List[float]]] = []
+        self._arrived = asyncio.Event()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def run(self) -> None:
+        """Read and answer messages until the client disconnects."""
+        WEBSOCKET_CONNECTIONS.inc()
+        collector = asyncio.get_running_loop().create_task(self._collect())
+        try:
+            while True:
+                if self._slots.locked():
+                    WEBSOCKET_FLOW_CONTROL_WAITS.inc()
+                await self._slots.acquire()
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                data = message.get("text")
+                if data is None:
+                    data = message.get("bytes", b"")
+                request_id, values, error = parse_message(data)
+                if error is not None:
+                    WEBSOCKET_MESSAGES.labels("error").inc()
+                    await self._send([{"id": request_id, "error": error}])
+                    self._slots.release()
+                    continue
+                self._pending.append((request_id, values))
+                self._arrived.set()
+        except (WebSocketDisconnect, OSError):
+            pass
+        finally:
+            # Nobody is left to answer
+            collector.cancel()
+            for task in list(self._tasks):
+                task.cancel()
+            WEBSOCKET_CONNECTIONS.dec()
+
+    async def _collect(self) -> None:
+        """Start scoring groups of the rows received meanwhile."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._arrived.wait()
+            # Let the reader take in the messages already received, until it
+            # waits for more input or for a slot
+            count = 0
+            while count < len(self._pending) < self.max_group_size:
+                count = len(self._pending)
+                await asyncio.sleep(0)
+            group = self._pending[: self.max_group_size]
+            del self._pending[: self.max_group_size]
+            if not self._pending:
+                self._arrived.clear()
+            task = loop.create_task(self._score(group))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, group: List[Tuple[Any, List[float]]]) -> None:
+        """Score a group of rows with one model call and answer each row."""
+        WEBSOCKET_GROUP_SIZE.observe(len(group))
+        try:
+            X = np.array([values for _, values in group], dtype=np.float64)
+            start = time.perf_counter()
+            try:
+                version, predictions, probabilities = await self._predict_array(X)
+            except Exception as e:
+                logger.error(f"Error scoring WebSocket predictions: {str(e)}")
+                INFERENCE_COUNT.labels("unknown", "error").inc(len(group))
+                WEBSOCKET_MESSAGES.labels("error").inc(len(group))
+                error = f"Error making prediction: {str(e)}"
+                await self._send(
+                    [{"id": request_id, "error": error} for request_id, _ in group]
+                )
+                return
+            INFERENCE_LATENCY.labels(version).observe(time.perf_counter() - start)
+            INFERENCE_COUNT.labels(version, "success").inc(len(group))
+            WEBSOCKET_MESSAGES.labels("success").inc(len(group))
+
+            labels = [ModelLoader.label_for(int(p)) for p in predictions]
+            probabilities = (
+                probabilities.tolist()
+                if probabilities is not None
+                else [None] * len(group)
+            )
+            for label, count in Counter(labels).items():
+                INFERENCE_PREDICTION_DISTRIBUTION.labels(label).inc(count)
+            await self._send(
+                [
+                    {
+                        "id": request_id,
+                        "prediction": prediction,
+                        "prediction_label": label,
+                        "model_version": version,
+                        "probabilities": row_probabilities,
+                    }
+                    for (request_id, _), prediction, label, row_probabilities in zip(
+                        group, predictions.tolist(), labels, probabilities
+                    )
+                ]
+            )
+        except (WebSocketDisconnect, RuntimeError, OSError):
+            # The client went away while its rows were scored
+            pass
+        finally:
+            for _ in group:
+                self._slots.release()
+
+    async def _send(self, responses: List[dict]) -> None:
+        """Send responses, one message each, without interleaving groups."""
+        async with self._send_lock:
+            for response in responses:
+                await self.websocket.send_text(dumps(response).decode())
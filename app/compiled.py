@@ -0,0 +1,167 @@
+"""
+Compiled NumPy inference for linear classification pipelines.
+
+A ``StandardScaler -> LogisticRegression`` pipeline is an affine map followed
+by a link function, so the scaler statistics can be folded into the
+classifier coefficients at load time and evaluated with a single matrix
+product, bypassing sklearn's per-call validation and dispatch.
+"""
+
+import os
+import tempfile
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from model.artifacts import OVR, SOFTMAX, linear_arrays
+
+
+class CompiledPipeline:
+    """Precomputed affine map plus link function for a linear classifier."""
+
+    def __init__(
+        self,
+        weights: np.ndarray,
+        bias: np.ndarray,
+        classes: np.ndarray,
+        link: str,
+        dtype: Any = np.float64,
+    ):
+        """Initialize the compiled pipeline.
+
+        Args:
+            weights: Folded coefficients of shape (n_features, n_outputs)
+            bias: Folded intercepts of shape (n_outputs,)
+            classes: Class values, in probability column order
+            link: Either ``"softmax"`` or ``"ovr"`` (normalized sigmoid)
+            dtype: Floating point type used for evaluation
+        """
+        self.dtype = np.dtype(dtype)
+        self.weights = np.ascontiguousarray(weights, dtype=self.dtype)
+        self.bias = np.ascontiguousarray(bias, dtype=self.dtype)
+        self.classes_ = np.asarray(classes)
+        self.link = link
+        self.n_features = self.weights.shape[0]
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """Evaluate the folded affine map.
+
+        Raises:
+            ValueError: If ``X`` contains NaN or infinity, as sklearn would
+        """
+        X = np.asarray(X, dtype=self.dtype)
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN or infinity")
+        return X @ self.weights + self.bias
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Return class probabilities, matching the sklearn pipeline."""
+        z = self.decision_function(X)
+        if self.link == SOFTMAX:
+            z -= z.max(axis=1, keepdims=True)
+            np.exp(z, out=z)
+            z /= z.sum(axis=1, keepdims=True)
+            return z
+
+        # Numerically stable logistic sigmoid
+        prob = 0.5 * (1.0 + np.tanh(0.5 * z))
+        if prob.shape[1] == 1:
+            return np.hstack([1.0 - prob, prob])
+        prob_sum = prob.sum(axis=1, keepdims=True)
+        prob_sum[prob_sum == 0] = 1.0
+        return prob / prob_sum
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Return predicted classes."""
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def _save_array(path: str, array: np.ndarray) -> None:
+    """Write an .npy file atomically, so readers never map a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def map_compiled(
+    compiled: CompiledPipeline, prefix: str, mmap_mode: str = "r"
+) -> CompiledPipeline:
+    """
+    Serve the folded weights of a compiled pipeline from memory-mapped files.
+
+    Folding the scaler into the coefficients produces new arrays, so mapping
+    the pickled pipeline alone leaves every process with a private copy of
+    the weights it actually evaluates. The folded arrays are written next to
+    the artifact once (``{prefix}.{dtype}.weights.npy`` and ``.bias.npy``)
+    and mapped, so all processes serving the artifact share them through the
+    page cache.
+
+    Args:
+        compiled: Compiled pipeline with in-memory weights
+        prefix: Path prefix of the array files, e.g. the artifact path
+        mmap_mode: ``numpy.load`` memory-map mode
+
+    Returns:
+        Compiled pipeline whose weights and bias are memory-mapped
+    """
+    arrays = {}
+    for name in ("weights", "bias"):
+        path = f"{prefix}.{compiled.dtype.name}.{name}.npy"
+        if not os.path.exists(path):
+            _save_array(path, getattr(compiled, name))
+        arrays[name] = np.load(path, mmap_mode=mmap_mode)
+        if not np.array_equal(arrays[name], getattr(compiled, name)):
+            # Stale file from an artifact rewritten in place
+            _save_array(path, getattr(compiled, name))
+            arrays[name] = np.load(path, mmap_mode=mmap_mode)
+    return CompiledPipeline(
+        arrays["weights"],
+        arrays["bias"],
+        compiled.classes_,
+        compiled.link,
+        dtype=compiled.dtype,
+    )
+
+
+def compile_arrays(
+    arrays: Dict[str, np.ndarray], link: str, dtype: Any = np.float64
+) -> CompiledPipeline:
+    """
+    Compile the parameters returned by ``linear_arrays``.
+
+    Args:
+        arrays: Scaler statistics, coefficients, intercepts and classes
+        link: Link function of the classifier
+        dtype: Floating point type used for evaluation
+
+    Returns:
+        Compiled pipeline
+    """
+    # Fold (x - mean) / scale into the coefficients:
+    #   z = x @ (coef / scale).T + (intercept - coef @ (mean / scale))
+    weights = np.asarray(arrays["coef"], dtype=np.float64) / arrays["scale"]
+    bias = arrays["intercept"] - weights @ arrays["mean"]
+    return CompiledPipeline(weights.T, bias, arrays["classes"], link, dtype=dtype)
+
+
+def compile_pipeline(model: Any, dtype: Any = np.float64) -> Optional[CompiledPipeline]:
+    """
+    Compile a fitted ``StandardScaler -> linear classifier`` pipeline.
+
+    Args:
+        model: Fitted sklearn estimator or pipeline
+        dtype: Floating point type used for evaluation
+
+    Returns:
+        Compiled pipeline, or None if the model is not supported
+    """
+    extracted = linear_arrays(model)
+    if extracted is None:
+        return None
+    arrays, link = extracted
+    return compile_arrays(arrays, link, dtype=dtype)
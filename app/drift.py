@@ -0,0 +1,267 @@
+"""
+Online drift monitoring of the rows the served model scores.
+
+Scored rows and their predictions are buffered and folded into the
+statistics of ``model.drift`` a buffer at a time, so the cost per
+prediction is a list append and memory does not grow with traffic. Means,
+standard deviations and quantiles cover every row scored since the model
+was loaded. The PSI against the reference statistics of the model is
+computed over exponentially decayed bin counts, with a half-life of
+``half_life_rows`` rows, so it follows recent traffic.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.metrics import (
+    DRIFT_OBSERVED_ROWS,
+    DRIFT_PSI,
+    FEATURE_MEAN,
+    FEATURE_QUANTILE,
+    FEATURE_STDDEV,
+    PREDICTION_DRIFT_PSI,
+    multiprocess_enabled,
+)
+from model.drift import (
+    QUANTILES,
+    FeatureStatistics,
+    population_stability_index,
+    sketch_parameters,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _value(value: float, count: int) -> Optional[float]:
+    """A statistic as JSON, None before any row was observed."""
+    return float(value) if count else None
+
+
+class DriftMonitor:
+    """Tracks feature and prediction statistics against a model's reference."""
+
+    def __init__(
+        self,
+        feature_names: Sequence[str],
+        buffer_rows: int = 256,
+        half_life_rows: float = 10000,
+        min_rows: int = 100,
+        psi_threshold: float = 0.2,
+    ):
+        """
+        Initialize the monitor.
+
+        Args:
+            feature_names: Names of the feature columns, in model order
+            buffer_rows: Rows buffered between statistics updates
+            half_life_rows: Rows after which the weight of a row in the PSI halves
+            min_rows: Decayed rows needed before a PSI is reported
+            psi_threshold: PSI above which a feature is reported as drifted
+        """
+        self.feature_names: List[str] = list(feature_names)
+        self.buffer_rows = buffer_rows
+        self.half_life_rows = half_life_rows
+        self.min_rows = min_rows
+        self.psi_threshold = psi_threshold
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(
+        self, version: str = "none", reference: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Start over, comparing against the reference of a model version.
+
+        Args:
+            version: Version of the served model
+            reference: Reference statistics saved in its metadata, if any
+        """
+        with self._lock:
+            self.version = version
+            self.statistics = FeatureStatistics(len(self.feature_names))
+            # Plain lists, appending to them costs less than writing to arrays
+            self._rows: List[Sequence[float]] = []
+            self._predictions: List[int] = []
+            self._weight = 0.0
+            self._edges: Optional[List[np.ndarray]] = None
+            self._bin_counts: List[np.ndarray] = []
+            self._classes = np.empty(0, dtype=np.int64)
+            self._expected_predictions = np.empty(0)
+            self._prediction_counts = np.zeros(1)
+            self.reference = reference
+            if reference is None:
+                return
+            if reference.get("sketch") != sketch_parameters() or set(
+                reference.get("features", {})
+            ) != set(self.feature_names):
+                logger.warning(
+                    f"Reference statistics of model {version} do not match the "
+                    f"drift monitor, drift is not computed"
+                )
+                self.reference = None
+                return
+            features = reference["features"]
+            self._edges = [
+                np.asarray(features[name]["psi_edges"], dtype=np.intp)
+                for name in self.feature_names
+            ]
+            self._bin_counts = [np.zeros(len(edges) + 1) for edges in self._edges]
+            predictions = reference.get("predictions", {})
+            self._classes = np.array(sorted(int(c) for c in predictions))
+            self._expected_predictions = np.array(
+                [predictions[str(c)] for c in self._classes.tolist()] + [0.0]
+            )
+            # One count per reference class, plus one for any other class
+            self._prediction_counts = np.zeros(len(self._classes) + 1)
+
+    def observe_row(self, values: Sequence[float], prediction: int) -> None:
+        """Add a scored row, in ``feature_names`` order."""
+        with self._lock:
+            self._rows.append(values)
+            self._predictions.append(prediction)
+            if len(self._rows) >= self.buffer_rows:
+                self._flush()
+
+    def observe(self, X: np.ndarray, predictions: np.ndarray) -> None:
+        """Add scored rows of an N x F matrix."""
+        with self._lock:
+            if len(X) >= self.buffer_rows:
+                self._flush()
+                self._update(np.asarray(X, dtype=np.float64), np.asarray(predictions))
+                return
+            self._rows.extend(np.asarray(X).tolist())
+            self._predictions.extend(np.asarray(predictions).tolist())
+            if len(self._rows) >= self.buffer_rows:
+                self._flush()
+
+    def flush(self) -> None:
+        """Fold the buffered rows into the statistics."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        """Fold the buffered rows into the statistics, holding the lock."""
+        if self._rows:
+            X = np.array(self._rows, dtype=np.float64)
+            predictions = np.array(self._predictions, dtype=np.int64)
+            self._rows, self._predictions = [], []
+            self._update(X, predictions)
+
+    def _update(self, X: np.ndarray, predictions: np.ndarray) -> None:
+        """Update the statistics with scored rows, holding the lock."""
+        indices = self.statistics.update(X)
+        DRIFT_OBSERVED_ROWS.inc(len(X))
+        if self._edges is not None:
+            self._update_recent(indices, predictions)
+        # In multiprocess mode any process may be scraped, so every process
+        # publishes its gauges with each update rather than when scraped
+        if multiprocess_enabled():
+            self._publish(self._summarize())
+
+    def _update_recent(self, indices: np.ndarray, predictions: np.ndarray) -> None:
+        """Decay the recent bin and prediction counts and add scored rows."""
+        decay = 0.5 ** (len(indices) / self.half_life_rows)
+        self._weight = self._weight * decay + len(indices)
+        for feature, edges in enumerate(self._edges):
+            counts = self._bin_counts[feature]
+            counts *= decay
+            counts += np.bincount(
+                np.searchsorted(edges, indices[:, feature]), minlength=len(counts)
+            )
+        # Classes missing from the reference count in the last slot
+        slots = np.searchsorted(self._classes, predictions)
+        known = slots < len(self._classes)
+        known[known] = self._classes[slots[known]] == predictions[known]
+        slots[~known] = len(self._classes)
+        self._prediction_counts *= decay
+        self._prediction_counts += np.bincount(
+            slots, minlength=len(self._prediction_counts)
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Current statistics, including the buffered rows, also published as
+        metrics.
+
+        Returns:
+            Statistics of every feature and of the predictions, with the
+            PSI against the reference when one is available
+        """
+        with self._lock:
+            self._flush()
+            result = self._summarize()
+            self._publish(result)
+        return result
+
+    def _summarize(self) -> Dict[str, Any]:
+        """Current statistics, holding the lock."""
+        stats = self.statistics
+        quantiles = stats.quantiles()
+        enough = self._edges is not None and self._weight >= self.min_rows
+        features = {}
+        for index, name in enumerate(self.feature_names):
+            psi = None
+            if enough:
+                counts = self._bin_counts[index]
+                psi = population_stability_index(
+                    self.reference["features"][name]["psi_fractions"],
+                    counts / counts.sum(),
+                )
+            features[name] = {
+                "mean": _value(stats.mean[index], stats.count),
+                "std": _value(stats.std[index], stats.count),
+                "min": _value(stats.min[index], stats.count),
+                "max": _value(stats.max[index], stats.count),
+                "quantiles": {
+                    str(q): _value(value, stats.count)
+                    for q, value in zip(QUANTILES, quantiles[index])
+                },
+                "psi": psi,
+            }
+        prediction_psi = None
+        fractions: Dict[str, float] = {}
+        if enough:
+            total = self._prediction_counts.sum()
+            observed = self._prediction_counts / total
+            prediction_psi = population_stability_index(
+                self._expected_predictions, observed
+            )
+            fractions = {
+                str(c): float(f)
+                for c, f in zip(self._classes.tolist(), observed.tolist())
+            }
+            fractions["other"] = float(observed[-1])
+        drifted = [
+            name
+            for name, feature in features.items()
+            if feature["psi"] is not None and feature["psi"] > self.psi_threshold
+        ]
+        if prediction_psi is not None and prediction_psi > self.psi_threshold:
+            drifted.append("prediction")
+        return {
+            "model_version": self.version,
+            "rows": int(stats.count),
+            "recent_rows": float(self._weight),
+            "reference": self.reference is not None,
+            "psi_threshold": self.psi_threshold,
+            "features": features,
+            "predictions": {"fractions": fractions, "psi": prediction_psi},
+            "drifted": drifted,
+        }
+
+    def _publish(self, result: Dict[str, Any]) -> None:
+        """Set the drift gauges from a summary."""
+        if not result["rows"]:
+            return
+        for name, feature in result["features"].items():
+            FEATURE_MEAN.labels(name).set(feature["mean"])
+            FEATURE_STDDEV.labels(name).set(feature["std"])
+            for q, value in feature["quantiles"].items():
+                FEATURE_QUANTILE.labels(name, q).set(value)
+            if feature["psi"] is not None:
+                DRIFT_PSI.labels(name).set(feature["psi"])
+        if result["predictions"]["psi"] is not None:
+            PREDICTION_DRIFT_PSI.set(result["predictions"]["psi"])
@@ -0,0 +1,356 @@
+"""
+Dispatch of model inference off the event loop.
+"""
+
+import asyncio
+import gc
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.capture import CaptureStore
+from app.log import fork_safe_threads
+from app.registry import ModelRegistry
+from app.utils import ModelLoader
+from model.config import ModelConfig
+
+logger = logging.getLogger(__name__)
+
+INLINE = "inline"
+THREAD = "thread"
+PROCESS = "process"
+
+
+class InferenceQueueFullError(RuntimeError):
+    """Raised when the inference queue has no room for another request."""
+
+
+def _worker_init() -> None:
+    """Load the model when a process pool worker starts."""
+    from app.registry import model_registry
+
+    # Results are cached, and drift is tracked, by the parent process, where
+    # the metrics are exported, rather than separately by every worker
+    model_registry.loader.cache = None
+    model_registry.loader.drift = None
+    # Forked workers inherit the model loaded by the server, workers of
+    # other start methods load it themselves
+    if model_registry.loader.model is None:
+        model_registry.loader.reload_model()
+
+
+def _worker_predict_versioned(
+    rows: List[Dict[str, float]],
+) -> Tuple[str, List[Tuple[int, str, List[float]]]]:
+    """Score rows with the latest model loaded in a process pool worker."""
+    from app.registry import model_registry
+
+    return _predict_versioned(model_registry, rows, None)
+
+
+def _worker_predict_array(
+    X: np.ndarray,
+) -> Tuple[str, np.ndarray, Optional[np.ndarray]]:
+    """Score a feature matrix with the latest model of a process pool worker."""
+    from app.registry import model_registry
+
+    return _predict_array(model_registry, X, None)
+
+
+def _predict_array(
+    registry: ModelRegistry, X: np.ndarray, version: Optional[str]
+) -> Tuple[str, np.ndarray, Optional[np.ndarray]]:
+    """Score a feature matrix with the requested model version, latest if None."""
+    snapshot = registry.get(version)
+    return (snapshot.version, *snapshot.predict_array(X))
+
+
+def _predict_versioned(
+    registry: ModelRegistry, rows: List[Dict[str, float]], version: Optional[str]
+) -> Tuple[str, List[Tuple[int, str, List[float]]]]:
+    """Score rows with the requested model version, latest if None."""
+    snapshot = registry.get(version)
+    return snapshot.version, registry.loader.predict_batch(rows, snapshot=snapshot)
+
+
+class InferenceExecutor:
+    """Runs model inference inline, on a thread pool or on a process pool.
+
+    In ``process`` mode every worker serves the latest model from the
+    module-level model loader of its own interpreter: forked workers inherit
+    the model preloaded by the parent copy-on-write, spawned workers load it
+    on start-up. Reloading replaces the pool so that new workers pick up the
+    new model. Requests pinned to another version are served on a thread by
+    the parent's registry, so each version is loaded once rather than once
+    per worker, and the prediction cache is consulted in the parent as well,
+    where the registry and cache metrics are exported.
+
+    At most ``workers + max_queue`` requests are dispatched at once; further
+    requests are rejected with ``InferenceQueueFullError``. Scored rows are
+    tracked for drift and, given a capture store, captured in this process
+    as well.
+    """
+
+    def __init__(
+        self,
+        loader: ModelLoader,
+        registry: ModelRegistry,
+        mode: str = INLINE,
+        workers: Optional[int] = None,
+        max_queue: int = 1024,
+        start_method: Optional[str] = None,
+        capture: Optional[CaptureStore] = None,
+    ):
+        """Initialize the inference executor."""
+        if mode not in (INLINE, THREAD, PROCESS):
+            raise ValueError(f"Unknown inference executor mode: {mode}")
+        self.loader = loader
+        self.registry = registry
+        self.mode = mode
+        self.workers = workers or multiprocessing.cpu_count()
+        self.max_pending = self.workers + max_queue
+        self.start_method = start_method or None
+        self.capture = capture
+        self._pool: Optional[Executor] = None
+        self._frozen = False
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Number of requests currently dispatched or queued."""
+        return self._pending
+
+    def _create_pool(self) -> Executor:
+        """Create a worker pool for the execution mode."""
+        if self.mode == THREAD:
+            return ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="inference"
+            )
+
+        context = multiprocessing.get_context(self.start_method)
+        if context.get_start_method() == "fork":
+            if threading.active_count() - fork_safe_threads() > 1:
+                # Forking a multi-threaded process can deadlock on locks held
+                # by the other threads, replacement pools fork from a clean
+                # server process instead. The log writer thread does not
+                # count, it is stopped while forking
+                logger.info("Threads are running, starting workers with forkserver")
+                context = multiprocessing.get_context("forkserver")
+            elif not self._frozen:
+                # Keep the garbage collector from touching, and thereby
+                # copying, the preloaded model pages in forked workers.
+                # Only once: frozen objects are never collected again
+                gc.freeze()
+                self._frozen = True
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_worker_init,
+        )
+
+    def _warm_up(self, pool: Executor) -> None:
+        """Start every process worker and wait until it has loaded the model."""
+        if isinstance(pool, ProcessPoolExecutor):
+            for future in [pool.submit(os.getpid) for _ in range(self.workers)]:
+                future.result()
+        logger.info(f"Started {self.mode} inference pool with {self.workers} workers")
+
+    def _get_pool(self) -> Executor:
+        """Create the worker pool on first use."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._create_pool()
+            return self._pool
+
+    def start(self) -> None:
+        """Start the worker pool ahead of the first request.
+
+        Call this from the main thread before any other threads are started:
+        with the ``fork`` start method the workers are forked here, and
+        forking a multi-threaded process can deadlock on locks held by the
+        other threads.
+        """
+        if self.mode == INLINE:
+            return
+        self._warm_up(self._get_pool())
+
+    def worker_pids(self) -> List[int]:
+        """Process ids of the process pool workers."""
+        pool = self._pool
+        if isinstance(pool, ProcessPoolExecutor):
+            return list(pool._processes or {})
+        return []
+
+    async def _dispatch(
+        self, fn: Callable[..., Any], *args: Any, local: bool = False
+    ) -> Any:
+        """Run a callable according to the execution mode.
+
+        Args:
+            fn: Callable to run
+            local: Run on a thread of this process even in ``process`` mode
+        """
+        if self.mode == INLINE:
+            return fn(*args)
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise InferenceQueueFullError("Inference queue is full")
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            pool = None if local and self.mode == PROCESS else self._get_pool()
+            return await loop.run_in_executor(pool, partial(fn, *args))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _is_pinned(self, version: Optional[str]) -> bool:
+        """Whether a request asks for a version other than the latest."""
+        return version is not None and version != self.loader.snapshot.version
+
+    async def _predict_workers(
+        self, rows: List[Dict[str, float]]
+    ) -> Tuple[str, List[Tuple[int, str, List[float]]]]:
+        """Score rows with the latest model on the process pool."""
+        cache = self.loader.cache
+        if cache is None:
+            return await self._dispatch(_worker_predict_versioned, rows)
+
+        version = self.loader.snapshot.version
+        values = [[row[name] for name in ModelConfig.FEATURE_NAMES] for row in rows]
+        keys, results = cache.get_many(version, values)
+        missing = [index for index, result in enumerate(results) if result is None]
+        if not missing:
+            return version, results
+
+        scored_version, scored = await self._dispatch(
+            _worker_predict_versioned, [rows[index] for index in missing]
+        )
+        for index, result in zip(missing, scored):
+            results[index] = result
+            # Workers may still serve the previous model during a reload
+            if scored_version == version:
+                cache.put(keys[index], result)
+        return scored_version, results
+
+    async def predict_batch(
+        self,
+        rows: List[Dict[str, float]],
+        version: Optional[str] = None,
+        record: bool = True,
+    ) -> Tuple[str, List[Tuple[int, str, List[float]]]]:
+        """Score a batch of rows, returning the version of the model used.
+
+        Args:
+            rows: List of dictionaries of feature names and values
+            version: Model version to route to, None for the latest
+            record: Whether to track the rows for drift and capture them,
+                False for synthetic rows
+        """
+        if self.mode == PROCESS and not self._is_pinned(version):
+            result = await self._predict_workers(rows)
+        else:
+            result = await self._dispatch(
+                _predict_versioned, self.registry, rows, version, local=True
+            )
+        if not record:
+            return result
+        drift = self.loader.drift
+        if drift is not None and self._is_pinned(version):
+            drift = None
+        captured = self.capture is not None and self.capture.sample()
+        if drift is not None or captured:
+            values = [[row[name] for name in ModelConfig.FEATURE_NAMES] for row in rows]
+            predictions = [prediction for prediction, _, _ in result[1]]
+            if drift is not None:
+                for row_values, prediction in zip(values, predictions):
+                    drift.observe_row(row_values, prediction)
+            if captured:
+                # None unless every row has probabilities
+                probabilities = [scored[2] for scored in result[1]]
+                if None in probabilities:
+                    probabilities = None
+                self.capture.record(result[0], values, predictions, probabilities)
+        return result
+
+    async def predict_array(
+        self, X: np.ndarray, version: Optional[str] = None, record: bool = True
+    ) -> Tuple[str, np.ndarray, Optional[np.ndarray]]:
+        """Score an N x F feature matrix, returning the version of the model used.
+
+        Args:
+            X: Feature matrix
+            version: Model version to route to, None for the latest
+            record: Whether to track the rows for drift and capture them,
+                False for synthetic rows
+
+        Returns:
+            Tuple of (model version, prediction classes, probabilities or None)
+        """
+        if self.mode == PROCESS and not self._is_pinned(version):
+            result = await self._dispatch(_worker_predict_array, X)
+        else:
+            result = await self._dispatch(
+                _predict_array, self.registry, X, version, local=True
+            )
+        if not record:
+            return result
+        drift = self.loader.drift
+        if drift is not None and not self._is_pinned(version):
+            drift.observe(X, result[1])
+        if self.capture is not None and self.capture.sample():
+            scored_version, predictions, probabilities = result
+            self.capture.record(scored_version, X, predictions, probabilities)
+        return result
+
+    async def predict(
+        self, features: Dict[str, float], version: Optional[str] = None
+    ) -> Tuple[str, Tuple[int, str, List[float]]]:
+        """Score a single row, returning the version of the model used."""
+        version, results = await self.predict_batch([features], version)
+        return version, results[0]
+
+    def _replace_pool(self) -> None:
+        """Start and warm up a new process pool, then swap it in."""
+        new_pool = self._create_pool()
+        try:
+            self._warm_up(new_pool)
+        except Exception:
+            new_pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        # Requests already running on the old pool are allowed to finish
+        with self._lock:
+            pool, self._pool = self._pool, new_pool
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    async def reload(self) -> bool:
+        """Load the model in the background and swap it in once ready.
+
+        In ``process`` mode the workers are replaced so that they serve the
+        reloaded model. The new workers are started and have loaded the model
+        before they receive requests, the old ones keep serving meanwhile.
+        """
+        success = await asyncio.to_thread(self.loader.reload_model)
+        if success and self.mode == PROCESS:
+            try:
+                await asyncio.to_thread(self._replace_pool)
+            except Exception as e:
+                logger.error(f"Failed to replace inference workers: {str(e)}")
+                return False
+        return success
+
+    def shutdown(self) -> None:
+        """Stop the worker pool."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,198 @@
+"""
+Non-blocking, structured logging for the serving application.
+
+Handlers write from a background thread: log calls only put the record on a
+queue, so a slow or blocked stdout never stalls a request. Records are
+formatted by that thread too, as JSON lines by default. Request logs are
+sampled per route, unsampled requests skip building the record altogether.
+
+The writer thread is stopped around ``fork`` so that forked inference
+workers never inherit a queue locked by it. Forked workers write their
+records directly.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from app.metrics import LOG_RECORDS_DROPPED
+from model.config import ModelConfig
+
+# Logger of the sampled request/response records
+request_logger = logging.getLogger("app.requests")
+
+# Attributes every LogRecord has, anything else was passed through ``extra``
+_RECORD_ATTRIBUTES = set(
+    logging.LogRecord("", logging.INFO, "", 0, "", None, None).__dict__
+) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+_paused = False
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line.
+
+    Fields passed with ``extra`` are added to the object next to the
+    timestamp, level, logger name and message.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in record.__dict__.items():
+            if name not in _RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None):
+        """Format the record time as ISO 8601 UTC with milliseconds."""
+        seconds = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+        return f"{seconds}.{int(record.msecs):03d}Z"
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that defers formatting and drops records when full.
+
+    ``QueueHandler`` formats the message in the logging thread so records
+    can be pickled. The listener runs in this process, so the record is
+    queued as is and formatted by the listener thread instead. Arguments
+    must therefore not be mutated after they are logged.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """
+    Parse per-route sample rates.
+
+    Args:
+        spec: Comma-separated ``route=rate`` pairs, e.g. "predict=0.01"
+
+    Returns:
+        Dictionary of sample rates by route
+    """
+    rates = {}
+    for item in spec.split(","):
+        if item.strip():
+            route, _, rate = item.partition("=")
+            rates[route.strip().strip("/")] = float(rate)
+    return rates
+
+
+_sample_rates = parse_sample_rates(ModelConfig.LOG_SAMPLE_RATES)
+
+
+def should_log_request(route: str) -> bool:
+    """Whether to log the request/response record of a request to a route."""
+    if not request_logger.isEnabledFor(logging.INFO):
+        return False
+    rate = _sample_rates.get(route, ModelConfig.LOG_SAMPLE_RATE)
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def configure_logging() -> None:
+    """
+    Route all log records through a queue to a background writer thread.
+
+    Replaces the handlers of the root logger. Safe to call more than once,
+    the writer thread is only started the first time.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    if ModelConfig.LOG_FORMAT == "json":
+        formatter: logging.Formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+        )
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(
+        ModelConfig.LOG_QUEUE_SIZE
+    )
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(NonBlockingQueueHandler(log_queue))
+    root.setLevel(ModelConfig.LOG_LEVEL.upper())
+
+    _listener = QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Write out the queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def fork_safe_threads() -> int:
+    """Number of running threads that are stopped while the process forks."""
+    return int(_listener is not None and _listener._thread is not None)
+
+
+def _before_fork() -> None:
+    """Write out the queued records and stop the writer thread."""
+    global _paused
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+        _paused = True
+
+
+def _after_fork_in_parent() -> None:
+    """Restart the writer thread stopped for the fork."""
+    global _paused
+    if _paused:
+        _listener.start()
+        _paused = False
+
+
+def _after_fork_in_child() -> None:
+    """Write records of the forked process directly, it has no writer thread."""
+    global _listener, _paused
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, NonBlockingQueueHandler):
+            root.removeHandler(handler)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener = None
+    _paused = False
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(
+        before=_before_fork,
+        after_in_parent=_after_fork_in_parent,
+        after_in_child=_after_fork_in_child,
+    )
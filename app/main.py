@@ -2,60 +2,205 @@
 FastAPI application for serving Iris classifier predictions.
 """
 
+import asyncio
+import hmac
 import logging
+import os
 import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Dict, Optional
 
+import numpy as np
 import uvicorn
-from fastapi import Response, FastAPI, HTTPException, Request, status, APIRouter
+from fastapi import (
+    APIRouter,
+    FastAPI,
+    Header,
+    HTTPException,
+    Request,
+    Response,
+    WebSocket,
+    status,
+)
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from app.models import PredictionRequest, PredictionResponse
-from app.utils import model_loader
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from app.admission import (
+    AdmissionController,
+    AdmissionMiddleware,
+    AdmissionRejectedError,
+    check_deadline,
+    rejection_response,
+)
+from app.batching import MicroBatcher
+from app.capture import CaptureStore
+from app.channel import PredictionChannel
+from app.binary import (
+    ARROW_MEDIA_TYPE,
+    BINARY_MEDIA_TYPE,
+    BinaryFormatError,
+    BinaryFormatUnavailableError,
+    binary_dtype,
+    decode_arrow,
+    decode_binary,
+    encode_arrow,
+    encode_binary,
+    merge_results,
+    parse_media_type,
+)
+from app.executor import InferenceExecutor, InferenceQueueFullError
+from app.log import configure_logging, request_logger, should_log_request
+from app.memory import report_memory
+from app.metrics import (
+    INFERENCE_COUNT,
+    INFERENCE_LATENCY,
+    INFERENCE_PREDICTION_DISTRIBUTION,
+    REQUEST_COUNT,
+    REQUEST_LATENCY,
+    UNMATCHED_ROUTE,
+    mark_process_dead,
+    render_metrics,
+)
+from app.codec import (
+    decode_body,
+    decode_instances,
+    decode_prediction,
+    decode_rows,
+    dumps,
+    new_request_id,
+    request_body_schema,
+    valid_rows,
+    validation_detail,
+)
+from app.models import (
+    BatchPredictionRequest,
+    BatchPredictionResponse,
+    PredictionRequest,
+    PredictionResponse,
+)
+from app.profiling import (
+    MIN_SAMPLE_INTERVAL_MS,
+    StageTimer,
+    sample_cpu,
+    trace_memory,
+)
+from app.registry import ModelVersionNotFoundError, model_registry
+from app.streaming import NDJSONStreamingResponse, score_ndjson
+from app.utils import ModelLoader, model_loader
+from app.warmup import process_uptime, record_phase, startup_phase, warm_up
+from app.watcher import ModelWatcher
+from model.config import ModelConfig
 
-# Metrics
-REQUEST_COUNT = Counter(
-    'http_requests_total', 
-    'Total HTTP Requests', 
-    ['method', 'endpoint', 'http_status']
-    )
+# Set up logging
+configure_logging()
+logger = logging.getLogger(__name__)
 
-REQUEST_LATENCY = Histogram(
-    'http_request_duration_seconds',
-    'Request latency in seconds', 
-    ['endpoint']
+# Capture of scored rows for replay (opt-in)
+capture_store = (
+    CaptureStore(
+        ModelConfig.CAPTURE_DIR,
+        capacity=ModelConfig.CAPTURE_BUFFER_ROWS,
+        segment_rows=ModelConfig.CAPTURE_SEGMENT_ROWS,
+        flush_interval=ModelConfig.CAPTURE_FLUSH_INTERVAL_SECONDS,
+        max_segments=ModelConfig.CAPTURE_MAX_SEGMENTS,
+        sample_rate=ModelConfig.CAPTURE_SAMPLE_RATE,
     )
+    if ModelConfig.CAPTURE_ENABLED
+    else None
+)
 
-INFERENCE_COUNT = Counter(
-    'inference_requests_total',
-    'Total number of model inference requests',
-    ['model_version', 'status']
+# Executor running inference inline or on a worker pool
+inference_executor = InferenceExecutor(
+    model_loader,
+    model_registry,
+    mode=ModelConfig.INFERENCE_EXECUTOR,
+    workers=ModelConfig.INFERENCE_WORKERS,
+    max_queue=ModelConfig.INFERENCE_MAX_QUEUE,
+    start_method=ModelConfig.INFERENCE_START_METHOD,
+    capture=capture_store,
 )
 
-INFERENCE_LATENCY = Histogram(
-    'inference_duration_seconds',
-    'Time taken for model inference',
-    ['model_version']
+# Micro-batcher coalescing concurrent single-row predictions (opt-in)
+micro_batcher = MicroBatcher(
+    inference_executor.predict_batch,
+    window_ms=ModelConfig.MICRO_BATCH_WINDOW_MS,
+    max_batch_size=ModelConfig.MICRO_BATCH_MAX_SIZE,
+    adaptive=ModelConfig.MICRO_BATCH_ADAPTIVE,
 )
 
-INFERENCE_PREDICTION_DISTRIBUTION = Counter(
-    'prediction_distribution_total',
-    'Count of predictions per predicted class label',
-    ['prediction_label']
+# Admission control of the prediction routes
+admission_controller = AdmissionController(
+    ModelConfig.ADMISSION_MAX_IN_FLIGHT,
+    ModelConfig.ADMISSION_MAX_QUEUE,
+    ModelConfig.ADMISSION_QUEUE_TIMEOUT_MS / 1000,
 )
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Watcher reloading the model when a new version is published (opt-in)
+model_watcher = ModelWatcher(
+    ModelConfig.LATEST_VERSION_PATH,
+    inference_executor.reload,
+    interval=ModelConfig.MODEL_WATCH_INTERVAL_SECONDS,
 )
-logger = logging.getLogger(__name__)
+
+
+async def _warm_up() -> None:
+    """Warm up the serving path, then report the server as ready."""
+    try:
+        if model_loader.model is not None and ModelConfig.WARMUP_REQUESTS > 0:
+            with startup_phase("warmup"):
+                # Synthetic rows say nothing about the traffic, and are not
+                # tracked for drift nor captured
+                await warm_up(
+                    partial(inference_executor.predict_batch, record=False),
+                    partial(inference_executor.predict_array, record=False),
+                    ModelConfig.WARMUP_REQUESTS,
+                )
+    except Exception as e:
+        # A failed warm-up only costs the first requests some latency
+        logger.error("Error warming up: %s", e)
+    if capture_store is not None:
+        capture_store.start()
+    app.state.warmed_up = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start up and shut down background serving components."""
+    app.state.warmed_up = False
+    uptime = process_uptime()
+    if uptime is not None:
+        # Interpreter start-up and imports, up to the start of the lifespan
+        record_phase("import", uptime)
+    with startup_phase("load"):
+        model_loader.reload_model()
+    # Started on the event loop thread, before the watcher or any
+    # asyncio.to_thread call starts other threads, so workers fork safely
+    # and share the model loaded above
+    inference_executor.start()
+    report_memory("server", inference_executor.worker_pids())
+    if ModelConfig.MODEL_WATCH_INTERVAL_SECONDS > 0:
+        model_watcher.start()
+    # Warmed up while the server already answers liveness probes, it is
+    # reported ready once done
+    warmup_task = asyncio.create_task(_warm_up())
+    yield
+    warmup_task.cancel()
+    await model_watcher.stop()
+    await micro_batcher.stop()
+    if capture_store is not None:
+        await asyncio.to_thread(capture_store.stop)
+    inference_executor.shutdown()
+    mark_process_dead(os.getpid())
+
 
 # Create FastAPI app
 app = FastAPI(
     title="Iris Classifier API",
     description="API for making predictions with the Iris flower classifier model",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Define API router with /api/v1 prefix
@@ -64,28 +209,56 @@ api_router = APIRouter(prefix="/api/v1")
 # Health check endpoint
 @api_router.get("/health", status_code=status.HTTP_200_OK)
 async def health_check():
-    """Health check endpoint."""
-    if model_loader.model is None:
+    """Health check endpoint, healthy once the model is loaded and warmed up."""
+    snapshot = model_loader.snapshot
+    if snapshot.model is None:
         return JSONResponse(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             content={"status": "unhealthy", "message": "Model not loaded"},
         )
+    if not getattr(app.state, "warmed_up", True):
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "starting", "message": "Model warming up"},
+        )
     return {
         "status": "healthy",
-        "model_version": model_loader.model_info.get("version", "unknown"),
+        "model_version": snapshot.version,
     }
 
+# Liveness endpoint
+@api_router.get("/health/live", status_code=status.HTTP_200_OK)
+async def liveness():
+    """Liveness probe, the process is serving requests."""
+    return {"status": "alive"}
+
+# Readiness endpoint
+@api_router.get("/health/ready", status_code=status.HTTP_200_OK)
+async def readiness():
+    """Readiness probe, the model is loaded and warmed up."""
+    return await health_check()
+
 # Model info endpoint
 @api_router.get("/model/info", status_code=status.HTTP_200_OK)
 async def model_info():
     """Get information about the currently loaded model."""
     return model_loader.get_model_info()
 
+# Model versions endpoint
+@api_router.get("/models", status_code=status.HTTP_200_OK)
+async def list_models():
+    """List the model versions available for routing."""
+    return {
+        "latest": model_loader.snapshot.version,
+        "available": model_registry.versions(),
+        "resident": model_registry.resident_versions(),
+    }
+
 # Reload model endpoint
 @api_router.post("/model/reload", status_code=status.HTTP_200_OK)
 async def reload_model():
     """Reload the model from disk."""
-    success = model_loader.reload_model()
+    success = await inference_executor.reload()
     if not success:
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -98,47 +271,485 @@ async def reload_model():
     }
 
 # Prediction endpoint
-@api_router.post("/predict", response_model=PredictionResponse)
-async def predict(request: PredictionRequest):
+@api_router.post(
+    "/predict",
+    response_model=PredictionResponse,
+    openapi_extra=request_body_schema(PredictionRequest),
+)
+async def predict(
+    request: Request,
+    x_model_version: Optional[str] = Header(
+        None, alias=ModelConfig.MODEL_VERSION_HEADER
+    ),
+):
     """
     Make a prediction with the Iris classifier model.
+
+    The latest model is used unless a version is requested through the
+    ``X-Model-Version`` header.
     """
-    start = time.time()
-    try:
-        logger.info(f"Prediction request: {request}")
+    timer = StageTimer("predict")
+    body = await request.body()
+    timer.mark("read")
+    data = decode_body(body)
+    timer.mark("parse")
+    features = decode_prediction(data)
+    timer.mark("validate")
+    return await _predict(features, x_model_version, timer)
+
+# Versioned prediction endpoint
+@api_router.post(
+    "/models/{version}/predict",
+    response_model=PredictionResponse,
+    openapi_extra=request_body_schema(PredictionRequest),
+)
+async def predict_version(version: str, request: Request):
+    """
+    Make a prediction with a specific model version.
+    """
+    timer = StageTimer("models/{version}/predict")
+    body = await request.body()
+    timer.mark("read")
+    data = decode_body(body)
+    timer.mark("parse")
+    features = decode_prediction(data)
+    timer.mark("validate")
+    return await _predict(features, version, timer)
 
+async def _predict(
+    features: Dict[str, float], requested_version: Optional[str], timer: StageTimer
+):
+    """Score a single request with the requested model version."""
+    check_deadline()
+    start = time.perf_counter()
+    # The requested version is client input, only label metrics with it once
+    # it has been resolved to a served model
+    version = "unknown" if requested_version else model_loader.snapshot.version
+    try:
         if model_loader.model is None:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="Model not loaded. Please train a model first.",
             )
 
-        prediction, label, probabilities = model_loader.predict(request.model_dump())
-        duration = time.time() - start
-        version = model_loader.model_info.get("version", "unknown")
+        if ModelConfig.MICRO_BATCH_ENABLED and requested_version is None:
+            version, result = await micro_batcher.submit(features)
+        else:
+            version, result = await inference_executor.predict(
+                features, requested_version
+            )
+        prediction, label, probabilities = result
+        timer.mark("inference")
+        duration = time.perf_counter() - start
         INFERENCE_LATENCY.labels(version).observe(duration)
         INFERENCE_COUNT.labels(version, "success").inc()
         INFERENCE_PREDICTION_DISTRIBUTION.labels(label).inc()
 
-        response = PredictionResponse(
-            prediction=prediction,
-            prediction_label=label,
-            model_version=version,
-            probabilities=probabilities,
-        )
+        # Encoded directly, in the field order of PredictionResponse
+        response = {
+            "prediction": prediction,
+            "prediction_label": label,
+            "request_id": new_request_id(),
+            "model_version": version,
+            "probabilities": probabilities,
+        }
+        content = dumps(response)
+        timer.mark("response")
 
-        logger.info(f"Prediction result: {response}")
-        return response
+        if should_log_request(timer.route):
+            request_logger.info(
+                "Prediction",
+                extra={
+                    "route": timer.route,
+                    "request": features,
+                    "response": response,
+                },
+            )
+            timer.mark("logging")
+        return Response(content=content, media_type="application/json")
 
+    except ModelVersionNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except InferenceQueueFullError as e:
+        INFERENCE_COUNT.labels(version, "rejected").inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e)
+        )
     except Exception as e:
-        logger.error(f"Error making prediction: {str(e)}")
-        version = model_loader.model_info.get("version", "unknown")
+        logger.error("Error making prediction: %s", e)
         INFERENCE_COUNT.labels(version, "error").inc()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error making prediction: {str(e)}",
         )
 
+# Batch prediction endpoint
+@api_router.post(
+    "/predict/batch",
+    response_model=BatchPredictionResponse,
+    openapi_extra=request_body_schema(BatchPredictionRequest),
+)
+async def predict_batch(
+    request: Request,
+    x_model_version: Optional[str] = Header(
+        None, alias=ModelConfig.MODEL_VERSION_HEADER
+    ),
+):
+    """
+    Make predictions for many rows with a single vectorized model call.
+
+    Rows failing validation are reported in ``errors`` by their index, the
+    remaining rows are scored and returned in input order.
+
+    Besides JSON, the body can be a raw feature matrix, see ``app.binary``:
+    ``application/octet-stream`` float64 rows (``;dtype=float32`` for
+    float32) or an ``application/vnd.apache.arrow.stream`` IPC stream. The
+    response then uses the same format.
+    """
+    timer = StageTimer("predict/batch")
+    media_type, parameters = parse_media_type(
+        request.headers.get("content-type", "")
+    )
+    body = await request.body()
+    timer.mark("read")
+    if media_type in (BINARY_MEDIA_TYPE, ARROW_MEDIA_TYPE):
+        return await _predict_matrix(
+            body, media_type, parameters, x_model_version, timer
+        )
+
+    data = decode_body(body)
+    timer.mark("parse")
+    instances = decode_instances(data)
+    if len(instances) > ModelConfig.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch size exceeds the limit of {ModelConfig.MAX_BATCH_SIZE} rows",
+        )
+
+    if model_loader.model is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model not loaded. Please train a model first.",
+        )
+
+    indices, rows, invalid = decode_rows(instances)
+    errors = [
+        {"index": index, "detail": validation_detail(error)}
+        for index, error in invalid
+    ]
+    timer.mark("validate")
+
+    version = "unknown" if x_model_version else model_loader.snapshot.version
+    check_deadline()
+    start = time.perf_counter()
+    try:
+        version, results = await inference_executor.predict_batch(
+            rows, x_model_version
+        )
+    except ModelVersionNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except InferenceQueueFullError as e:
+        INFERENCE_COUNT.labels(version, "rejected").inc(len(rows))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e)
+        )
+    except Exception as e:
+        logger.error("Error making batch prediction: %s", e)
+        INFERENCE_COUNT.labels(version, "error").inc(len(rows))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error making prediction: {str(e)}",
+        )
+
+    timer.mark("inference")
+    INFERENCE_LATENCY.labels(version).observe(time.perf_counter() - start)
+    INFERENCE_COUNT.labels(version, "success").inc(len(results))
+    if errors:
+        INFERENCE_COUNT.labels(version, "error").inc(len(errors))
+    for label, count in Counter(label for _, label, _ in results).items():
+        INFERENCE_PREDICTION_DISTRIBUTION.labels(label).inc(count)
+
+    # Encoded directly, in the field order of BatchPredictionResponse
+    response = {
+        "request_id": new_request_id(),
+        "model_version": version,
+        "predictions": [
+            {
+                "index": index,
+                "prediction": prediction,
+                "prediction_label": label,
+                "probabilities": probabilities,
+            }
+            for index, (prediction, label, probabilities) in zip(indices, results)
+        ],
+        "errors": errors,
+    }
+    content = dumps(response)
+    timer.mark("response")
+    if should_log_request("predict/batch"):
+        request_logger.info(
+            "Batch prediction",
+            extra={
+                "route": "predict/batch",
+                "request_id": response["request_id"],
+                "model_version": version,
+                "rows": len(instances),
+                "rejected": len(errors),
+            },
+        )
+        timer.mark("logging")
+    return Response(content=content, media_type="application/json")
+
+async def _predict_matrix(
+    body: bytes,
+    media_type: str,
+    parameters: Dict[str, str],
+    requested_version: Optional[str],
+    timer: StageTimer,
+) -> Response:
+    """Score a raw or Arrow feature matrix and encode the results alike."""
+    try:
+        if media_type == ARROW_MEDIA_TYPE:
+            X = decode_arrow(body)
+        else:
+            dtype = binary_dtype(parameters)
+            X = decode_binary(body, dtype)
+    except BinaryFormatUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e)
+        )
+    except BinaryFormatError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if len(X) > ModelConfig.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch size exceeds the limit of {ModelConfig.MAX_BATCH_SIZE} rows",
+        )
+
+    if model_loader.model is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model not loaded. Please train a model first.",
+        )
+
+    timer.mark("parse")
+    valid = valid_rows(X)
+    n_valid = int(valid.sum())
+    timer.mark("validate")
+    if n_valid == 0:
+        # Nothing to score, every row is answered as invalid
+        try:
+            snapshot = await asyncio.to_thread(model_registry.get, requested_version)
+        except ModelVersionNotFoundError as e:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+        version = snapshot.version
+        predictions = np.empty(0, dtype=np.int64)
+        probabilities = None
+        if snapshot.compiled is not None or hasattr(snapshot.model, "predict_proba"):
+            probabilities = np.empty((0, len(ModelConfig.PREDICTION_LABELS)))
+    else:
+        version = "unknown" if requested_version else model_loader.snapshot.version
+        check_deadline()
+        start = time.perf_counter()
+        try:
+            version, predictions, probabilities = (
+                await inference_executor.predict_array(
+                    X if n_valid == len(X) else X[valid], requested_version
+                )
+            )
+        except ModelVersionNotFoundError as e:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+        except InferenceQueueFullError as e:
+            INFERENCE_COUNT.labels(version, "rejected").inc(n_valid)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e)
+            )
+        except Exception as e:
+            logger.error("Error making batch prediction: %s", e)
+            INFERENCE_COUNT.labels(version, "error").inc(n_valid)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error making prediction: {str(e)}",
+            )
+
+        timer.mark("inference")
+        INFERENCE_LATENCY.labels(version).observe(time.perf_counter() - start)
+        INFERENCE_COUNT.labels(version, "success").inc(n_valid)
+    if n_valid < len(X):
+        INFERENCE_COUNT.labels(version, "error").inc(len(X) - n_valid)
+    classes, counts = np.unique(predictions, return_counts=True)
+    for prediction, count in zip(classes.tolist(), counts.tolist()):
+        INFERENCE_PREDICTION_DISTRIBUTION.labels(
+            ModelLoader.label_for(prediction)
+        ).inc(count)
+
+    predictions, probabilities = merge_results(valid, predictions, probabilities)
+    if media_type == ARROW_MEDIA_TYPE:
+        content = encode_arrow(predictions, probabilities)
+    else:
+        content = encode_binary(predictions, probabilities, dtype)
+    timer.mark("response")
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={ModelConfig.MODEL_VERSION_HEADER: version},
+    )
+
+# Streaming prediction endpoint
+@api_router.post(
+    "/predict/stream",
+    response_class=NDJSONStreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+            "required": True,
+        }
+    },
+)
+async def predict_stream(
+    request: Request,
+    x_model_version: Optional[str] = Header(
+        None, alias=ModelConfig.MODEL_VERSION_HEADER
+    ),
+):
+    """
+    Score an NDJSON stream of rows, one JSON object of measurements per line.
+
+    Rows are scored in chunks of ``STREAM_CHUNK_SIZE`` with one model call per
+    chunk, and results are streamed back as NDJSON lines in input order.
+    Invalid rows produce a line with their ``index`` and an ``error``.
+    """
+    if model_loader.model is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model not loaded. Please train a model first.",
+        )
+    try:
+        await asyncio.to_thread(model_registry.get, x_model_version)
+    except ModelVersionNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+    check_deadline()
+    return NDJSONStreamingResponse(
+        score_ndjson(
+            request.stream(),
+            partial(inference_executor.predict_array, version=x_model_version),
+            chunk_size=ModelConfig.STREAM_CHUNK_SIZE,
+            max_line_bytes=ModelConfig.STREAM_MAX_LINE_BYTES,
+        )
+    )
+
+# WebSocket prediction channel
+@api_router.websocket("/predict/ws")
+async def predict_ws(
+    websocket: WebSocket,
+    x_model_version: Optional[str] = Header(
+        None, alias=ModelConfig.MODEL_VERSION_HEADER
+    ),
+):
+    """
+    Score pipelined single-row prediction messages over one connection.
+
+    See ``app.channel`` for the message format. The latest model is used
+    unless a version is requested through the ``X-Model-Version`` header of
+    the handshake.
+    """
+    await websocket.accept()
+    if model_loader.model is None:
+        await websocket.close(
+            code=1013, reason="Model not loaded. Please train a model first."
+        )
+        return
+    try:
+        await asyncio.to_thread(model_registry.get, x_model_version)
+    except ModelVersionNotFoundError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+
+    channel = PredictionChannel(
+        websocket,
+        partial(inference_executor.predict_array, version=x_model_version),
+        max_in_flight=ModelConfig.WS_MAX_IN_FLIGHT,
+        max_group_size=ModelConfig.WS_MAX_GROUP_SIZE,
+    )
+    await channel.run()
+
+# Drift statistics endpoint
+@api_router.get("/drift")
+async def drift():
+    """
+    Statistics of the features and predictions of the rows scored by the
+    served model, with their drift from the training data.
+
+    ``psi`` is the population stability index of recent rows against the
+    reference statistics saved at training, ``drifted`` lists the features
+    (and ``prediction``) whose PSI exceeds ``psi_threshold``.
+    """
+    if model_loader.drift is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Drift monitoring is disabled",
+        )
+    return model_loader.drift.summary()
+
+
+# Profiling endpoint, one profile runs at a time
+_profile_lock = asyncio.Lock()
+
+
+@api_router.get("/debug/profile", include_in_schema=False)
+async def profile(
+    kind: str = "cpu",
+    seconds: float = 10,
+    interval_ms: float = 5,
+    x_profiling_token: Optional[str] = Header(None),
+):
+    """
+    Profile the live process for a while, answering with collapsed stacks.
+
+    ``kind=cpu`` samples the stacks of all threads every ``interval_ms``,
+    ``kind=memory`` traces the allocations made meanwhile. The report can
+    be rendered with flamegraph.pl or speedscope. Disabled unless
+    ``PROFILING_ENABLED`` and ``PROFILING_TOKEN`` are both set.
+    """
+    # Without a token, anyone could slow the server down with profiles
+    if not ModelConfig.PROFILING_ENABLED or not ModelConfig.PROFILING_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not hmac.compare_digest(
+        (x_profiling_token or "").encode(), ModelConfig.PROFILING_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Invalid profiling token"
+        )
+    if kind not in ("cpu", "memory"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Profile kind must be cpu or memory",
+        )
+    if not 0 < seconds <= ModelConfig.PROFILING_MAX_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Profiles last at most {ModelConfig.PROFILING_MAX_SECONDS}s",
+        )
+    if interval_ms < MIN_SAMPLE_INTERVAL_MS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Samples are at least {MIN_SAMPLE_INTERVAL_MS:g}ms apart",
+        )
+    if _profile_lock.locked():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="A profile is already running"
+        )
+
+    async with _profile_lock:
+        # Profiled from another thread, requests keep being served meanwhile
+        if kind == "memory":
+            report = await asyncio.to_thread(trace_memory, seconds)
+        else:
+            report = await asyncio.to_thread(sample_cpu, seconds, interval_ms / 1000)
+    return Response(content=report, media_type="text/plain")
+
+
 # Root endpoint for versioned API
 @api_router.get("/")
 async def api_root():
@@ -146,16 +757,33 @@ async def api_root():
         "message": "Iris Classifier API - v1",
         "endpoints": {
             "/predict": "Make a prediction (POST)",
+            "/predict/batch": "Make predictions for many rows (POST)",
+            "/predict/stream": "Score an NDJSON stream of rows (POST)",
+            "/predict/ws": "Pipelined single-row predictions over a WebSocket",
             "/health": "Health check (GET)",
+            "/health/live": "Liveness probe (GET)",
+            "/health/ready": "Readiness probe (GET)",
             "/metrics": "Expose prometheus metrics (GET)",
             "/model/info": "Get model information (GET)",
+            "/drift": "Feature and prediction drift statistics (GET)",
             "/model/reload": "Reload model from disk (POST)",
+            "/models": "List model versions available for routing (GET)",
+            "/models/{version}/predict": (
+                "Make a prediction with a model version (POST)"
+            ),
         },
     }
 
 @api_router.get('/metrics')
 async def metrics():
-    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    # Publish the drift statistics, including the rows buffered since the
+    # last update
+    if model_loader.drift is not None:
+        model_loader.drift.summary()
+    # Rendering reads every series (and in multiprocess mode every file),
+    # keep it off the event loop serving predictions
+    content, media_type = await asyncio.to_thread(render_metrics)
+    return Response(content=content, media_type=media_type)
 
 # Add router to app
 app.include_router(api_router)
@@ -182,15 +810,31 @@ app.add_middleware(
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     """Add processing time to response headers."""
-    start_time = time.time()
+    start_time = time.perf_counter()
     response = await call_next(request)
-    process_time = time.time() - start_time
+    process_time = time.perf_counter() - start_time
     response.headers["X-Process-Time"] = str(process_time)
-    route = request.url.path.removeprefix("/api/v1/")
+    # Label with the matched route template rather than the raw path, so the
+    # number of series stays bounded whatever paths clients send
+    matched = request.scope.get("route")
+    if matched is not None:
+        route = matched.path_format.removeprefix("/api/v1/")
+    else:
+        route = UNMATCHED_ROUTE
     REQUEST_LATENCY.labels(route).observe(process_time)
     REQUEST_COUNT.labels(request.method, route, response.status_code).inc()
     return response
 
+# Admission control, outermost so that rejecting a request costs little
+# (0 disables it)
+if ModelConfig.ADMISSION_MAX_IN_FLIGHT > 0:
+    app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+
+@app.exception_handler(AdmissionRejectedError)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejectedError):
+    """Reject requests found past their deadline before inference."""
+    return rejection_response(exc)
+
 # Run the app
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
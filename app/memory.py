@@ -0,0 +1,77 @@
+"""
+Process memory reporting for the serving workers.
+"""
+
+import logging
+import os
+import resource
+from typing import Dict, Iterable, Union
+
+from app.metrics import PROCESS_MEMORY_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Fields of /proc/<pid>/smaps_rollup that show how much memory is shared
+SMAPS_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared_clean",
+    "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean",
+    "Private_Dirty": "private_dirty",
+}
+
+
+def memory_usage(pid: Union[int, str] = "self") -> Dict[str, int]:
+    """
+    Get the memory usage of a process in bytes.
+
+    On Linux this reads ``/proc/<pid>/smaps_rollup``, whose proportional set
+    size (PSS) splits pages shared between processes, such as memory-mapped
+    model weights, evenly across them. Elsewhere only the peak RSS of the
+    current process is available.
+
+    Args:
+        pid: Process id, or "self" for the current process
+
+    Returns:
+        Dictionary of memory figures in bytes
+    """
+    try:
+        usage = {}
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in SMAPS_FIELDS:
+                    usage[SMAPS_FIELDS[name]] = int(value.split()[0]) * 1024
+        return usage
+    except OSError:
+        if pid != "self":
+            return {}
+        return {"rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+def report_memory(role: str, pids: Iterable[int] = ()) -> Dict[int, Dict[str, int]]:
+    """
+    Log and export the memory usage of this process and optional workers.
+
+    Args:
+        role: Name of the current process in the report, e.g. "server"
+        pids: Process ids of worker processes to include
+
+    Returns:
+        Dictionary of memory usage by process id
+    """
+    report = {os.getpid(): memory_usage()}
+    for pid in pids:
+        report[pid] = memory_usage(pid)
+
+    for pid, usage in report.items():
+        process = role if pid == os.getpid() else f"{role}-worker-{pid}"
+        for kind, value in usage.items():
+            PROCESS_MEMORY_BYTES.labels(process, kind).set(value)
+        summary = ", ".join(
+            f"{kind}={value / (1024 * 1024):.1f}MiB" for kind, value in usage.items()
+        )
+        logger.info(f"Memory usage of {process} (pid {pid}): {summary}")
+    return report
@@ -0,0 +1,340 @@
+"""
+Prometheus metrics for the serving application.
+
+When several server processes serve the app, e.g. ``uvicorn --workers``,
+set ``PROMETHEUS_MULTIPROC_DIR`` to an empty directory shared by them: each
+process then writes its samples to files there and a scrape of any process
+aggregates all of them.
+"""
+
+import os
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import HistogramMetricFamily
+from prometheus_client.utils import floatToGoString
+
+from model.config import ModelConfig
+
+# Label of requests that did not match any route, so that arbitrary paths do
+# not create new label values
+UNMATCHED_ROUTE = "unmatched"
+
+
+def parse_buckets(spec: str) -> Tuple[float, ...]:
+    """Parse comma-separated histogram bucket upper bounds in seconds."""
+    return tuple(sorted(float(bound) for bound in spec.split(",") if bound.strip()))
+
+
+def multiprocess_enabled() -> bool:
+    """Whether samples are shared between processes through files."""
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Render the metrics of this process, or of all processes in multiprocess mode.
+
+    Returns:
+        Tuple of (exposition body, content type)
+    """
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop the live gauge samples of a process that has exited."""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
+
+
+class StageHistogram:
+    """Histogram for observations made several times per request.
+
+    Observing a ``prometheus_client`` histogram takes a few microseconds,
+    too much to time every stage of a request that is served in tens of
+    microseconds. This one counts observations in plain lists under a
+    single lock and builds the histogram samples when scraped. In
+    multiprocess mode, where samples must be written to files, it falls
+    back to a ``prometheus_client`` histogram.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float],
+    ):
+        """Create the histogram and register it with the default registry."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = list(labelnames)
+        self.bounds = sorted(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+        self._histogram = None
+        if multiprocess_enabled():
+            self._histogram = Histogram(
+                name, documentation, labelnames, buckets=buckets
+            )
+        else:
+            REGISTRY.register(self)
+
+    def observe(self, labels: Tuple[str, ...], amount: float) -> None:
+        """Observe a value for the label values, in label name order."""
+        if self._histogram is not None:
+            self._histogram.labels(*labels).observe(amount)
+            return
+        index = bisect_left(self.bounds, amount)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Count per bucket, then the +Inf bucket, then the sum
+                series = self._series[labels] = [0] * (len(self.bounds) + 2)
+            series[index] += 1
+            series[-1] += amount
+
+    def collect(self) -> Iterator[HistogramMetricFamily]:
+        """Build the histogram samples of every series."""
+        family = HistogramMetricFamily(
+            self.name, self.documentation, labels=self.labelnames
+        )
+        with self._lock:
+            series = [(labels, list(values)) for labels, values in self._series.items()]
+        for labels, values in series:
+            buckets = []
+            total = 0
+            for bound, count in zip([*self.bounds, float("inf")], values):
+                total += count
+                buckets.append((floatToGoString(bound), total))
+            family.add_metric(list(labels), buckets, values[-1])
+        yield family
+
+
+REQUEST_COUNT = Counter(
+    'http_requests_total', 
+    'Total HTTP Requests', 
+    ['method', 'endpoint', 'http_status']
+    )
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Request latency in seconds', 
+    ['endpoint'],
+    buckets=parse_buckets(ModelConfig.REQUEST_LATENCY_BUCKETS)
+    )
+
+INFERENCE_COUNT = Counter(
+    'inference_requests_total',
+    'Total number of model inference requests',
+    ['model_version', 'status']
+)
+
+INFERENCE_LATENCY = Histogram(
+    'inference_duration_seconds',
+    'Time taken for model inference',
+    ['model_version'],
+    buckets=parse_buckets(ModelConfig.INFERENCE_LATENCY_BUCKETS)
+)
+
+INFERENCE_PREDICTION_DISTRIBUTION = Counter(
+    'prediction_distribution_total',
+    'Count of predictions per predicted class label',
+    ['prediction_label']
+)
+
+MICRO_BATCH_SIZE = Histogram(
+    'micro_batch_size',
+    'Number of coalesced prediction requests per micro-batch',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+
+MICRO_BATCH_QUEUE_WAIT = Histogram(
+    'micro_batch_queue_wait_seconds',
+    'Time a prediction request waits in the micro-batch queue',
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+PREDICTION_CACHE_HITS = Counter(
+    'prediction_cache_hits_total',
+    'Number of predictions served from the prediction cache'
+)
+
+PREDICTION_CACHE_MISSES = Counter(
+    'prediction_cache_misses_total',
+    'Number of prediction cache lookups that required inference'
+)
+
+PREDICTION_CACHE_EVICTIONS = Counter(
+    'prediction_cache_evictions_total',
+    'Number of entries removed from the prediction cache',
+    ['reason']
+)
+
+PROCESS_MEMORY_BYTES = Gauge(
+    'serving_process_memory_bytes',
+    'Memory usage of serving processes reported at startup',
+    ['process', 'kind'],
+    multiprocess_mode='liveall'
+)
+
+MODEL_LOAD_DURATION = Histogram(
+    'model_load_duration_seconds',
+    'Time taken to load, compile and warm up a model version',
+    ['model_version']
+)
+
+MODEL_RESIDENT_BYTES = Gauge(
+    'model_resident_bytes',
+    'Estimated memory held by a model version resident in the registry',
+    ['model_version'],
+    multiprocess_mode='liveall'
+)
+
+MODEL_REGISTRY_EVICTIONS = Counter(
+    'model_registry_evictions_total',
+    'Number of model versions evicted from the registry'
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    'log_records_dropped_total',
+    'Number of log records dropped because the log queue was full'
+)
+
+STARTUP_PHASE_DURATION = Gauge(
+    'startup_phase_duration_seconds',
+    'Time taken by each phase of the server start-up',
+    ['phase'],
+    multiprocess_mode='liveall'
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    'admission_in_flight_requests',
+    'Number of prediction requests admitted and being handled',
+    multiprocess_mode='livesum'
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    'admission_queued_requests',
+    'Number of prediction requests waiting for admission',
+    multiprocess_mode='livesum'
+)
+
+ADMISSION_QUEUE_WAIT = Histogram(
+    'admission_queue_wait_seconds',
+    'Time queued prediction requests waited for admission',
+    buckets=parse_buckets(ModelConfig.REQUEST_LATENCY_BUCKETS)
+)
+
+ADMISSION_REJECTIONS = Counter(
+    'admission_rejections_total',
+    'Number of prediction requests rejected or dropped by admission control',
+    ['reason']
+)
+
+WEBSOCKET_CONNECTIONS = Gauge(
+    'websocket_connections',
+    'Number of open WebSocket prediction connections',
+    multiprocess_mode='livesum'
+)
+
+WEBSOCKET_MESSAGES = Counter(
+    'websocket_messages_total',
+    'Number of WebSocket prediction messages answered',
+    ['outcome']
+)
+
+WEBSOCKET_GROUP_SIZE = Histogram(
+    'websocket_group_size',
+    'Number of WebSocket prediction messages scored per model call',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+
+WEBSOCKET_FLOW_CONTROL_WAITS = Counter(
+    'websocket_flow_control_waits_total',
+    'Number of times a WebSocket connection stopped reading at its in-flight limit'
+)
+
+FEATURE_MEAN = Gauge(
+    'feature_mean',
+    'Mean of each feature over the rows scored by the served model',
+    ['feature'],
+    multiprocess_mode='liveall'
+)
+
+FEATURE_STDDEV = Gauge(
+    'feature_stddev',
+    'Standard deviation of each feature over the rows scored by the served model',
+    ['feature'],
+    multiprocess_mode='liveall'
+)
+
+FEATURE_QUANTILE = Gauge(
+    'feature_quantile',
+    'Quantiles of each feature over the rows scored by the served model',
+    ['feature', 'quantile'],
+    multiprocess_mode='liveall'
+)
+
+DRIFT_PSI = Gauge(
+    'feature_drift_psi',
+    'Population stability index of recent rows of each feature against training',
+    ['feature'],
+    multiprocess_mode='liveall'
+)
+
+PREDICTION_DRIFT_PSI = Gauge(
+    'prediction_drift_psi',
+    'Population stability index of recent predictions against training',
+    multiprocess_mode='liveall'
+)
+
+DRIFT_OBSERVED_ROWS = Counter(
+    'drift_observed_rows_total',
+    'Number of scored rows added to the drift statistics'
+)
+
+CAPTURE_ROWS = Counter(
+    'capture_rows_total',
+    'Number of captured rows written to segment files'
+)
+
+CAPTURE_DROPPED_ROWS = Counter(
+    'capture_dropped_rows_total',
+    'Number of captured rows dropped before they were written to a segment'
+)
+
+CAPTURE_SEGMENTS = Counter(
+    'capture_segments_total',
+    'Number of capture segment files written, by outcome',
+    ['outcome']
+)
+
+REQUEST_STAGE_LATENCY = StageHistogram(
+    'request_stage_duration_seconds',
+    'Time spent in each stage of handling a prediction request',
+    ['endpoint', 'stage'],
+    buckets=parse_buckets(ModelConfig.INFERENCE_LATENCY_BUCKETS)
+)
+
+INFERENCE_STAGE_LATENCY = StageHistogram(
+    'inference_stage_duration_seconds',
+    'Time spent in each stage of scoring rows with the model',
+    ['stage'],
+    buckets=parse_buckets(ModelConfig.INFERENCE_LATENCY_BUCKETS)
+)
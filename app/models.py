@@ -1,7 +1,8 @@
-from typing import List, Optional
+import math
+from typing import Any, List, Optional
 from uuid import uuid4
 
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 
 
 class PredictionRequest(BaseModel):
@@ -15,7 +16,9 @@ class PredictionRequest(BaseModel):
     @field_validator("sepal_length", "sepal_width", "petal_length", "petal_width")
     @classmethod
     def validate_positive(cls, v):
-        """Validate that measurements are positive."""
+        """Validate that measurements are finite and positive."""
+        if not math.isfinite(v):
+            raise ValueError(f"Measurement must be finite, got {v}")
         if v <= 0:
             raise ValueError(f"Measurement must be positive, got {v}")
         return v
@@ -67,3 +70,94 @@ class PredictionResponse(BaseModel):
             },
         }
     }
+
+
+class BatchPredictionRequest(BaseModel):
+    """Input schema for batch prediction requests.
+
+    Rows are kept as raw JSON values so that each one, including rows that
+    are not objects, can be validated on its own and reported by index
+    instead of failing the whole batch.
+    """
+
+    instances: List[Any] = Field(..., min_length=1)
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "instances": [
+                    {
+                        "sepal_length": 5.1,
+                        "sepal_width": 3.5,
+                        "petal_length": 1.4,
+                        "petal_width": 0.2,
+                    },
+                    {
+                        "sepal_length": 6.4,
+                        "sepal_width": 3.2,
+                        "petal_length": 4.5,
+                        "petal_width": 1.5,
+                    },
+                ]
+            },
+            "properties": {
+                "instances": {"description": "Rows of flower measurements"},
+            },
+        }
+    }
+
+
+class BatchPredictionResult(BaseModel):
+    """Prediction for a single row of a batch."""
+
+    index: int
+    prediction: int
+    prediction_label: str
+    probabilities: Optional[List[float]] = None
+
+
+class BatchPredictionError(BaseModel):
+    """Validation error for a single row of a batch."""
+
+    index: int
+    detail: str
+
+
+class BatchPredictionResponse(BaseModel):
+    """Output schema for batch prediction responses."""
+
+    request_id: str = Field(default_factory=lambda: str(uuid4()))
+    model_version: str
+    predictions: List[BatchPredictionResult]
+    errors: List[BatchPredictionError] = []
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "request_id": "123e4567-e89b-12d3-a456-426614174000",
+                "model_version": "1.0.0",
+                "predictions": [
+                    {
+                        "index": 0,
+                        "prediction": 0,
+                        "prediction_label": "setosa",
+                        "probabilities": [0.95, 0.04, 0.01],
+                    }
+                ],
+                "errors": [
+                    {
+                        "index": 1,
+                        "detail": "sepal_length: Measurement must be positive, got -1.0",
+                    }
+                ],
+            },
+            "properties": {
+                "request_id": {"description": "Unique request identifier"},
+                "model_version": {"description": "Model version used for prediction"},
+                "predictions": {
+                    "description": "Predictions for valid rows, in input order"
+                },
+                "errors": {"description": "Validation errors for rejected rows"},
+            },
+        }
+    }
@@ -0,0 +1,133 @@
+"""
+Per-stage latency instrumentation and on-demand profiling of the live process.
+
+Reports are in the collapsed stack format, one ``frame;frame;frame weight``
+line per distinct stack, which flamegraph.pl, speedscope and similar tools
+render as flame graphs.
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from app.metrics import INFERENCE_STAGE_LATENCY, REQUEST_STAGE_LATENCY
+
+# Shortest interval between CPU samples, sampling more often starves the
+# threads being profiled
+MIN_SAMPLE_INTERVAL_MS = 1.0
+
+
+class StageTimer:
+    """Times consecutive stages of handling a request.
+
+    Each ``mark`` records the time since the previous mark, or since the
+    timer was created, as the duration of the named stage.
+    """
+
+    __slots__ = ("route", "_last")
+
+    def __init__(self, route: str):
+        """Start timing the first stage of a request to a route."""
+        self.route = route
+        self._last = time.perf_counter_ns()
+
+    def mark(self, stage: str) -> None:
+        """Record the end of a stage and start the next one."""
+        now = time.perf_counter_ns()
+        REQUEST_STAGE_LATENCY.observe((self.route, stage), (now - self._last) / 1e9)
+        self._last = now
+
+
+def observe_inference_stage(stage: str, started_ns: int) -> int:
+    """
+    Record an inference stage that started at ``started_ns``.
+
+    Returns:
+        The current ``perf_counter_ns``, the start of the next stage
+    """
+    now = time.perf_counter_ns()
+    INFERENCE_STAGE_LATENCY.observe((stage,), (now - started_ns) / 1e9)
+    return now
+
+
+def _frame_name(code) -> str:
+    """Name a stack frame by function and definition site."""
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _collapse(counts: "Counter[str]") -> str:
+    """Render stack counts in the collapsed stack format."""
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+def sample_cpu(seconds: float, interval: float = 0.005) -> str:
+    """
+    Sample the stacks of all threads of this process.
+
+    Blocks the calling thread, which is left out of the samples, so call it
+    off the event loop. The sampled threads run undisturbed between samples.
+    Stacks of threads waiting for work are included, so this is a
+    wall-clock profile. Each stack starts with the name of its thread.
+
+    Args:
+        seconds: How long to sample for
+        interval: Seconds between samples
+
+    Returns:
+        Sample counts per stack in the collapsed stack format
+    """
+    own = threading.get_ident()
+    counts: "Counter[str]" = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return _collapse(counts)
+
+
+def trace_memory(seconds: float, frames: int = 25) -> str:
+    """
+    Trace the memory allocated by this process for a while.
+
+    Tracing slows allocations down noticeably while it runs, and only covers
+    allocations made while it runs.
+
+    Args:
+        seconds: How long to trace allocations for
+        frames: Deepest stack recorded per allocation
+
+    Returns:
+        Bytes still allocated at the end, per allocating stack, in the
+        collapsed stack format
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(frames)
+    try:
+        time.sleep(seconds)
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    sizes: "Counter[str]" = Counter()
+    for statistic in snapshot.statistics("traceback"):
+        stack = [
+            f"{os.path.basename(frame.filename)}:{frame.lineno}"
+            for frame in statistic.traceback
+        ]
+        sizes[";".join(stack)] += statistic.size
+    return _collapse(sizes)
@@ -0,0 +1,183 @@
+"""
+Registry of model versions available in the artifacts directory.
+"""
+
+import glob
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.metrics import (
+    MODEL_LOAD_DURATION,
+    MODEL_REGISTRY_EVICTIONS,
+    MODEL_RESIDENT_BYTES,
+)
+from app.utils import ModelLoader, ModelSnapshot, load_snapshot, model_loader
+from model.artifacts import BUNDLE_METADATA_SUFFIX, bundle_artifact_paths
+from model.config import ModelConfig
+
+logger = logging.getLogger(__name__)
+
+MODEL_PREFIX = "model_pipeline_"
+METADATA_PREFIX = "model_metadata_"
+ARTIFACT_SUFFIX = ".joblib"
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._+-]*$")
+
+
+class ModelVersionNotFoundError(KeyError):
+    """Raised when a requested model version has no artifacts."""
+
+    def __str__(self) -> str:
+        return f"Model version not found: {self.args[0]}"
+
+
+def _estimate_size(model: Any) -> int:
+    """Estimate the memory held by a model from its pickled size."""
+    try:
+        return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+class ModelRegistry:
+    """Lazily loads model versions on demand and keeps the most recent ones.
+
+    Requests without a version, or for the version the loader currently
+    serves, use the loader's snapshot. Other versions are discovered from the
+    ``model_pipeline_{version}.joblib`` / ``model_metadata_{version}.joblib``
+    pairs or ``model_metadata_{version}.json`` bundles written by
+    ``model.train``, loaded on first use and evicted least
+    recently used first once more than ``max_models`` are resident or their
+    estimated size exceeds ``max_bytes`` (0 disables the size budget).
+    """
+
+    def __init__(
+        self,
+        loader: ModelLoader,
+        artifacts_dir: str = ModelConfig.ARTIFACTS_DIR,
+        max_models: int = 3,
+        max_bytes: int = 0,
+    ):
+        """Initialize the model registry."""
+        self.loader = loader
+        self.artifacts_dir = artifacts_dir
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self._models: "OrderedDict[str, ModelSnapshot]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def _artifact_paths(self, version: str) -> Optional[Dict[str, str]]:
+        """Paths of the artifacts of a version, None if they do not exist."""
+        if not VERSION_PATTERN.match(version):
+            return None
+        model_path = os.path.join(
+            self.artifacts_dir, f"{MODEL_PREFIX}{version}{ARTIFACT_SUFFIX}"
+        )
+        metadata_path = os.path.join(
+            self.artifacts_dir, f"{METADATA_PREFIX}{version}{ARTIFACT_SUFFIX}"
+        )
+        if not (os.path.exists(model_path) and os.path.exists(metadata_path)):
+            return bundle_artifact_paths(version, self.artifacts_dir)
+        return {"model_path": model_path, "metadata_path": metadata_path}
+
+    def versions(self) -> List[str]:
+        """Versions with a complete pair of artifacts or a bundle, sorted."""
+        versions = set()
+        for prefix, suffix in (
+            (MODEL_PREFIX, ARTIFACT_SUFFIX),
+            (METADATA_PREFIX, BUNDLE_METADATA_SUFFIX),
+        ):
+            pattern = os.path.join(self.artifacts_dir, f"{prefix}*{suffix}")
+            for path in glob.glob(pattern):
+                version = os.path.basename(path)[len(prefix) : -len(suffix)]
+                if self._artifact_paths(version) is not None:
+                    versions.add(version)
+        return sorted(versions)
+
+    def resident_versions(self) -> List[str]:
+        """Versions currently held by the registry, least recently used first."""
+        with self._lock:
+            return list(self._models)
+
+    def get(self, version: Optional[str] = None) -> ModelSnapshot:
+        """
+        Get the snapshot serving a model version.
+
+        Args:
+            version: Requested model version, None for the latest
+
+        Returns:
+            Loaded model snapshot
+
+        Raises:
+            ModelVersionNotFoundError: If the version has no artifacts
+        """
+        latest = self.loader.snapshot
+        if version is None or version == latest.version:
+            return latest
+
+        with self._lock:
+            snapshot = self._models.get(version)
+            if snapshot is not None:
+                self._models.move_to_end(version)
+                return snapshot
+        if self._artifact_paths(version) is None:
+            raise ModelVersionNotFoundError(version)
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(version, threading.Lock())
+
+        # Load outside the registry lock so other versions keep being served,
+        # concurrent requests for the same version wait for a single load
+        with load_lock:
+            with self._lock:
+                snapshot = self._models.get(version)
+            if snapshot is None:
+                snapshot = self._load(version)
+        return snapshot
+
+    def _load(self, version: str) -> ModelSnapshot:
+        """Load a version and make room for it."""
+        paths = self._artifact_paths(version)
+        if paths is None:
+            raise ModelVersionNotFoundError(version)
+
+        start = time.perf_counter()
+        snapshot = load_snapshot(paths["model_path"], paths["metadata_path"])
+        MODEL_LOAD_DURATION.labels(version).observe(time.perf_counter() - start)
+        size = _estimate_size(snapshot.model)
+        MODEL_RESIDENT_BYTES.labels(version).set(size)
+
+        with self._lock:
+            self._models[version] = snapshot
+            self._sizes[version] = size
+            self._evict()
+        logger.info(f"Registry loaded model version {version} ({size} bytes)")
+        return snapshot
+
+    def _evict(self) -> None:
+        """Evict least recently used versions beyond the count/size budget."""
+        while len(self._models) > 1 and (
+            len(self._models) > self.max_models
+            or (self.max_bytes and sum(self._sizes.values()) > self.max_bytes)
+        ):
+            version, _ = self._models.popitem(last=False)
+            self._sizes.pop(version, None)
+            MODEL_RESIDENT_BYTES.remove(version)
+            MODEL_REGISTRY_EVICTIONS.inc()
+            logger.info(f"Registry evicted model version {version}")
+
+
+# Singleton model registry instance
+model_registry = ModelRegistry(
+    model_loader,
+    max_models=ModelConfig.MODEL_REGISTRY_MAX_MODELS,
+    max_bytes=ModelConfig.MODEL_REGISTRY_MAX_BYTES,
+)
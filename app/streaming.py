@@ -0,0 +1,193 @@
+"""
+Streaming NDJSON bulk scoring with constant memory.
+"""
+
+import json
+import logging
+import time
+from collections import Counter
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from app.metrics import (
+    INFERENCE_COUNT,
+    INFERENCE_LATENCY,
+    INFERENCE_PREDICTION_DISTRIBUTION,
+)
+from app.utils import ModelLoader
+from model.config import ModelConfig
+
+logger = logging.getLogger(__name__)
+
+PredictArrayFn = Callable[
+    [np.ndarray], Awaitable[Tuple[str, np.ndarray, Optional[np.ndarray]]]
+]
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """Streaming response that leaves the request body to the generator.
+
+    ``StreamingResponse`` listens for client disconnects by reading from
+    ``receive`` on ASGI servers older than spec 2.4, which would race the
+    generator for the request body it is still consuming. Disconnects
+    surface as send errors instead.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: int
+) -> AsyncIterator[bytes]:
+    """
+    Split a stream of byte chunks into non-empty lines.
+
+    Only the current partial line is buffered, so memory is bounded by
+    ``max_line_bytes`` regardless of the stream size.
+    """
+    buffer = b""
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        lines = (buffer + chunk).split(b"\n")
+        buffer = lines.pop()
+        if len(buffer) > max_line_bytes:
+            raise ValueError(f"Line exceeds the limit of {max_line_bytes} bytes")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+def parse_rows(lines: List[bytes]) -> Tuple[np.ndarray, Dict[int, str]]:
+    """
+    Parse NDJSON feature rows into a feature matrix.
+
+    Args:
+        lines: JSON objects with the fields in ``ModelConfig.FEATURE_NAMES``
+
+    Returns:
+        Tuple of (N x F feature matrix, validation errors by row position)
+    """
+    X = np.full((len(lines), len(ModelConfig.FEATURE_NAMES)), np.nan)
+    errors = {}
+    for position, line in enumerate(lines):
+        try:
+            row = json.loads(line)
+            X[position] = [row[name] for name in ModelConfig.FEATURE_NAMES]
+        except KeyError as e:
+            errors[position] = f"{e.args[0]}: Field required"
+        except (ValueError, TypeError) as e:
+            errors[position] = f"Invalid row: {str(e)}"
+
+    # Check all rows at once, then describe the failing ones. NaN and
+    # infinity are accepted by json.loads but would yield NaN probabilities
+    finite = np.isfinite(X)
+    invalid = ~(finite & (X > 0)).all(axis=1)
+    for position in np.flatnonzero(invalid):
+        if position in errors:
+            continue
+        if not finite[position].all():
+            column = int(np.argmin(finite[position]))
+            reason = "Measurement must be finite"
+        else:
+            column = int(np.argmin(X[position] > 0))
+            reason = "Measurement must be positive"
+        errors[int(position)] = (
+            f"{ModelConfig.FEATURE_NAMES[column]}: {reason}, got {X[position, column]}"
+        )
+    return X, errors
+
+
+async def score_chunk(
+    lines: List[bytes], offset: int, predict_array: PredictArrayFn
+) -> bytes:
+    """Score a chunk of NDJSON rows with one model call and encode the results."""
+    X, errors = parse_rows(lines)
+    valid = [position for position in range(len(lines)) if position not in errors]
+
+    output = {
+        position: {"index": offset + position, "error": detail}
+        for position, detail in errors.items()
+    }
+    version = "unknown"
+    if valid:
+        start = time.perf_counter()
+        version, predictions, probabilities = await predict_array(X[valid])
+        INFERENCE_LATENCY.labels(version).observe(time.perf_counter() - start)
+        INFERENCE_COUNT.labels(version, "success").inc(len(valid))
+
+        labels = [ModelLoader.label_for(int(p)) for p in predictions]
+        probabilities = (
+            probabilities.tolist() if probabilities is not None else [None] * len(valid)
+        )
+        for position, prediction, label, row_probabilities in zip(
+            valid, predictions.tolist(), labels, probabilities
+        ):
+            output[position] = {
+                "index": offset + position,
+                "prediction": prediction,
+                "prediction_label": label,
+                "model_version": version,
+                "probabilities": row_probabilities,
+            }
+        for label, count in Counter(labels).items():
+            INFERENCE_PREDICTION_DISTRIBUTION.labels(label).inc(count)
+    if errors:
+        INFERENCE_COUNT.labels(version, "error").inc(len(errors))
+
+    return b"".join(
+        json.dumps(output[position]).encode() + b"\n" for position in range(len(lines))
+    )
+
+
+async def score_ndjson(
+    chunks: AsyncIterator[bytes],
+    predict_array: PredictArrayFn,
+    chunk_size: int = 1024,
+    max_line_bytes: int = 65536,
+) -> AsyncIterator[bytes]:
+    """
+    Score an NDJSON stream of feature rows in fixed-size chunks.
+
+    Rows are read, scored and written back one chunk at a time, so the
+    response is produced as fast as the client consumes it and the request
+    body is only read as results are drained.
+
+    Args:
+        chunks: Request body chunks
+        predict_array: Coroutine scoring a feature matrix
+        chunk_size: Number of rows scored per model call
+        max_line_bytes: Longest accepted NDJSON line
+
+    Yields:
+        NDJSON encoded results, one line per input row in input order
+    """
+    offset = 0
+    lines: List[bytes] = []
+    try:
+        async for line in iter_lines(chunks, max_line_bytes):
+            lines.append(line)
+            if len(lines) >= chunk_size:
+                yield await score_chunk(lines, offset, predict_array)
+                offset += len(lines)
+                lines = []
+        if lines:
+            yield await score_chunk(lines, offset, predict_array)
+    except Exception as e:
+        # The response has already started, report the failure in-band
+        logger.error(f"Error scoring prediction stream: {str(e)}")
+        yield json.dumps({"index": offset, "error": str(e)}).encode() + b"\n"
@@ -2,62 +2,262 @@
 Utility functions for model loading and prediction.
 """
 
+import json
 import logging
 import os
+import threading
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-import joblib
 import numpy as np
 
+from app.cache import PredictionCache
+from app.compiled import (
+    CompiledPipeline,
+    compile_arrays,
+    compile_pipeline,
+    map_compiled,
+)
+from app.drift import DriftMonitor
+from app.profiling import observe_inference_stage
+from model.artifacts import read_bundle, read_pointer
 from model.config import ModelConfig
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class ModelSnapshot:
+    """Immutable view of a loaded model, its metadata and artifact path.
+
+    Requests read the loader's snapshot once and use it throughout, so a
+    concurrent reload can never pair a new model with an old version label.
+    """
+
+    model: Any = None
+    model_info: Dict[str, Any] = field(
+        default_factory=lambda: {
+            "version": "none",
+            "feature_names": ModelConfig.FEATURE_NAMES,
+        }
+    )
+    model_path: Optional[str] = None
+    compiled: Optional[CompiledPipeline] = None
+
+    @property
+    def version(self) -> str:
+        """Version label of the model."""
+        return self.model_info.get("version", "unknown")
+
+    def predict_array(self, X: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Make predictions for an N x F feature matrix.
+
+        Args:
+            X: Feature matrix with columns in ``ModelConfig.FEATURE_NAMES`` order
+
+        Returns:
+            Tuple of (prediction classes, probabilities or None)
+        """
+        if self.model is None:
+            raise ValueError("No model loaded. Please train a model first.")
+
+        # Derive the classes from the probabilities when available, so the
+        # model is only evaluated once per batch
+        if self.compiled is not None:
+            probabilities = self.compiled.predict_proba(X)
+            return self.compiled.classes_[probabilities.argmax(axis=1)], probabilities
+
+        if hasattr(self.model, "predict_proba"):
+            try:
+                probabilities = self.model.predict_proba(X)
+            except Exception:
+                logger.warning("Could not get prediction probabilities")
+            else:
+                indices = probabilities.argmax(axis=1)
+                classes = getattr(self.model, "classes_", None)
+                predictions = classes[indices] if classes is not None else indices
+                return predictions, probabilities
+
+        return self.model.predict(X), None
+
+
+def _compile(model: Any) -> Optional[CompiledPipeline]:
+    """Compile the model for NumPy inference if enabled and supported."""
+    if ModelConfig.INFERENCE_MODE != "compiled":
+        return None
+    try:
+        compiled = compile_pipeline(model, dtype=ModelConfig.COMPILED_DTYPE)
+    except Exception as e:
+        logger.warning(f"Could not compile model, using sklearn: {str(e)}")
+        return None
+    if compiled is None:
+        logger.info("Model not supported by compiled inference, using sklearn")
+    return compiled
+
+
+def load_bundle_snapshot(bundle_path: str, metadata_path: str) -> ModelSnapshot:
+    """
+    Load and warm up a model bundle written by ``model.artifacts``.
+
+    Reads a manifest and a few small arrays, with neither unpickling nor
+    sklearn, and serves them with compiled inference whatever
+    ``INFERENCE_MODE`` is.
+
+    Args:
+        bundle_path: Directory of the bundle
+        metadata_path: Path of the JSON model metadata
+
+    Returns:
+        Snapshot ready to serve requests
+    """
+    logger.info(f"Loading model bundle from {bundle_path}")
+    manifest, arrays = read_bundle(bundle_path)
+    if manifest.get("kind") != "linear":
+        raise ValueError(f"Unsupported model bundle kind: {manifest.get('kind')}")
+    with open(metadata_path) as f:
+        model_info = json.load(f)
+    compiled = compile_arrays(
+        arrays, manifest["link"], dtype=ModelConfig.COMPILED_DTYPE
+    )
+    snapshot = ModelSnapshot(
+        model=compiled,
+        model_info=model_info,
+        model_path=bundle_path,
+        compiled=compiled,
+    )
+    snapshot.predict_array(np.ones((1, len(ModelConfig.FEATURE_NAMES))))
+    return snapshot
+
+
+def load_snapshot(model_path: str, metadata_path: str) -> ModelSnapshot:
+    """
+    Load, compile and warm up a model artifact.
+
+    Args:
+        model_path: Path of the pickled model pipeline, or of a bundle
+        metadata_path: Path of the pickled model metadata
+
+    Returns:
+        Snapshot ready to serve requests
+    """
+    if os.path.isdir(model_path):
+        return load_bundle_snapshot(model_path, metadata_path)
+
+    # Imported on first load, keeping joblib and the sklearn modules pulled
+    # in by unpickling out of the application import
+    import joblib
+
+    logger.info(f"Loading model from {model_path}")
+    model = joblib.load(model_path, mmap_mode=ModelConfig.MODEL_MMAP_MODE)
+    model_info = joblib.load(metadata_path)
+    compiled = _compile(model)
+    if compiled is not None and ModelConfig.MODEL_MMAP_MODE:
+        # The compiled path evaluates folded copies of the weights, map those
+        # too so that they are shared like the rest of the artifact
+        try:
+            compiled = map_compiled(compiled, os.path.splitext(model_path)[0])
+        except OSError as e:
+            logger.warning(f"Could not map compiled weights: {str(e)}")
+    snapshot = ModelSnapshot(
+        model=model,
+        model_info=model_info,
+        model_path=model_path,
+        compiled=compiled,
+    )
+
+    # Run a synthetic prediction so first-call costs are paid before the
+    # snapshot starts serving requests
+    snapshot.predict_array(np.ones((1, len(ModelConfig.FEATURE_NAMES))))
+    return snapshot
+
+
 class ModelLoader:
-    """Handles loading and managing ML model."""
+    """Handles loading and managing ML model.
+
+    No model is loaded on construction: the server loads it during start-up
+    with ``reload_model``, so importing the application stays cheap.
+    """
 
     def __init__(self):
         """Initialize model loader."""
-        self.model = None
-        self.model_info = None
-        self.model_path = None
-        self._load_latest_model()
+        self._snapshot = ModelSnapshot()
+        self._reload_lock = threading.Lock()
+        self.cache = None
+        if ModelConfig.PREDICTION_CACHE_ENABLED:
+            self.cache = PredictionCache(
+                max_size=ModelConfig.PREDICTION_CACHE_SIZE,
+                ttl_seconds=ModelConfig.PREDICTION_CACHE_TTL_SECONDS,
+                precision=ModelConfig.PREDICTION_CACHE_PRECISION,
+            )
+        self.drift = None
+        if ModelConfig.DRIFT_ENABLED:
+            self.drift = DriftMonitor(
+                ModelConfig.FEATURE_NAMES,
+                buffer_rows=ModelConfig.DRIFT_BUFFER_ROWS,
+                half_life_rows=ModelConfig.DRIFT_HALF_LIFE_ROWS,
+                min_rows=ModelConfig.DRIFT_MIN_ROWS,
+                psi_threshold=ModelConfig.DRIFT_PSI_THRESHOLD,
+            )
+
+    @property
+    def snapshot(self) -> ModelSnapshot:
+        """The currently served model snapshot."""
+        return self._snapshot
+
+    @snapshot.setter
+    def snapshot(self, snapshot: ModelSnapshot) -> None:
+        """Atomically swap the served model snapshot."""
+        self._snapshot = snapshot
+        if self.cache is not None:
+            self.cache.clear()
+        if self.drift is not None:
+            self.drift.reset(
+                snapshot.version, snapshot.model_info.get("reference_statistics")
+            )
+
+    @property
+    def model(self) -> Any:
+        """The currently served model."""
+        return self._snapshot.model
+
+    @property
+    def model_info(self) -> Dict[str, Any]:
+        """Metadata of the currently served model."""
+        return self._snapshot.model_info
+
+    @property
+    def model_path(self) -> Optional[str]:
+        """Artifact path of the currently served model."""
+        return self._snapshot.model_path
+
+    @property
+    def compiled(self) -> Optional[CompiledPipeline]:
+        """Compiled form of the currently served model, if any."""
+        return self._snapshot.compiled
 
     def _load_latest_model(self) -> None:
         """Load the latest model version."""
         try:
             # Check if latest version info exists
             if os.path.exists(ModelConfig.LATEST_VERSION_PATH):
-                latest_info = joblib.load(ModelConfig.LATEST_VERSION_PATH)
-                model_path = latest_info["model_path"]
-                metadata_path = latest_info["metadata_path"]
+                latest_info = read_pointer()
 
-                # Log model being loaded
-                logger.info(f"Loading model from {model_path}")
-
-                # Load model and metadata
-                self.model = joblib.load(model_path)
-                self.model_info = joblib.load(metadata_path)
-                self.model_path = model_path
-
-                logger.info(
-                    f"Model loaded successfully. Version: {self.model_info['version']}"
+                # Fully load the new model before swapping it in, requests
+                # keep being served by the current snapshot meanwhile
+                snapshot = load_snapshot(
+                    latest_info["model_path"], latest_info["metadata_path"]
                 )
+                self.snapshot = snapshot
+
+                logger.info(f"Model loaded successfully. Version: {snapshot.version}")
             else:
                 logger.warning(
                     "No model version info found. Please train a model first."
                 )
-                self.model = None
-                self.model_info = {
-                    "version": "none",
-                    "feature_names": ModelConfig.FEATURE_NAMES,
-                }
+                self.snapshot = ModelSnapshot()
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}")
             raise
@@ -65,7 +265,8 @@ class ModelLoader:
     def reload_model(self) -> bool:
         """Reload the model (e.g., after a new version is trained)."""
         try:
-            self._load_latest_model()
+            with self._reload_lock:
+                self._load_latest_model()
             return True
         except Exception as e:
             logger.error(f"Failed to reload model: {str(e)}")
@@ -81,36 +282,81 @@ class ModelLoader:
         Returns:
             Tuple of (prediction class, class label, probabilities)
         """
-        if self.model is None:
-            raise ValueError("No model loaded. Please train a model first.")
+        return self.predict_batch([features])[0]
 
-        # Extract features in the correct order
-        feature_values = [features[name] for name in ModelConfig.FEATURE_NAMES]
-        X = np.array([feature_values])
+    def predict_batch(
+        self, rows: List[Dict[str, float]], snapshot: Optional[ModelSnapshot] = None
+    ) -> List[Tuple[int, str, List[float]]]:
+        """
+        Make predictions for a batch of rows with a single model call.
 
-        # Make prediction
-        prediction = int(self.model.predict(X)[0])
+        Args:
+            rows: List of dictionaries of feature names and values
+            snapshot: Model snapshot to use, defaults to the current one
 
-        # Get probabilities if available
-        probabilities = None
-        if hasattr(self.model, "predict_proba"):
-            try:
-                probabilities = self.model.predict_proba(X)[0].tolist()
-            except:
-                logger.warning("Could not get prediction probabilities")
+        Returns:
+            List of (prediction class, class label, probabilities) tuples,
+            in the same order as the input rows
+        """
+        snapshot = snapshot or self._snapshot
+        if not rows:
+            return []
 
-        # Get label
-        if prediction < len(ModelConfig.PREDICTION_LABELS):
-            label = ModelConfig.PREDICTION_LABELS[prediction]
+        # Extract features in the correct order
+        started = time.perf_counter_ns()
+        values = [[row[name] for name in ModelConfig.FEATURE_NAMES] for row in rows]
+        started = observe_inference_stage("features", started)
+        results: List[Any] = [None] * len(rows)
+        keys = None
+        missing = range(len(rows))
+        if self.cache is not None:
+            keys, results = self.cache.get_many(snapshot.version, values)
+            missing = [index for index, result in enumerate(results) if result is None]
+            started = observe_inference_stage("cache", started)
+            if not missing:
+                return results
+
+        # Score the remaining rows as one N x F matrix
+        if keys is not None:
+            values = [values[index] for index in missing]
+        X = np.array(values, dtype=np.float64)
+        predictions, probabilities = snapshot.predict_array(X)
+        started = observe_inference_stage("model", started)
+        if probabilities is not None:
+            probabilities = probabilities.tolist()
         else:
-            label = f"unknown_{prediction}"
+            probabilities = [None] * len(missing)
 
-        return prediction, label, probabilities
+        for index, prediction, row_probabilities in zip(
+            missing, predictions, probabilities
+        ):
+            prediction = int(prediction)
+            result = (prediction, self.label_for(prediction), row_probabilities)
+            results[index] = result
+            if keys is not None:
+                self.cache.put(keys[index], result)
+        observe_inference_stage("results", started)
+
+        return results
+
+    def predict_array(
+        self, X: np.ndarray, snapshot: Optional[ModelSnapshot] = None
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Make predictions for an N x F feature matrix."""
+        return (snapshot or self._snapshot).predict_array(X)
+
+    @staticmethod
+    def label_for(prediction: int) -> str:
+        """Map a numeric prediction to its class label."""
+        if prediction < len(ModelConfig.PREDICTION_LABELS):
+            return ModelConfig.PREDICTION_LABELS[prediction]
+        return f"unknown_{prediction}"
 
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the currently loaded model."""
-        if self.model_info:
-            return self.model_info
+        model_info = self._snapshot.model_info
+        if model_info:
+            return model_info
         return {"status": "No model loaded", "version": "none"}
 
 
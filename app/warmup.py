@@ -0,0 +1,83 @@
+"""
+Start-up phase timing and warm-up of the serving path.
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from app.metrics import STARTUP_PHASE_DURATION
+from model.config import ModelConfig
+
+logger = logging.getLogger(__name__)
+
+# Rows per synthetic batch, covering the batched code paths
+WARMUP_BATCH_SIZE = 64
+
+
+def process_uptime() -> Optional[float]:
+    """Seconds since this process started, None where it is unknown."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the parenthesized command name, the start time in
+            # clock ticks after boot is field 22 of the whole line
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def record_phase(phase: str, seconds: float) -> None:
+    """Export and log the duration of a start-up phase."""
+    STARTUP_PHASE_DURATION.labels(phase).set(seconds)
+    logger.info("Start-up phase %s took %.3fs", phase, seconds)
+
+
+@contextmanager
+def startup_phase(phase: str) -> Iterator[None]:
+    """Time a start-up phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - start)
+
+
+def synthetic_rows(count: int, seed: int = 0) -> List[Dict[str, float]]:
+    """Random valid measurement rows for warm-up predictions."""
+    rng = np.random.default_rng(seed)
+    values = rng.uniform(0.1, 8.0, size=(count, len(ModelConfig.FEATURE_NAMES)))
+    return [dict(zip(ModelConfig.FEATURE_NAMES, row)) for row in values.tolist()]
+
+
+async def warm_up(
+    predict_batch: Callable[[List[Dict[str, float]]], Awaitable],
+    predict_array: Callable[[np.ndarray], Awaitable],
+    requests: int,
+) -> None:
+    """
+    Run synthetic predictions through the serving path.
+
+    Single rows, batches and feature matrices are scored the way requests
+    are, so the first real requests do not pay for lazy imports, allocator
+    growth or starting pool workers.
+
+    Args:
+        predict_batch: Coroutine scoring a list of rows
+        predict_array: Coroutine scoring a feature matrix
+        requests: Number of single-row predictions to run
+    """
+    rows = synthetic_rows(max(requests, WARMUP_BATCH_SIZE))
+    for row in rows[:requests]:
+        await predict_batch([row])
+    await predict_batch(rows[:WARMUP_BATCH_SIZE])
+    X = np.array(
+        [[row[name] for name in ModelConfig.FEATURE_NAMES] for row in rows]
+    )
+    await predict_array(X[:WARMUP_BATCH_SIZE])
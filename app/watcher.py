@@ -0,0 +1,74 @@
+"""
+Automatic model reloads when a new model version is published.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ModelWatcher:
+    """Polls the latest version pointer by mtime and reloads on change.
+
+    A failed reload, e.g. while the pointer is still being written, is
+    retried on the next poll.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        reload: Callable[[], Awaitable[bool]],
+        interval: float = 5.0,
+    ):
+        """Initialize the model watcher."""
+        self.path = path
+        self.interval = interval
+        self._reload = reload
+        self._mtime = self._current_mtime()
+        self._task: Optional[asyncio.Task] = None
+
+    def _current_mtime(self) -> Optional[int]:
+        """Modification time of the watched file, None if it does not exist."""
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def start(self) -> None:
+        """Start polling on the running event loop."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"Watching {self.path} for new models every {self.interval}s")
+
+    async def stop(self) -> None:
+        """Stop polling."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def check(self) -> bool:
+        """Reload the model if the watched file changed since the last check."""
+        mtime = self._current_mtime()
+        if mtime is None or mtime == self._mtime:
+            return False
+        logger.info(f"Detected new model version pointer at {self.path}, reloading")
+        if not await self._reload():
+            return False
+        self._mtime = mtime
+        return True
+
+    async def _run(self) -> None:
+        """Poll the watched file until stopped."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Error checking for a new model: {str(e)}")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Per-request CPU cost of decoding, validating and encoding predictions.
+
+Compares the pydantic path FastAPI used for ``/predict`` and
+``/predict/batch`` (parse into the request model, ``model_dump``, build and
+serialize the response model) with the fast path in ``app.codec``. Model
+inference is excluded, it is the same for both.
+
+Usage:
+    python -m benchmarks.bench_codec [--iterations N] [--batch-size N]
+"""
+
+import argparse
+import json
+import time
+from typing import Callable, Dict
+
+from app.codec import (
+    decode_body,
+    decode_instances,
+    decode_prediction,
+    decode_rows,
+    dumps,
+    new_request_id,
+)
+from app.models import (
+    BatchPredictionRequest,
+    BatchPredictionResponse,
+    BatchPredictionResult,
+    PredictionRequest,
+    PredictionResponse,
+)
+from model.config import ModelConfig
+
+ROW = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+RESULT = (0, "setosa", [0.979, 0.021, 1.6e-07])
+
+
+def pydantic_single(body: bytes) -> bytes:
+    """Single-row request through the pydantic models."""
+    request = PredictionRequest.model_validate_json(body)
+    features = request.model_dump()
+    [features[name] for name in ModelConfig.FEATURE_NAMES]
+    prediction, label, probabilities = RESULT
+    response = PredictionResponse(
+        prediction=prediction,
+        prediction_label=label,
+        model_version="1.0.0",
+        probabilities=probabilities,
+    )
+    return response.model_dump_json().encode()
+
+
+def fast_single(body: bytes) -> bytes:
+    """Single-row request through the fast path."""
+    decode_prediction(decode_body(body))
+    prediction, label, probabilities = RESULT
+    return dumps(
+        {
+            "prediction": prediction,
+            "prediction_label": label,
+            "request_id": new_request_id(),
+            "model_version": "1.0.0",
+            "probabilities": probabilities,
+        }
+    )
+
+
+def pydantic_batch(body: bytes) -> bytes:
+    """Batch request through the pydantic models."""
+    request = BatchPredictionRequest.model_validate_json(body)
+    rows = [
+        PredictionRequest.model_validate(row).model_dump()
+        for row in request.instances
+    ]
+    [[row[name] for name in ModelConfig.FEATURE_NAMES] for row in rows]
+    prediction, label, probabilities = RESULT
+    response = BatchPredictionResponse(
+        model_version="1.0.0",
+        predictions=[
+            BatchPredictionResult(
+                index=index,
+                prediction=prediction,
+                prediction_label=label,
+                probabilities=probabilities,
+            )
+            for index in range(len(rows))
+        ],
+    )
+    return response.model_dump_json().encode()
+
+
+def fast_batch(body: bytes) -> bytes:
+    """Batch request through the fast path."""
+    indices, rows, _ = decode_rows(decode_instances(decode_body(body)))
+    prediction, label, probabilities = RESULT
+    return dumps(
+        {
+            "request_id": new_request_id(),
+            "model_version": "1.0.0",
+            "predictions": [
+                {
+                    "index": index,
+                    "prediction": prediction,
+                    "prediction_label": label,
+                    "probabilities": probabilities,
+                }
+                for index in indices
+            ],
+            "errors": [],
+        }
+    )
+
+
+def cpu_per_call(fn: Callable[[bytes], bytes], body: bytes, iterations: int) -> float:
+    """CPU seconds per call, after a warm-up."""
+    for _ in range(min(iterations, 100)):
+        fn(body)
+    start = time.process_time()
+    for _ in range(iterations):
+        fn(body)
+    return (time.process_time() - start) / iterations
+
+
+def run(iterations: int = 20000, batch_size: int = 100) -> Dict[str, Dict[str, float]]:
+    """
+    Benchmark both paths for single-row and batch requests.
+
+    Returns:
+        Microseconds of CPU per request, by request kind and path
+    """
+    single = json.dumps(ROW).encode()
+    batch = json.dumps({"instances": [ROW] * batch_size}).encode()
+    batch_iterations = max(1, iterations // batch_size)
+    return {
+        "single": {
+            "pydantic_us": cpu_per_call(pydantic_single, single, iterations) * 1e6,
+            "fast_us": cpu_per_call(fast_single, single, iterations) * 1e6,
+        },
+        f"batch_{batch_size}": {
+            "pydantic_us": cpu_per_call(pydantic_batch, batch, batch_iterations) * 1e6,
+            "fast_us": cpu_per_call(fast_batch, batch, batch_iterations) * 1e6,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark request decoding and encoding."
+    )
+    parser.add_argument(
+        "--iterations", type=int, default=20000, help="Single-row requests per path"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=100, help="Rows per batch request"
+    )
+    args = parser.parse_args()
+    for kind, timings in run(args.iterations, args.batch_size).items():
+        speedup = timings["pydantic_us"] / timings["fast_us"]
+        print(
+            f"{kind:>10}: pydantic {timings['pydantic_us']:8.1f}us  "
+            f"fast {timings['fast_us']:8.1f}us  ({speedup:.1f}x)"
+        )
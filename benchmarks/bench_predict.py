@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Latency of ``ModelLoader.predict`` and ``predict_batch`` alone.
+
+Scores rows with the latest trained model directly, without HTTP, request
+validation or the inference executor, to isolate the cost of inference.
+
+Usage:
+    python -m benchmarks.bench_predict [--iterations N] [--batch-size N]
+"""
+
+import argparse
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.utils import ModelLoader
+from benchmarks.loadgen import PERCENTILES
+
+ROW = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+
+
+def time_calls(fn: Callable[[], object], iterations: int) -> Dict[str, float]:
+    """
+    Time calls of a function, after a warm-up.
+
+    Returns:
+        Dictionary of calls per second and latency percentiles in microseconds
+    """
+    for _ in range(min(iterations, 100)):
+        fn()
+    timings: List[int] = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        fn()
+        timings.append(time.perf_counter_ns() - start)
+
+    values = np.array(timings) / 1000
+    report = {"calls_per_second": 1e6 / values.mean()}
+    for name, percentile in PERCENTILES.items():
+        report[f"{name}_us"] = float(np.percentile(values, percentile))
+    return report
+
+
+def run(iterations: int = 5000, batch_size: int = 100) -> Dict[str, Dict[str, float]]:
+    """
+    Benchmark single-row and batch predictions with the latest model.
+
+    Returns:
+        Timings by benchmark name
+    """
+    loader = ModelLoader()
+    loader.cache = None
+    if not loader.reload_model() or loader.model is None:
+        raise RuntimeError("No model loaded. Please train a model first.")
+
+    rows = [ROW] * batch_size
+    return {
+        "predict": time_calls(lambda: loader.predict(ROW), iterations),
+        f"predict_batch_{batch_size}": time_calls(
+            lambda: loader.predict_batch(rows), max(1, iterations // 10)
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark model inference alone.")
+    parser.add_argument(
+        "--iterations", type=int, default=5000, help="Single-row predictions"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=100, help="Rows per batch prediction"
+    )
+    args = parser.parse_args()
+    for name, timings in run(args.iterations, args.batch_size).items():
+        print(
+            f"{name:>18}: {timings['calls_per_second']:10.0f} calls/s  "
+            f"p50 {timings['p50_us']:8.1f}us  p99 {timings['p99_us']:8.1f}us"
+        )
@@ -0,0 +1,149 @@
+"""
+Async HTTP load generator reporting throughput and latency percentiles.
+
+Two modes are supported:
+
+- closed loop: ``concurrency`` clients each send a request as soon as their
+  previous one completed, measuring the throughput the server sustains.
+- open loop: requests are started at a fixed ``rate`` whatever the server
+  does. Latency is measured from the time a request was scheduled, so a
+  stalled server shows up in the tail instead of slowing the generator down
+  (coordinated omission).
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+PERCENTILES = {"p50": 50, "p95": 95, "p99": 99, "p999": 99.9}
+
+
+@dataclass
+class Endpoint:
+    """A request to send repeatedly."""
+
+    method: str
+    path: str
+    json: Optional[Any] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> Dict[str, float]:
+    """
+    Summarize request latencies.
+
+    Args:
+        latencies: Latency of every request in seconds
+        errors: Number of failed requests
+        seconds: Wall-clock duration of the run
+
+    Returns:
+        Dictionary of request count, errors, throughput and latency
+        percentiles in milliseconds
+    """
+    report = {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": seconds,
+        "throughput_rps": len(latencies) / seconds if seconds > 0 else 0.0,
+    }
+    values = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    for name, percentile in PERCENTILES.items():
+        report[f"{name}_ms"] = float(np.percentile(values, percentile))
+    report["max_ms"] = float(values.max())
+    return report
+
+
+async def _send(
+    client: httpx.AsyncClient, endpoint: Endpoint, started: float
+) -> Optional[float]:
+    """Send a request, returning its latency since ``started`` or None on error."""
+    try:
+        response = await client.request(
+            endpoint.method, endpoint.path, json=endpoint.json, headers=endpoint.headers
+        )
+    except httpx.HTTPError:
+        return None
+    latency = time.perf_counter() - started
+    return latency if response.status_code < 400 else None
+
+
+async def run_closed_loop(
+    client: httpx.AsyncClient,
+    endpoint: Endpoint,
+    concurrency: int,
+    requests: int,
+    warmup: int = 0,
+) -> Dict[str, float]:
+    """
+    Send ``requests`` requests from ``concurrency`` clients in parallel.
+
+    Args:
+        client: HTTP client bound to the server
+        endpoint: Request to send
+        concurrency: Number of requests in flight at any time
+        requests: Number of measured requests
+        warmup: Number of requests sent before measuring
+    """
+    for _ in range(warmup):
+        await _send(client, endpoint, time.perf_counter())
+
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            latency = await _send(client, endpoint, time.perf_counter())
+            if latency is None:
+                errors += 1
+            else:
+                latencies.append(latency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def run_open_loop(
+    client: httpx.AsyncClient,
+    endpoint: Endpoint,
+    rate: float,
+    duration: float,
+    warmup: int = 0,
+) -> Dict[str, float]:
+    """
+    Start requests at a fixed rate for a duration.
+
+    Args:
+        client: HTTP client bound to the server
+        endpoint: Request to send
+        rate: Requests started per second
+        duration: Seconds to send requests for
+        warmup: Number of requests sent before measuring
+    """
+    for _ in range(warmup):
+        await _send(client, endpoint, time.perf_counter())
+
+    interval = 1.0 / rate
+    tasks = []
+    start = time.perf_counter()
+    for index in range(int(rate * duration)):
+        scheduled = start + index * interval
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(_send(client, endpoint, scheduled)))
+    results = await asyncio.gather(*tasks)
+    seconds = time.perf_counter() - start
+
+    latencies = [latency for latency in results if latency is not None]
+    report = summarize(latencies, len(results) - len(latencies), seconds)
+    report["target_rps"] = rate
+    return report
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Replay of captured traffic against a server or a model version.
+
+Streams the segments written by ``app.capture`` back, a segment at a time
+and one row per request, at the pace the rows were captured
+(``--speed 1``), N times faster (``--speed N``) or as fast as
+``--concurrency`` requests in flight allow (``--speed 0``). Requests are
+started on schedule whatever the target does, and latency is measured from
+the scheduled time, as in the open loop of ``benchmarks.loadgen``.
+
+Targets:
+
+- ``http``: a running instance at ``--url``
+- ``inprocess``: the app served in this process, without network
+- ``loader``: the model loaded directly with ``ModelLoader``, measuring
+  inference alone
+
+Every replayed prediction is compared with the captured one. Changes are
+reported by pair of captured and replayed model versions, so replaying
+against ``--version`` shows how a new version would have answered the
+traffic the current one served.
+
+Usage:
+    python -m benchmarks.replay [--capture-dir DIR]
+        [--target http|inprocess|loader] [--url URL] [--version VERSION]
+        [--speed N] [--concurrency N] [--limit N] [--output FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import httpx
+import numpy as np
+
+from app.capture import ROW_COLUMNS, list_segments, read_segment
+from benchmarks.loadgen import summarize
+from model.config import ModelConfig
+
+# Scores a row, returning (model version, prediction, probabilities or None)
+ScoreFn = Callable[[List[float]], Awaitable[Tuple[str, int, Optional[List[float]]]]]
+
+
+def read_captured(
+    directory: str, limit: Optional[int] = None
+) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Read the segments of a capture directory, oldest first.
+
+    Args:
+        directory: Capture directory
+        limit: Rows to read at most, None for all
+
+    Yields:
+        Columns of each segment, see ``app.capture.read_segment``
+    """
+    remaining = limit
+    for path in list_segments(directory):
+        if remaining is not None and remaining <= 0:
+            return
+        segment = read_segment(path)
+        if list(segment["feature_names"]) != ModelConfig.FEATURE_NAMES:
+            raise ValueError(f"Segment {path} has other features than the model")
+        if remaining is not None:
+            for name in ROW_COLUMNS:
+                segment[name] = segment[name][:remaining]
+            remaining -= len(segment["prediction"])
+        yield segment
+
+
+def summarize_diffs(
+    transitions: "Counter[Tuple[str, str, int, int]]",
+    probability_deltas: Dict[Tuple[str, str], float],
+) -> Dict[str, Any]:
+    """
+    Summarize how replayed predictions differ from the captured ones.
+
+    Args:
+        transitions: Rows by (captured version, replayed version, captured
+            prediction, replayed prediction)
+        probability_deltas: Largest absolute difference of a class
+            probability by (captured version, replayed version)
+
+    Returns:
+        Rows, changed rows and change rate, overall and by pair of
+        versions, with the count of each change of prediction
+    """
+    versions: Dict[str, Dict[str, Any]] = {}
+    for (captured, replayed, before, after), count in sorted(transitions.items()):
+        entry = versions.setdefault(
+            f"{captured} -> {replayed}",
+            {"rows": 0, "changed": 0, "changes": {}},
+        )
+        entry["rows"] += count
+        if before != after:
+            entry["changed"] += count
+            entry["changes"][f"{before} -> {after}"] = count
+    for (captured, replayed), delta in probability_deltas.items():
+        versions[f"{captured} -> {replayed}"]["max_probability_delta"] = delta
+    rows = sum(entry["rows"] for entry in versions.values())
+    changed = sum(entry["changed"] for entry in versions.values())
+    return {
+        "rows": rows,
+        "changed": changed,
+        "change_rate": changed / rows if rows else 0.0,
+        "versions": versions,
+    }
+
+
+async def replay(
+    segments: Iterable[Dict[str, np.ndarray]],
+    score: ScoreFn,
+    speed: float = 1.0,
+    concurrency: int = 64,
+) -> Dict[str, Any]:
+    """
+    Replay captured rows and compare the predictions.
+
+    Args:
+        segments: Captured segments, oldest first
+        score: Coroutine scoring a row against the target
+        speed: Pace relative to the capture, 0 for as fast as possible
+        concurrency: Requests in flight at most
+
+    Returns:
+        Latency report of ``benchmarks.loadgen.summarize``, with the
+        prediction differences under ``diffs``
+    """
+    slots = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+    transitions: "Counter[Tuple[str, str, int, int]]" = Counter()
+    probability_deltas: Dict[Tuple[str, str], float] = {}
+    tasks = set()
+
+    async def send(
+        values: List[float],
+        scheduled: float,
+        captured_version: str,
+        captured_prediction: int,
+        captured_probabilities: List[float],
+    ) -> None:
+        nonlocal errors
+        try:
+            version, prediction, probabilities = await score(values)
+        except Exception:
+            errors += 1
+            return
+        finally:
+            slots.release()
+        latencies.append(time.perf_counter() - scheduled)
+        transitions[captured_version, version, captured_prediction, prediction] += 1
+        # Probabilities are NaN if the captured model gave none
+        if probabilities is not None and not math.isnan(captured_probabilities[0]):
+            delta = max(
+                abs(a - b) for a, b in zip(probabilities, captured_probabilities)
+            )
+            key = (captured_version, version)
+            probability_deltas[key] = max(probability_deltas.get(key, 0.0), delta)
+
+    start = time.perf_counter()
+    origin: Optional[float] = None
+    for segment in segments:
+        versions = segment["versions"].tolist()
+        for timestamp, values, prediction, probabilities, version in zip(
+            segment["timestamp"].tolist(),
+            segment["features"].tolist(),
+            segment["prediction"].tolist(),
+            segment["probabilities"].tolist(),
+            segment["version"].tolist(),
+        ):
+            if speed > 0:
+                if origin is None:
+                    origin = timestamp
+                scheduled = start + (timestamp - origin) / speed
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await slots.acquire()
+            else:
+                await slots.acquire()
+                scheduled = time.perf_counter()
+            task = asyncio.create_task(
+                send(values, scheduled, versions[version], prediction, probabilities)
+            )
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    seconds = time.perf_counter() - start
+
+    report: Dict[str, Any] = summarize(latencies, errors, seconds)
+    report["speed"] = speed
+    report["diffs"] = summarize_diffs(transitions, probability_deltas)
+    return report
+
+
+def http_scorer(client: httpx.AsyncClient, version: Optional[str] = None) -> ScoreFn:
+    """Score rows with the predict endpoint of a server."""
+    headers = {ModelConfig.MODEL_VERSION_HEADER: version} if version else {}
+
+    async def score(values: List[float]) -> Tuple[str, int, Optional[List[float]]]:
+        response = await client.post(
+            "/api/v1/predict",
+            json=dict(zip(ModelConfig.FEATURE_NAMES, values)),
+            headers=headers,
+        )
+        response.raise_for_status()
+        body = response.json()
+        return body["model_version"], body["prediction"], body.get("probabilities")
+
+    return score
+
+
+def loader_scorer(version: Optional[str] = None) -> ScoreFn:
+    """Score rows with a model version loaded in this process."""
+    from app.registry import model_registry
+
+    if not model_registry.loader.reload_model():
+        raise RuntimeError("No model to replay against")
+    snapshot = model_registry.get(version)
+
+    async def score(values: List[float]) -> Tuple[str, int, Optional[List[float]]]:
+        predictions, probabilities = snapshot.predict_array(np.array([values]))
+        return (
+            snapshot.version,
+            int(predictions[0]),
+            probabilities[0].tolist() if probabilities is not None else None,
+        )
+
+    return score
+
+
+@asynccontextmanager
+async def target_scorer(args: argparse.Namespace) -> AsyncIterator[ScoreFn]:
+    """Scorer of the target chosen on the command line."""
+    if args.target == "loader":
+        yield loader_scorer(args.version)
+        return
+    if args.target == "inprocess":
+        from benchmarks.run import inprocess_server
+
+        async with inprocess_server(args.concurrency) as client:
+            yield http_scorer(client, args.version)
+        return
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+        yield http_scorer(client, args.version)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Replay the capture directory against the target."""
+    async with target_scorer(args) as score:
+        return await replay(
+            read_captured(args.capture_dir, args.limit),
+            score,
+            speed=args.speed,
+            concurrency=args.concurrency,
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Replay captured traffic, returning the process exit code."""
+    parser = argparse.ArgumentParser(description="Replay captured traffic.")
+    parser.add_argument(
+        "--capture-dir",
+        type=str,
+        default=ModelConfig.CAPTURE_DIR,
+        help="Directory of the capture segments",
+    )
+    parser.add_argument(
+        "--target", choices=["http", "inprocess", "loader"], default="http"
+    )
+    parser.add_argument(
+        "--url",
+        type=str,
+        default="http://127.0.0.1:8000",
+        help="Server of the http target",
+    )
+    parser.add_argument(
+        "--version",
+        type=str,
+        default=None,
+        help="Model version to replay against, latest if omitted",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Pace relative to the capture, 0 for as fast as possible",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=64, help="Requests in flight at most"
+    )
+    parser.add_argument(
+        "--limit", type=int, default=None, help="Rows to replay at most"
+    )
+    parser.add_argument(
+        "--output", type=str, default=None, help="JSON file to write the report to"
+    )
+    args = parser.parse_args(argv)
+
+    if not list_segments(args.capture_dir):
+        print(f"No capture segments in {args.capture_dir}")
+        return 1
+    # The replayed rows are not captured again, nor logged one by one
+    os.environ["CAPTURE_ENABLED"] = "false"
+    ModelConfig.CAPTURE_ENABLED = False
+    if "LOG_SAMPLE_RATE" not in os.environ:
+        os.environ["LOG_SAMPLE_RATE"] = "0"
+        ModelConfig.LOG_SAMPLE_RATE = 0
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    report = asyncio.run(run(args))
+    diffs = report["diffs"]
+    print(
+        f"replay/{args.target}: {report['requests']} rows, "
+        f"{report['throughput_rps']:.0f} req/s, p50 {report['p50_ms']:.2f}ms, "
+        f"p99 {report['p99_ms']:.2f}ms, p999 {report['p999_ms']:.2f}ms, "
+        f"{report['errors']} errors"
+    )
+    for versions, entry in diffs["versions"].items():
+        print(f"{versions}: {entry['changed']} of {entry['rows']} predictions changed")
+
+    output = args.output or os.path.join(
+        "benchmarks",
+        "results",
+        f"replay-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.json",
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "created": datetime.now(timezone.utc).isoformat(),
+                "settings": vars(args),
+                "report": report,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Report written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite of the serving path.
+
+Drives the predict, health and metrics endpoints of the app served
+in-process (ASGI, no network) and/or by uvicorn over loopback, runs the
+inference and codec microbenchmarks, and writes all results as JSON. Given
+a baseline file, results are compared against it and the run fails on
+regressions beyond the thresholds.
+
+Usage:
+    python -m benchmarks.run [--server inprocess|uvicorn|all]
+        [--mode closed|open] [--concurrency N] [--requests N]
+        [--rate RPS] [--duration SECONDS]
+        [--output FILE] [--baseline FILE] [--threshold FRACTION]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from benchmarks import bench_codec, bench_predict
+from benchmarks.loadgen import Endpoint, run_closed_loop, run_open_loop
+from model.config import ModelConfig
+
+ENDPOINTS = {
+    "predict": Endpoint("POST", "/api/v1/predict", json=bench_predict.ROW),
+    "health": Endpoint("GET", "/api/v1/health"),
+    "metrics": Endpoint("GET", "/api/v1/metrics"),
+}
+
+# Metrics compared against the baseline: whether higher values are better,
+# and whether they are tail latencies held to the looser threshold
+CHECKED_METRICS = {
+    "throughput_rps": (True, False),
+    "calls_per_second": (True, False),
+    "p50_ms": (False, False),
+    "p50_us": (False, False),
+    "p99_ms": (False, True),
+    "p99_us": (False, True),
+    "pydantic_us": (False, False),
+    "fast_us": (False, False),
+}
+
+
+async def _wait_ready(client: httpx.AsyncClient, timeout: float = 120) -> None:
+    """Wait until the server reports ready."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            response = await client.get("/api/v1/health/ready")
+            if response.status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutError("Server did not become ready")
+        await asyncio.sleep(0.1)
+
+
+@asynccontextmanager
+async def inprocess_server(concurrency: int) -> AsyncIterator[httpx.AsyncClient]:
+    """Serve the app in this process, through its lifespan, without network."""
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://inprocess"
+        ) as client:
+            await _wait_ready(client)
+            yield client
+
+
+@asynccontextmanager
+async def uvicorn_server(concurrency: int) -> AsyncIterator[httpx.AsyncClient]:
+    """Serve the app with uvicorn in a subprocess, over loopback."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=os.environ,
+    )
+    try:
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", limits=limits
+        ) as client:
+            await _wait_ready(client)
+            yield client
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+SERVERS = {"inprocess": inprocess_server, "uvicorn": uvicorn_server}
+
+
+async def run_load(args: argparse.Namespace, server: str) -> Dict[str, Any]:
+    """Drive every endpoint of one server setup."""
+    results = {}
+    async with SERVERS[server](args.concurrency) as client:
+        for name, endpoint in ENDPOINTS.items():
+            if args.mode == "open":
+                report = await run_open_loop(
+                    client, endpoint, args.rate, args.duration, warmup=args.warmup
+                )
+            else:
+                report = await run_closed_loop(
+                    client,
+                    endpoint,
+                    args.concurrency,
+                    args.requests,
+                    warmup=args.warmup,
+                )
+            print(
+                f"{server}/{name}: {report['throughput_rps']:.0f} req/s, "
+                f"p50 {report['p50_ms']:.2f}ms, p99 {report['p99_ms']:.2f}ms, "
+                f"p999 {report['p999_ms']:.2f}ms, {report['errors']} errors"
+            )
+            results[f"{server}/{name}"] = report
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+    tail_threshold: float,
+) -> List[str]:
+    """
+    Compare benchmark results against a baseline.
+
+    Args:
+        results: Metrics by benchmark name
+        baseline: Baseline metrics by benchmark name
+        threshold: Allowed relative regression of throughput and medians
+        tail_threshold: Allowed relative regression of tail latencies
+
+    Returns:
+        Descriptions of the metrics that regressed beyond their threshold
+    """
+    regressions = []
+    for name, metrics in results.items():
+        for metric, (higher_is_better, is_tail) in CHECKED_METRICS.items():
+            before = baseline.get(name, {}).get(metric)
+            after = metrics.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            allowed = tail_threshold if is_tail else threshold
+            if (-change if higher_is_better else change) > allowed:
+                regressions.append(
+                    f"{name} {metric}: {before:.4g} -> {after:.4g} ({change:+.1%})"
+                )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the suite, returning the process exit code."""
+    parser = argparse.ArgumentParser(description="Benchmark the serving path.")
+    parser.add_argument(
+        "--server", choices=["inprocess", "uvicorn", "all"], default="all"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["closed", "open"],
+        default="closed",
+        help="Fixed concurrency or fixed request rate",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="Requests in flight in closed-loop mode",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=2000,
+        help="Requests per endpoint in closed-loop mode",
+    )
+    parser.add_argument(
+        "--rate", type=float, default=200, help="Requests per second in open-loop mode"
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=10,
+        help="Seconds per endpoint in open-loop mode",
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=100, help="Unmeasured requests per endpoint"
+    )
+    parser.add_argument(
+        "--skip-micro", action="store_true", help="Skip the microbenchmarks"
+    )
+    parser.add_argument(
+        "--output", type=str, default=None, help="JSON file to write the results to"
+    )
+    parser.add_argument(
+        "--baseline", type=str, default=None, help="JSON results to compare against"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Allowed regression of throughput and medians",
+    )
+    parser.add_argument(
+        "--tail-threshold",
+        type=float,
+        default=0.25,
+        help="Allowed regression of p99 latencies",
+    )
+    args = parser.parse_args(argv)
+
+    # Request records would flood the output, set LOG_SAMPLE_RATE to
+    # include the cost of request logging
+    if "LOG_SAMPLE_RATE" not in os.environ:
+        os.environ["LOG_SAMPLE_RATE"] = "0"
+        ModelConfig.LOG_SAMPLE_RATE = 0
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    results: Dict[str, Dict[str, float]] = {}
+    if not args.skip_micro:
+        for name, timings in bench_predict.run().items():
+            results[f"micro/{name}"] = timings
+        for name, timings in bench_codec.run().items():
+            results[f"codec/{name}"] = timings
+        for name in results:
+            print(f"{name}: {json.dumps(results[name])}")
+    servers = list(SERVERS) if args.server == "all" else [args.server]
+    for server in servers:
+        results.update(asyncio.run(run_load(args, server)))
+
+    output = args.output or os.path.join(
+        "benchmarks",
+        "results",
+        f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.json",
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "created": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "settings": vars(args),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold, args.tail_threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
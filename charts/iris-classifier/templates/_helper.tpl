@@ -64,9 +64,9 @@ timeoutSeconds: {{ .Values.probes.liveness.timeoutSeconds }}
 failureThreshold: {{ .Values.probes.liveness.failureThreshold }}
 {{- else }}
 httpGet:
-  path: /api/v1/health
+  path: /api/v1/health/live
   port: {{ .Values.route.port }}
-initialDelaySeconds: 30
+initialDelaySeconds: 10
 periodSeconds: 30
 timeoutSeconds: 5
 failureThreshold: 3
@@ -87,10 +87,10 @@ timeoutSeconds: {{ .Values.probes.readiness.timeoutSeconds }}
 failureThreshold: {{ .Values.probes.readiness.failureThreshold }}
 {{- else }}
 httpGet:
-  path: /api/v1/health
+  path: /api/v1/health/ready
   port: {{ .Values.route.port }}
-initialDelaySeconds: 30
-periodSeconds: 30
+initialDelaySeconds: 2
+periodSeconds: 5
 timeoutSeconds: 5
 failureThreshold: 3
 {{- end }}
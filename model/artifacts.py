@@ -0,0 +1,296 @@
+"""
+Model artifact storage shared by training, serving and offline scoring.
+
+Besides pickled pipelines, linear models can be stored as a bundle: one
+``.npy`` file per parameter array plus a JSON manifest, in
+``{ARTIFACTS_DIR}/bundles/{digest}`` where the digest is the SHA-256 of the
+manifest, which holds the digest of every array. Identical retrains hence
+share one bundle, and loading one reads a few small files without
+unpickling or importing sklearn. The metadata of each version is written to
+``model_metadata_{version}.json`` and names its bundle.
+
+Every file is written to a temporary name and renamed into place, so
+readers on a shared volume never see a partial file.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Any, Callable, Dict, IO, Optional, Tuple
+
+import numpy as np
+
+from model.config import ModelConfig
+
+BUNDLE_FORMAT = 1
+BUNDLES_DIR = "bundles"
+MANIFEST_NAME = "manifest.json"
+METADATA_PREFIX = "model_metadata_"
+BUNDLE_METADATA_SUFFIX = ".json"
+
+# Link functions of the linear classifiers a bundle can hold
+SOFTMAX = "softmax"
+OVR = "ovr"
+
+
+def _digest(array: np.ndarray) -> str:
+    """SHA-256 of the values of an array."""
+    return hashlib.sha256(np.ascontiguousarray(array).tobytes()).hexdigest()
+
+
+def write_atomic(path: str, write: Callable[[IO[bytes]], Any]) -> None:
+    """
+    Write a file under a temporary name and rename it into place.
+
+    Args:
+        path: Destination path, replaced atomically if it exists
+        write: Function writing the content to a binary file object
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}."
+    )
+    try:
+        # Readable by servers running as other users of a shared volume
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_json_atomic(path: str, data: Dict[str, Any]) -> None:
+    """Write a JSON file atomically."""
+    write_atomic(path, lambda f: f.write(json.dumps(data, indent=2).encode()))
+
+
+def write_pointer(info: Dict[str, Any], path: Optional[str] = None) -> None:
+    """
+    Point ``ModelConfig.LATEST_VERSION_PATH`` at a model version atomically.
+
+    The pointer is a plain pickle, which ``joblib.load`` reads as well.
+    """
+    path = path or ModelConfig.LATEST_VERSION_PATH
+    write_atomic(path, lambda f: pickle.dump(info, f))
+
+
+def read_pointer(path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Read the latest version pointer.
+
+    Read with pickle, so that serving a bundle does not import joblib, which
+    is only the fallback for pointers pickle cannot read.
+    """
+    path = path or ModelConfig.LATEST_VERSION_PATH
+    with open(path, "rb") as f:
+        try:
+            return pickle.load(f)
+        except Exception:
+            pass
+    import joblib
+
+    return joblib.load(path)
+
+
+def write_bundle(
+    arrays: Dict[str, np.ndarray],
+    manifest: Dict[str, Any],
+    artifacts_dir: Optional[str] = None,
+) -> Tuple[str, str]:
+    """
+    Store parameter arrays and their manifest as a content-addressed bundle.
+
+    Args:
+        arrays: Parameter arrays by name
+        manifest: JSON-serializable description of how to use the arrays
+        artifacts_dir: Artifacts directory, defaults to ``ModelConfig.ARTIFACTS_DIR``
+
+    Returns:
+        Tuple of (bundle digest, bundle directory), the directory is only
+        written if no identical bundle exists
+    """
+    artifacts_dir = artifacts_dir or ModelConfig.ARTIFACTS_DIR
+    manifest = {
+        **manifest,
+        "format": BUNDLE_FORMAT,
+        "arrays": {
+            name: {
+                "file": f"{name}.npy",
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+                "sha256": _digest(array),
+            }
+            for name, array in sorted(arrays.items())
+        },
+    }
+    content = json.dumps(manifest, indent=2, sort_keys=True).encode()
+    digest = hashlib.sha256(content).hexdigest()
+    bundles_dir = os.path.join(artifacts_dir, BUNDLES_DIR)
+    directory = os.path.join(bundles_dir, digest)
+    if os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+        return digest, directory
+
+    os.makedirs(bundles_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{digest}.", dir=bundles_dir)
+    try:
+        os.chmod(staging, 0o755)
+        for name, array in arrays.items():
+            np.save(os.path.join(staging, f"{name}.npy"), array, allow_pickle=False)
+        with open(os.path.join(staging, MANIFEST_NAME), "wb") as f:
+            f.write(content)
+        try:
+            os.rename(staging, directory)
+        except OSError:
+            # An identical bundle was written concurrently
+            if not os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return digest, directory
+
+
+def read_bundle(
+    directory: str, mmap_mode: Optional[str] = None
+) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Read a bundle written by ``write_bundle``, checking the array digests.
+
+    Args:
+        directory: Bundle directory
+        mmap_mode: ``numpy.load`` memory-map mode, None to read the arrays
+
+    Returns:
+        Tuple of (manifest, arrays by name)
+
+    Raises:
+        ValueError: If the bundle format is unknown or an array is corrupt
+    """
+    with open(os.path.join(directory, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported bundle format: {manifest.get('format')}")
+    arrays = {}
+    for name, spec in manifest["arrays"].items():
+        array = np.load(
+            os.path.join(directory, spec["file"]),
+            mmap_mode=mmap_mode,
+            allow_pickle=False,
+        )
+        if _digest(array) != spec["sha256"]:
+            raise ValueError(f"Array {name} of bundle {directory} is corrupt")
+        arrays[name] = array
+    return manifest, arrays
+
+
+def bundle_metadata_path(version: str, artifacts_dir: Optional[str] = None) -> str:
+    """Path of the JSON metadata of a bundled model version."""
+    return os.path.join(
+        artifacts_dir or ModelConfig.ARTIFACTS_DIR,
+        f"{METADATA_PREFIX}{version}{BUNDLE_METADATA_SUFFIX}",
+    )
+
+
+def bundle_artifact_paths(
+    version: str, artifacts_dir: Optional[str] = None
+) -> Optional[Dict[str, str]]:
+    """
+    Paths of the bundle and metadata of a model version.
+
+    Returns:
+        Dictionary of ``model_path`` (the bundle directory) and
+        ``metadata_path``, None if the version is not bundled
+    """
+    artifacts_dir = artifacts_dir or ModelConfig.ARTIFACTS_DIR
+    metadata_path = bundle_metadata_path(version, artifacts_dir)
+    try:
+        with open(metadata_path) as f:
+            digest = json.load(f)["bundle"]
+    except (OSError, ValueError, KeyError):
+        return None
+    model_path = os.path.join(artifacts_dir, BUNDLES_DIR, digest)
+    if not os.path.exists(os.path.join(model_path, MANIFEST_NAME)):
+        return None
+    return {"model_path": model_path, "metadata_path": metadata_path}
+
+
+def _link_for(classifier: Any) -> Optional[str]:
+    """Return the link function an sklearn linear classifier uses, if known."""
+    from sklearn.linear_model import LogisticRegression, SGDClassifier
+
+    n_classes = len(classifier.classes_)
+    if isinstance(classifier, LogisticRegression):
+        if n_classes <= 2:
+            return OVR
+        multi_class = getattr(classifier, "multi_class", "auto")
+        if multi_class == "ovr" or (
+            multi_class in ("auto", "deprecated", "warn")
+            and classifier.solver == "liblinear"
+            and hasattr(classifier, "multi_class")
+        ):
+            return OVR
+        return SOFTMAX
+    if isinstance(classifier, SGDClassifier) and classifier.loss in ("log_loss", "log"):
+        return OVR
+    return None
+
+
+def linear_arrays(model: Any) -> Optional[Tuple[Dict[str, np.ndarray], str]]:
+    """
+    Extract the parameters of a fitted ``StandardScaler -> linear classifier``.
+
+    Args:
+        model: Fitted sklearn estimator or pipeline
+
+    Returns:
+        Tuple of (arrays ``mean``, ``scale``, ``coef``, ``intercept`` and
+        ``classes``, link function), or None if the model is not supported
+    """
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if not isinstance(model, Pipeline):
+        return None
+
+    steps = [
+        estimator
+        for _, estimator in model.steps
+        if estimator is not None and estimator != "passthrough"
+    ]
+    if len(steps) == 2 and isinstance(steps[0], StandardScaler):
+        scaler, classifier = steps
+    elif len(steps) == 1:
+        scaler, classifier = None, steps[0]
+    else:
+        return None
+
+    if not hasattr(classifier, "coef_") or not hasattr(classifier, "classes_"):
+        return None
+    link = _link_for(classifier)
+    if link is None:
+        return None
+
+    coef = np.asarray(classifier.coef_, dtype=np.float64)
+    intercept = np.broadcast_to(
+        np.asarray(classifier.intercept_, dtype=np.float64), (coef.shape[0],)
+    ).copy()
+    mean = np.zeros(coef.shape[1])
+    scale = np.ones(coef.shape[1])
+    if scaler is not None:
+        if scaler.with_mean:
+            mean = np.asarray(scaler.mean_, dtype=np.float64)
+        if scaler.with_std:
+            scale = np.asarray(scaler.scale_, dtype=np.float64)
+    arrays = {
+        "mean": mean,
+        "scale": scale,
+        "coef": coef,
+        "intercept": intercept,
+        "classes": np.asarray(classifier.classes_),
+    }
+    return arrays, link
@@ -26,6 +26,178 @@ class ModelConfig:
     MODEL_NAME = "iris_classifier"
     DEFAULT_MODEL_PATH = os.path.join(ARTIFACTS_DIR, "model_pipeline_latest.joblib")
     PREDICTION_LABELS = ["setosa", "versicolor", "virginica"]
+    MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+
+    # NDJSON streaming: rows scored per model call and longest accepted line
+    STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1024"))
+    STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", "65536"))
+
+    # Artifact format written by training: "joblib" pickles the pipeline,
+    # "bundle" stores the parameters of linear pipelines as .npy files plus
+    # a JSON manifest, content-addressed and loaded without unpickling
+    # (other pipelines are still pickled)
+    ARTIFACT_FORMAT = os.getenv("ARTIFACT_FORMAT", "joblib")
+
+    # Memory-map model arrays (e.g. "r" for read-only) so that all worker
+    # processes share one physical copy of the weights through the page cache.
+    # This includes separately started uvicorn/gunicorn workers, which cannot
+    # inherit a model preloaded before fork. With compiled inference the
+    # folded weights are written next to the artifact and mapped as well.
+    # Artifacts must not be rewritten in place while they are mapped.
+    MODEL_MMAP_MODE = os.getenv("MODEL_MMAP_MODE") or None
+
+    # Poll LATEST_VERSION_PATH every N seconds and reload the model when it
+    # changes (0 disables the watcher)
+    MODEL_WATCH_INTERVAL_SECONDS = float(os.getenv("MODEL_WATCH_INTERVAL_SECONDS", "0"))
+
+    # Registry of additional model versions routed to per request, at most
+    # MODEL_REGISTRY_MAX_MODELS (and MODEL_REGISTRY_MAX_BYTES if set) are
+    # kept resident besides the latest model
+    MODEL_REGISTRY_MAX_MODELS = int(os.getenv("MODEL_REGISTRY_MAX_MODELS", "3"))
+    MODEL_REGISTRY_MAX_BYTES = int(os.getenv("MODEL_REGISTRY_MAX_BYTES", "0"))
+    MODEL_VERSION_HEADER = "X-Model-Version"
+
+    # Inference mode: "compiled" evaluates supported linear pipelines with
+    # plain NumPy and falls back to sklearn otherwise, "sklearn" always uses
+    # the pipeline as loaded
+    INFERENCE_MODE = os.getenv("INFERENCE_MODE", "compiled")
+    COMPILED_DTYPE = os.getenv("COMPILED_DTYPE", "float64")
+
+    # Prediction result cache (opt-in); precision rounds feature values to
+    # that many decimals before keying, unset keys on the exact values
+    PREDICTION_CACHE_ENABLED = (
+        os.getenv("PREDICTION_CACHE_ENABLED", "false").lower() == "true"
+    )
+    PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+    PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "300"))
+    PREDICTION_CACHE_PRECISION = (
+        int(os.environ["PREDICTION_CACHE_PRECISION"])
+        if os.getenv("PREDICTION_CACHE_PRECISION")
+        else None
+    )
+
+    # Inference execution: "inline" runs on the event loop, "thread" and
+    # "process" dispatch to a pool of INFERENCE_WORKERS workers with at most
+    # INFERENCE_MAX_QUEUE requests waiting
+    INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "inline")
+    INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0")) or os.cpu_count()
+    INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "1024"))
+    INFERENCE_START_METHOD = os.getenv("INFERENCE_START_METHOD", "")
+
+    # Micro-batching of concurrent single-row requests (opt-in)
+    MICRO_BATCH_ENABLED = os.getenv("MICRO_BATCH_ENABLED", "false").lower() == "true"
+    MICRO_BATCH_WINDOW_MS = float(os.getenv("MICRO_BATCH_WINDOW_MS", "2"))
+    MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "64"))
+    MICRO_BATCH_ADAPTIVE = os.getenv("MICRO_BATCH_ADAPTIVE", "true").lower() == "true"
     
+    # Logging: records are written by a background thread, as JSON lines
+    # unless LOG_FORMAT is "text", and dropped once LOG_QUEUE_SIZE records
+    # are waiting. Request/response records are sampled per route with
+    # LOG_SAMPLE_RATES, e.g. "predict=0.01,predict/batch=0.1", routes not
+    # listed use LOG_SAMPLE_RATE
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+    LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+    # Training data is read through a binary copy of DATA_PATH, keyed by the
+    # hash of its content and memory-mapped, instead of parsing the CSV on
+    # every run
+    DATASET_CACHE_ENABLED = os.getenv("DATASET_CACHE_ENABLED", "true").lower() == "true"
+    DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", os.path.join(DATA_DIR, "cache"))
+
+    # Training: "batch" fits LogisticRegression on DATA_PATH in memory,
+    # "streaming" reads it in chunks of TRAIN_CHUNK_SIZE rows, fits the
+    # scaler in one pass and an SGD classifier over TRAIN_EPOCHS passes, and
+    # evaluates on the TRAIN_HOLDOUT_FRACTION of rows held out
+    TRAIN_MODE = os.getenv("TRAIN_MODE", "batch")
+    TRAIN_CHUNK_SIZE = int(os.getenv("TRAIN_CHUNK_SIZE", "100000"))
+    TRAIN_EPOCHS = int(os.getenv("TRAIN_EPOCHS", "10"))
+    TRAIN_HOLDOUT_FRACTION = float(os.getenv("TRAIN_HOLDOUT_FRACTION", "0.2"))
+
+    # Model selection of batch training: "grid" or "random" search over the
+    # candidate estimators and hyperparameters of TRAIN_SEARCH_SPACE (a JSON
+    # file of param grids, the built-in space if unset) with TRAIN_CV_FOLDS
+    # fold cross-validation on TRAIN_N_JOBS processes (-1 for all cores),
+    # "none" fits LogisticRegression. With early stopping, candidates are
+    # raced by successive halving, only the best see all the rows
+    TRAIN_SEARCH = os.getenv("TRAIN_SEARCH", "grid")
+    TRAIN_SEARCH_SPACE = os.getenv("TRAIN_SEARCH_SPACE", "")
+    TRAIN_SEARCH_CANDIDATES = int(os.getenv("TRAIN_SEARCH_CANDIDATES", "20"))
+    TRAIN_SEARCH_EARLY_STOPPING = (
+        os.getenv("TRAIN_SEARCH_EARLY_STOPPING", "true").lower() == "true"
+    )
+    TRAIN_CV_FOLDS = int(os.getenv("TRAIN_CV_FOLDS", "5"))
+    TRAIN_N_JOBS = int(os.getenv("TRAIN_N_JOBS", "-1"))
+
+    # WebSocket prediction channel: rows read and not yet answered per
+    # connection, and rows scored per model call at most
+    WS_MAX_IN_FLIGHT = int(os.getenv("WS_MAX_IN_FLIGHT", "256"))
+    WS_MAX_GROUP_SIZE = int(os.getenv("WS_MAX_GROUP_SIZE", "64"))
+
+    # Drift monitoring: statistics of the scored rows are updated every
+    # DRIFT_BUFFER_ROWS rows and compared with the reference saved at
+    # training, the PSI weighs rows down by half every DRIFT_HALF_LIFE_ROWS
+    # rows and is reported once DRIFT_MIN_ROWS recent rows were seen
+    DRIFT_ENABLED = os.getenv("DRIFT_ENABLED", "true").lower() == "true"
+    DRIFT_BUFFER_ROWS = int(os.getenv("DRIFT_BUFFER_ROWS", "256"))
+    DRIFT_HALF_LIFE_ROWS = float(os.getenv("DRIFT_HALF_LIFE_ROWS", "10000"))
+    DRIFT_MIN_ROWS = int(os.getenv("DRIFT_MIN_ROWS", "100"))
+    DRIFT_PSI_THRESHOLD = float(os.getenv("DRIFT_PSI_THRESHOLD", "0.2"))
+
+    # Capture of scored rows to segment files in CAPTURE_DIR, for replay
+    # (opt-in). Calls are sampled at CAPTURE_SAMPLE_RATE and buffered in
+    # memory, up to CAPTURE_BUFFER_ROWS rows, then written out every
+    # CAPTURE_FLUSH_INTERVAL_SECONDS or CAPTURE_SEGMENT_ROWS rows. Only the
+    # last CAPTURE_MAX_SEGMENTS segments are kept (0 keeps all)
+    CAPTURE_ENABLED = os.getenv("CAPTURE_ENABLED", "false").lower() == "true"
+    CAPTURE_DIR = os.getenv("CAPTURE_DIR", os.path.join(DATA_DIR, "capture"))
+    CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", "1"))
+    CAPTURE_BUFFER_ROWS = int(os.getenv("CAPTURE_BUFFER_ROWS", "65536"))
+    CAPTURE_SEGMENT_ROWS = int(os.getenv("CAPTURE_SEGMENT_ROWS", "8192"))
+    CAPTURE_FLUSH_INTERVAL_SECONDS = float(
+        os.getenv("CAPTURE_FLUSH_INTERVAL_SECONDS", "5")
+    )
+    CAPTURE_MAX_SEGMENTS = int(os.getenv("CAPTURE_MAX_SEGMENTS", "100"))
+
+    # Admission control of the prediction routes: at most
+    # ADMISSION_MAX_IN_FLIGHT requests are handled at once (0 disables it),
+    # up to ADMISSION_MAX_QUEUE more wait for ADMISSION_QUEUE_TIMEOUT_MS at
+    # most, the rest are rejected with 429/503 and Retry-After. Clients may
+    # send a time budget in milliseconds in DEADLINE_HEADER, requests past it
+    # are dropped before inference
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64"))
+    ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "128"))
+    ADMISSION_QUEUE_TIMEOUT_MS = float(
+        os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "100")
+    )
+    ADMISSION_RETRY_AFTER_SECONDS = int(
+        os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1")
+    )
+    DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+    # Synthetic single-row predictions run at start-up before the server
+    # reports ready (0 disables the warm-up)
+    WARMUP_REQUESTS = int(os.getenv("WARMUP_REQUESTS", "100"))
+
+    # On-demand CPU/memory profiling endpoint (opt-in), requests must send
+    # PROFILING_TOKEN in the X-Profiling-Token header, and the endpoint
+    # stays disabled without one
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+    PROFILING_MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", "60"))
+
+    # Histogram bucket upper bounds in seconds, inference buckets resolve
+    # the sub-millisecond latencies of compiled inference
+    INFERENCE_LATENCY_BUCKETS = os.getenv(
+        "INFERENCE_LATENCY_BUCKETS",
+        "0.00005,0.0001,0.00025,0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,1",
+    )
+    REQUEST_LATENCY_BUCKETS = os.getenv(
+        "REQUEST_LATENCY_BUCKETS",
+        "0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10",
+    )
+
     # Feature names (for API validation)
     FEATURE_NAMES = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
\ No newline at end of file
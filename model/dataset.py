@@ -0,0 +1,231 @@
+"""
+Binary cache of training datasets.
+
+The first read of a CSV file converts it, chunk by chunk, to one ``.npy``
+file per column group (features and targets) under
+``ModelConfig.DATASET_CACHE_DIR``, keyed by the SHA-256 of the CSV content.
+Later reads memory-map those files instead of parsing the CSV again, and a
+changed CSV hashes to a new key, so stale copies are never read.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from model.config import ModelConfig
+
+logger = logging.getLogger(__name__)
+
+# Version of the cache layout, part of every key
+CACHE_FORMAT = 1
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Features and targets of a labelled dataset."""
+
+    X: np.ndarray
+    y: np.ndarray
+    feature_names: List[str]
+    target_names: List[Any]
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's content, read in blocks."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _convert(path: str, directory: str, chunk_size: int) -> Dict[str, Any]:
+    """
+    Convert a labelled CSV file to ``.npy`` files in a directory.
+
+    Chunks are appended to raw files first, so only one chunk is in memory,
+    and then copied behind ``.npy`` headers once the row count is known.
+
+    Returns:
+        Metadata of the converted dataset
+    """
+    start = time.perf_counter()
+    rows = 0
+    feature_names: List[str] = []
+    dtypes: Dict[str, np.dtype] = {"X": np.dtype(np.float64)}
+    targets = set()
+    raw = {
+        name: open(os.path.join(directory, f"{name}.raw"), "wb") for name in ("X", "y")
+    }
+    try:
+        for chunk in pd.read_csv(path, chunksize=chunk_size):
+            features = chunk.drop(columns="target")
+            feature_names = features.columns.tolist()
+            y = chunk["target"].to_numpy()
+            if y.dtype.kind not in "biuf":
+                raise ValueError(f"Targets of {path} are not numeric")
+            dtypes.setdefault("y", y.dtype)
+            if not np.can_cast(y.dtype, dtypes["y"]):
+                raise ValueError(f"Targets of {path} change type from {dtypes['y']}")
+            targets.update(np.unique(y).tolist())
+            raw["X"].write(features.to_numpy(dtype=np.float64).tobytes())
+            raw["y"].write(y.astype(dtypes["y"]).tobytes())
+            rows += len(chunk)
+    finally:
+        for f in raw.values():
+            f.close()
+    if rows == 0:
+        raise ValueError(f"No rows in {path}")
+
+    shapes = {"X": (rows, len(feature_names)), "y": (rows,)}
+    for name, shape in shapes.items():
+        raw_path = os.path.join(directory, f"{name}.raw")
+        source = np.memmap(raw_path, dtype=dtypes[name], mode="r", shape=shape)
+        target = np.lib.format.open_memmap(
+            os.path.join(directory, f"{name}.npy"),
+            mode="w+",
+            dtype=dtypes[name],
+            shape=shape,
+        )
+        for offset in range(0, rows, chunk_size):
+            target[offset : offset + chunk_size] = source[offset : offset + chunk_size]
+        target.flush()
+        del source, target
+        os.remove(raw_path)
+
+    return {
+        "format": CACHE_FORMAT,
+        "source": os.path.abspath(path),
+        "rows": rows,
+        "feature_names": feature_names,
+        "target_names": sorted(targets),
+        "convert_seconds": time.perf_counter() - start,
+    }
+
+
+def _remove_stale(cache_dir: str, source: str, keep: str) -> None:
+    """Remove cached copies of earlier contents of a source file."""
+    for name in os.listdir(cache_dir):
+        directory = os.path.join(cache_dir, name)
+        # Staging directories of runs converting right now start with "."
+        if name == keep or name.startswith(".") or not os.path.isdir(directory):
+            continue
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                stale = json.load(f)["source"] == source
+        except (OSError, ValueError, KeyError):
+            continue
+        if stale:
+            logger.info(f"Removing stale dataset cache {directory}")
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def cached_dataset_dir(path: str, cache_dir: Optional[str] = None) -> str:
+    """
+    Return the cache directory of a CSV file, converting it on first use.
+
+    Args:
+        path: Labelled CSV file with a ``target`` column
+        cache_dir: Root of the cache, defaults to ``ModelConfig.DATASET_CACHE_DIR``
+
+    Returns:
+        Directory holding ``X.npy``, ``y.npy`` and ``meta.json``
+    """
+    cache_dir = cache_dir or ModelConfig.DATASET_CACHE_DIR
+    key = f"{file_hash(path)}-v{CACHE_FORMAT}"
+    directory = os.path.join(cache_dir, key)
+    if os.path.exists(os.path.join(directory, "meta.json")):
+        return directory
+
+    logger.info(f"Converting {path} to the dataset cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    # Converted next to its final place and renamed into it, so concurrent
+    # runs never see a partial copy
+    staging = tempfile.mkdtemp(prefix=f".{key}.", dir=cache_dir)
+    try:
+        meta = _convert(path, staging, ModelConfig.TRAIN_CHUNK_SIZE)
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        try:
+            os.rename(staging, directory)
+        except OSError:
+            # Another run cached the same content first
+            if not os.path.exists(os.path.join(directory, "meta.json")):
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    logger.info(
+        f"Cached {meta['rows']} rows of {path} in {meta['convert_seconds']:.3f}s"
+    )
+    _remove_stale(cache_dir, meta["source"], key)
+    return directory
+
+
+def load_cached_dataset(path: str) -> Dataset:
+    """
+    Memory-map the cached copy of a labelled CSV file, converting it if needed.
+
+    Raises:
+        ValueError: If the file cannot be converted, e.g. for text targets
+    """
+    start = time.perf_counter()
+    directory = cached_dataset_dir(path)
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    dataset = Dataset(
+        X=np.load(os.path.join(directory, "X.npy"), mmap_mode="r"),
+        y=np.load(os.path.join(directory, "y.npy"), mmap_mode="r"),
+        feature_names=meta["feature_names"],
+        target_names=meta["target_names"],
+    )
+    logger.info(
+        f"Loaded {meta['rows']} rows of {path} from the dataset cache in "
+        f"{time.perf_counter() - start:.3f}s (converting it took "
+        f"{meta['convert_seconds']:.3f}s)"
+    )
+    return dataset
+
+
+def load_dataset(
+    path: Optional[str] = None, use_cache: Optional[bool] = None
+) -> Dataset:
+    """
+    Load a labelled CSV file, memory-mapped from the dataset cache if enabled.
+
+    Args:
+        path: CSV file with the feature columns and a ``target`` column,
+            defaults to ``ModelConfig.DATA_PATH``
+        use_cache: Read through the cache, defaults to
+            ``ModelConfig.DATASET_CACHE_ENABLED``
+
+    Returns:
+        Dataset, with read-only memory-mapped arrays when cached
+    """
+    path = path or ModelConfig.DATA_PATH
+    if use_cache is None:
+        use_cache = ModelConfig.DATASET_CACHE_ENABLED
+
+    if use_cache:
+        try:
+            return load_cached_dataset(path)
+        except ValueError as e:
+            logger.warning(f"Could not cache {path}, parsing it: {str(e)}")
+
+    start = time.perf_counter()
+    df = pd.read_csv(path)
+    features = df.drop(columns="target")
+    dataset = Dataset(
+        X=features.to_numpy(dtype=np.float64),
+        y=df["target"].to_numpy(),
+        feature_names=features.columns.tolist(),
+        target_names=np.unique(df["target"]).tolist(),
+    )
+    seconds = time.perf_counter() - start
+    logger.info(f"Parsed {len(dataset.y)} rows of {path} in {seconds:.3f}s")
+    return dataset
@@ -0,0 +1,217 @@
+"""
+Constant-memory statistics of feature columns, for drift monitoring.
+
+Training saves reference statistics of its rows in the model metadata, and
+serving tracks the same statistics of the rows it scores and compares them
+with the population stability index (PSI) over the reference deciles.
+
+Means and variances are updated with Welford's algorithm, merged a batch of
+rows at a time. Quantiles come from a log-bucketed sketch: values are
+counted in buckets whose bounds grow by a factor ``gamma``, so any quantile
+is known within a relative error of ``SKETCH_ACCURACY`` with a fixed number
+of buckets per feature, however many rows are added. Values are assumed
+positive, like the measurements the API accepts, and values outside
+[``SKETCH_MIN_VALUE``, ``SKETCH_MAX_VALUE``] fall in the outermost buckets.
+"""
+
+import math
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+REFERENCE_FORMAT = 1
+SKETCH_ACCURACY = 0.01
+SKETCH_MIN_VALUE = 1e-3
+SKETCH_MAX_VALUE = 1e6
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+PSI_BINS = 10
+
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+_OFFSET = math.floor(math.log(SKETCH_MIN_VALUE) / _LOG_GAMMA)
+SKETCH_BUCKETS = math.ceil(math.log(SKETCH_MAX_VALUE) / _LOG_GAMMA) - _OFFSET + 1
+
+
+def sketch_parameters() -> Dict[str, float]:
+    """Parameters of the sketch, reference bins are only valid for the same."""
+    return {
+        "accuracy": SKETCH_ACCURACY,
+        "min_value": SKETCH_MIN_VALUE,
+        "max_value": SKETCH_MAX_VALUE,
+    }
+
+
+def bucket_indices(X: np.ndarray) -> np.ndarray:
+    """Sketch bucket of every value of a matrix, bucket i holds (g^(i-1), g^i]."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        indices = np.ceil(np.log(X) / _LOG_GAMMA) - _OFFSET
+    indices = np.nan_to_num(indices, nan=0, posinf=SKETCH_BUCKETS - 1, neginf=0)
+    return np.clip(indices, 0, SKETCH_BUCKETS - 1).astype(np.intp)
+
+
+def bucket_values(indices: np.ndarray) -> np.ndarray:
+    """Value of sketch buckets, within ``SKETCH_ACCURACY`` of all they hold."""
+    return 2 * _GAMMA ** (np.asarray(indices) + _OFFSET) / (_GAMMA + 1)
+
+
+def population_stability_index(
+    expected: np.ndarray, actual: np.ndarray, epsilon: float = 1e-4
+) -> float:
+    """
+    PSI between two distributions over the same bins.
+
+    Args:
+        expected: Reference fraction of each bin
+        actual: Observed fraction of each bin
+        epsilon: Floor of the fractions, so empty bins do not yield infinity
+
+    Returns:
+        0 for identical distributions, commonly read as a shift above 0.1
+        and a major shift above 0.25
+    """
+    expected = np.maximum(np.asarray(expected, dtype=np.float64), epsilon)
+    actual = np.maximum(np.asarray(actual, dtype=np.float64), epsilon)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+class FeatureStatistics:
+    """Running count, mean, variance, range and quantile sketch of columns."""
+
+    def __init__(self, features: int):
+        """Initialize empty statistics of ``features`` columns."""
+        self.count = 0
+        self.mean = np.zeros(features)
+        self._m2 = np.zeros(features)
+        self.min = np.full(features, np.inf)
+        self.max = np.full(features, -np.inf)
+        self.buckets = np.zeros((features, SKETCH_BUCKETS), dtype=np.int64)
+        self._flat_offsets = np.arange(features) * SKETCH_BUCKETS
+
+    @property
+    def std(self) -> np.ndarray:
+        """Population standard deviation of each column."""
+        if self.count == 0:
+            return np.full(len(self.mean), np.nan)
+        return np.sqrt(self._m2 / self.count)
+
+    def update(self, X: np.ndarray) -> np.ndarray:
+        """
+        Add a batch of rows.
+
+        Args:
+            X: N x F matrix
+
+        Returns:
+            Sketch bucket of every value of ``X``
+        """
+        X = np.asarray(X, dtype=np.float64)
+        indices = bucket_indices(X)
+        n = len(X)
+        if n == 0:
+            return indices
+
+        # Welford's update, merging the moments of the batch at once
+        batch_mean = X.mean(axis=0)
+        batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self._m2 = self._m2 + batch_m2 + delta**2 * (self.count * n / total)
+        self.count = total
+        np.minimum(self.min, X.min(axis=0), out=self.min)
+        np.maximum(self.max, X.max(axis=0), out=self.max)
+
+        flat = (indices + self._flat_offsets).ravel()
+        self.buckets += np.bincount(flat, minlength=self.buckets.size).reshape(
+            self.buckets.shape
+        )
+        return indices
+
+    def quantiles(self, quantiles: Sequence[float] = QUANTILES) -> np.ndarray:
+        """F x Q matrix of quantile estimates, NaN without rows."""
+        result = np.full((len(self.mean), len(quantiles)), np.nan)
+        if self.count == 0:
+            return result
+        ranks = np.asarray(quantiles) * (self.count - 1)
+        cumulative = np.cumsum(self.buckets, axis=1)
+        for feature in range(len(self.mean)):
+            indices = np.searchsorted(cumulative[feature], ranks, side="right")
+            result[feature] = np.clip(
+                bucket_values(indices), self.min[feature], self.max[feature]
+            )
+        return result
+
+    def psi_bins(self, feature: int, bins: int = PSI_BINS) -> np.ndarray:
+        """
+        Split the buckets of a column into (up to) ``bins`` quantile bins.
+
+        Returns:
+            Last bucket of every bin but the last, a bucket ``i`` falls in
+            bin ``searchsorted(edges, i)``
+        """
+        cumulative = np.cumsum(self.buckets[feature])
+        targets = np.arange(1, bins) / bins * self.count
+        edges = np.searchsorted(cumulative, targets, side="left")
+        return np.unique(np.minimum(edges, SKETCH_BUCKETS - 1))
+
+    def bin_counts(self, feature: int, edges: np.ndarray) -> np.ndarray:
+        """Rows of a column in each bin split by ``edges``."""
+        bins = np.searchsorted(edges, np.arange(SKETCH_BUCKETS))
+        return np.bincount(
+            bins, weights=self.buckets[feature], minlength=len(edges) + 1
+        )
+
+
+class DriftReference:
+    """Collects the reference statistics saved with a trained model."""
+
+    def __init__(self, feature_names: Iterable[str]):
+        """Initialize an empty reference of the given feature columns."""
+        self.feature_names: List[str] = list(feature_names)
+        self.features = FeatureStatistics(len(self.feature_names))
+        self.predictions: "Counter[int]" = Counter()
+
+    def observe_features(self, X: np.ndarray) -> None:
+        """Add training rows."""
+        self.features.update(X)
+
+    def observe_predictions(self, predictions: np.ndarray) -> None:
+        """Add model predictions of held-out rows."""
+        classes, counts = np.unique(np.asarray(predictions), return_counts=True)
+        for prediction, count in zip(classes.tolist(), counts.tolist()):
+            self.predictions[int(prediction)] += count
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        """JSON-serializable reference, None without training rows."""
+        stats = self.features
+        if stats.count == 0:
+            return None
+        quantiles = stats.quantiles()
+        features = {}
+        for index, name in enumerate(self.feature_names):
+            edges = stats.psi_bins(index)
+            fractions = stats.bin_counts(index, edges) / stats.count
+            features[name] = {
+                "mean": float(stats.mean[index]),
+                "std": float(stats.std[index]),
+                "min": float(stats.min[index]),
+                "max": float(stats.max[index]),
+                "quantiles": {
+                    str(q): float(value)
+                    for q, value in zip(QUANTILES, quantiles[index])
+                },
+                "psi_edges": edges.tolist(),
+                "psi_fractions": fractions.tolist(),
+            }
+        total = sum(self.predictions.values())
+        return {
+            "format": REFERENCE_FORMAT,
+            "sketch": sketch_parameters(),
+            "rows": int(stats.count),
+            "features": features,
+            "predictions": {
+                str(prediction): count / total
+                for prediction, count in sorted(self.predictions.items())
+            },
+        }
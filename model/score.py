@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Offline batch scoring of large CSV/Parquet files.
+
+Input is read in chunks and scored on a pool of worker processes that load
+the model once each. Results are written incrementally, in input order, so
+files of any size are scored with bounded memory.
+"""
+
+import argparse
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from model.artifacts import bundle_artifact_paths, read_pointer
+from model.config import ModelConfig
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+)
+logger = logging.getLogger(__name__)
+
+# Snapshot of the model scoring chunks in this process
+_snapshot = None
+
+
+def _is_parquet(path: str) -> bool:
+    """Whether a path names a Parquet file."""
+    return path.endswith((".parquet", ".pq"))
+
+
+def resolve_model(version: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Resolve the artifact paths of a model version.
+
+    Args:
+        version: Model version, None for the latest
+
+    Returns:
+        Tuple of (model path, metadata path)
+    """
+    if not version:
+        if not os.path.exists(ModelConfig.LATEST_VERSION_PATH):
+            raise FileNotFoundError(
+                "No model version info found. Please train a model first."
+            )
+        latest_info = read_pointer()
+        return latest_info["model_path"], latest_info["metadata_path"]
+
+    bundled = bundle_artifact_paths(version)
+    if bundled is not None:
+        return bundled["model_path"], bundled["metadata_path"]
+
+    model_path = os.path.join(
+        ModelConfig.ARTIFACTS_DIR, f"model_pipeline_{version}.joblib"
+    )
+    metadata_path = os.path.join(
+        ModelConfig.ARTIFACTS_DIR, f"model_metadata_{version}.joblib"
+    )
+    if not (os.path.exists(model_path) and os.path.exists(metadata_path)):
+        raise FileNotFoundError(f"Model version not found: {version}")
+    return model_path, metadata_path
+
+
+def read_chunks(path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Read a CSV or Parquet file in chunks of rows.
+
+    Parquet input requires pyarrow, which is read one record batch at a time.
+    A file without rows yields one empty chunk, so the output is written
+    with its header all the same.
+    """
+    if _is_parquet(path):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError(
+                "Reading Parquet files requires pyarrow to be installed"
+            )
+        parquet_file = pq.ParquetFile(path)
+        empty = True
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            empty = False
+            yield batch.to_pandas()
+        if empty:
+            yield parquet_file.schema_arrow.empty_table().to_pandas()
+        return
+
+    try:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    except pd.errors.EmptyDataError:
+        # Not even a header, the output holds the feature and result columns
+        yield pd.DataFrame(columns=ModelConfig.FEATURE_NAMES)
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, path: str):
+        """Initialize the writer, the file is created with the first chunk."""
+        self.path = path
+        self._file = None
+        self._parquet_writer = None
+
+    def write(self, chunk: Union[pd.DataFrame, str]) -> None:
+        """Append a chunk of results, CSV output takes pre-encoded text."""
+        if isinstance(chunk, str):
+            if self._file is None:
+                self._file = open(self.path, "w", newline="")
+            self._file.write(chunk)
+            return
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+        self._parquet_writer.write_table(table)
+
+    def close(self) -> None:
+        """Finish the output file."""
+        if self._file is not None:
+            self._file.close()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def _init_worker(model_path: str, metadata_path: str) -> None:
+    """Load the model once when a worker process starts."""
+    global _snapshot
+    from app.utils import load_snapshot
+
+    _snapshot = load_snapshot(model_path, metadata_path)
+
+
+def score_features(X: np.ndarray) -> Dict[str, Any]:
+    """
+    Score a feature matrix with the model loaded in this process.
+
+    Rows with missing, non-finite or non-positive measurements are not
+    scored and get an error message instead.
+
+    Args:
+        X: N x F feature matrix in ``ModelConfig.FEATURE_NAMES`` order
+
+    Returns:
+        Dictionary of output columns
+    """
+    from app.utils import ModelLoader
+
+    valid = (np.isfinite(X) & (X > 0)).all(axis=1)
+    predictions = np.full(len(X), -1)
+    probabilities = np.full((len(X), len(ModelConfig.PREDICTION_LABELS)), np.nan)
+    if valid.any():
+        scored, scored_probabilities = _snapshot.predict_array(X[valid])
+        predictions[valid] = scored
+        if scored_probabilities is not None:
+            classes = scored_probabilities.shape[1]
+            probabilities[valid, :classes] = scored_probabilities
+
+    columns: Dict[str, Any] = {
+        "prediction": predictions,
+        "prediction_label": [
+            ModelLoader.label_for(int(p)) if ok else ""
+            for p, ok in zip(predictions, valid)
+        ],
+    }
+    for index, label in enumerate(ModelConfig.PREDICTION_LABELS):
+        columns[f"probability_{label}"] = probabilities[:, index]
+    columns["error"] = np.where(valid, "", "Measurements must be finite and positive")
+    return columns
+
+
+def _features(chunk: pd.DataFrame) -> np.ndarray:
+    """Extract the feature matrix of a chunk, missing values become NaN."""
+    missing = [name for name in ModelConfig.FEATURE_NAMES if name not in chunk.columns]
+    if missing:
+        raise ValueError(f"Input is missing feature columns: {', '.join(missing)}")
+    features = chunk[ModelConfig.FEATURE_NAMES].apply(pd.to_numeric, errors="coerce")
+    return features.to_numpy(dtype=np.float64)
+
+
+def score_chunk(
+    chunk: pd.DataFrame, csv_header: Optional[bool] = None
+) -> Union[pd.DataFrame, str]:
+    """
+    Score a chunk of input rows and append the output columns.
+
+    Encoding is the most expensive step of writing CSV output, so it is done
+    here, in the workers, rather than by the process writing the file.
+
+    Args:
+        chunk: Input rows with the feature columns
+        csv_header: Encode the result as CSV, with or without the header row
+
+    Returns:
+        Scored rows as a DataFrame, or as CSV text if ``csv_header`` is set
+    """
+    result = chunk.assign(**score_features(_features(chunk)))
+    if csv_header is None:
+        return result
+    return result.to_csv(index=False, header=csv_header)
+
+
+def score_file(
+    input_path: str,
+    output_path: str,
+    workers: int = 1,
+    chunk_size: int = 100000,
+    version: Optional[str] = None,
+) -> Dict[str, float]:
+    """
+    Score a CSV or Parquet file and write the predictions, in input order.
+
+    Output rows hold the input columns followed by ``prediction``,
+    ``prediction_label``, one ``probability_{label}`` column per class and
+    ``error``. At most two chunks per worker are in flight at a time.
+
+    Args:
+        input_path: CSV or Parquet file with the feature columns
+        output_path: CSV or Parquet file to write
+        workers: Number of worker processes, 1 scores in this process
+        chunk_size: Number of rows per chunk
+        version: Model version to score with, None for the latest
+
+    Returns:
+        Dictionary with the number of rows, elapsed seconds and rows per second
+    """
+    model_path, metadata_path = resolve_model(version)
+    logger.info(f"Scoring {input_path} with {model_path} on {workers} worker(s)")
+
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(model_path, metadata_path),
+        )
+    else:
+        _init_worker(model_path, metadata_path)
+
+    writer = ChunkWriter(output_path)
+    pending: "deque[Tuple[int, Future]]" = deque()
+    rows = 0
+    start = time.perf_counter()
+    last_report = start
+
+    def write_next() -> None:
+        nonlocal rows, last_report
+        size, future = pending.popleft()
+        writer.write(future.result())
+        rows += size
+        now = time.perf_counter()
+        if now - last_report >= 10:
+            logger.info(f"Scored {rows} rows ({rows / (now - start):.0f} rows/s)")
+            last_report = now
+
+    encode_csv = not _is_parquet(output_path)
+    try:
+        for index, chunk in enumerate(read_chunks(input_path, chunk_size)):
+            csv_header = index == 0 if encode_csv else None
+            if pool is None:
+                future: Future = Future()
+                future.set_result(score_chunk(chunk, csv_header))
+            else:
+                future = pool.submit(score_chunk, chunk, csv_header)
+            pending.append((len(chunk), future))
+            if len(pending) >= 2 * workers:
+                write_next()
+        while pending:
+            write_next()
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    throughput = rows / elapsed if elapsed > 0 else 0.0
+    logger.info(
+        f"Scored {rows} rows in {elapsed:.2f}s ({throughput:.0f} rows/s), "
+        f"written to {output_path}"
+    )
+    return {"rows": rows, "seconds": elapsed, "rows_per_second": throughput}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Score a CSV or Parquet file with a trained model."
+    )
+    parser.add_argument(
+        "input", type=str, help="CSV or Parquet file with the feature columns"
+    )
+    parser.add_argument(
+        "output", type=str, help="CSV or Parquet file to write the predictions to"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=100000,
+        help="Number of rows scored per chunk",
+    )
+    parser.add_argument(
+        "--model-version", type=str, help="Specify the model version", default=None
+    )
+    args = parser.parse_args()
+    score_file(
+        args.input,
+        args.output,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        version=args.model_version,
+    )
@@ -4,22 +4,45 @@ Training script for Iris dataset classification model.
 This script loads data, preprocesses it, trains a model, and saves the pipeline.
 """
 
+import json
 import logging
 import os
 from datetime import datetime
 import argparse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import joblib
 import numpy as np
 import pandas as pd
+from sklearn.base import clone
 from sklearn.datasets import load_iris
-from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.metrics import accuracy_score, classification_report
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import (
+    GridSearchCV,
+    HalvingGridSearchCV,
+    HalvingRandomSearchCV,
+    RandomizedSearchCV,
+    StratifiedKFold,
+    train_test_split,
+)
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
 
+from model.artifacts import (
+    bundle_metadata_path,
+    linear_arrays,
+    write_atomic,
+    write_bundle,
+    write_json_atomic,
+    write_pointer,
+)
 from model.config import ModelConfig
+from model.dataset import Dataset, load_cached_dataset, load_dataset
+from model.drift import DriftReference
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -34,9 +57,10 @@ def load_data():
     logger.info("Loading Iris dataset")
     # Option 1: Load from sklearn
     if not os.path.exists(ModelConfig.DATA_PATH):
-        X, y = load_iris(return_X_y=True)
-        feature_names = load_iris().feature_names
-        target_names = load_iris().target_names
+        iris = load_iris()
+        X, y = iris.data, iris.target
+        feature_names = iris.feature_names
+        target_names = iris.target_names
         
         # Save to CSV for future runs
         df = pd.DataFrame(X, columns=feature_names)
@@ -45,51 +69,398 @@ def load_data():
         
         return X, y, feature_names, target_names
     
-    # Option 2: Load from CSV
+    # Option 2: Load from CSV, memory-mapped from the dataset cache
     logger.info(f"Loading data from {ModelConfig.DATA_PATH}")
-    df = pd.read_csv(ModelConfig.DATA_PATH)
+    dataset = load_dataset(ModelConfig.DATA_PATH)
     
-    y = df['target'].values
-    X = df.drop('target', axis=1).values
-    feature_names = df.drop('target', axis=1).columns.tolist()
-    target_names = np.unique(y).tolist()
-    
-    return X, y, feature_names, target_names
+    return dataset.X, dataset.y, dataset.feature_names, dataset.target_names
+
+# Candidate estimators of model selection by model type
+ESTIMATORS = {
+    "logistic_regression": LogisticRegression(max_iter=200, random_state=42),
+    "sgd_classifier": SGDClassifier(loss="log_loss", random_state=42),
+    "decision_tree": DecisionTreeClassifier(random_state=42),
+    "random_forest": RandomForestClassifier(random_state=42),
+}
 
-def build_pipeline():
+# Param grids searched unless TRAIN_SEARCH_SPACE is set, "model" lists
+# model types of ESTIMATORS and the other keys their hyperparameters. Only
+# linear models by default, the ones served by compiled inference
+DEFAULT_SEARCH_SPACE = [
+    {
+        "model": ["logistic_regression"],
+        "model__C": [0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0, 30.0, 100.0],
+    },
+    {
+        "model": ["sgd_classifier"],
+        "model__alpha": [1e-5, 1e-4, 1e-3, 1e-2],
+        "model__penalty": ["l2", "elasticnet"],
+    },
+]
+
+def build_pipeline(model_type="logistic_regression"):
     """Create sklearn pipeline with preprocessing and model."""
     logger.info("Building machine learning pipeline")
     
     pipeline = Pipeline([
         ('scaler', StandardScaler()),
-        ('model', LogisticRegression(max_iter=200, random_state=42))
+        ('model', clone(ESTIMATORS[model_type]))
     ])
     
     return pipeline
 
-def train_model(version=""):
-    """Train the model and save pipeline artifacts."""
+def model_type_of(estimator: Any) -> str:
+    """Model type of a candidate estimator."""
+    for model_type, candidate in ESTIMATORS.items():
+        if type(candidate) is type(estimator):
+            return model_type
+    return type(estimator).__name__
+
+
+def load_search_space(path: Optional[str] = None) -> List[Dict[str, list]]:
+    """
+    Load the param grids of model selection.
+
+    Args:
+        path: JSON file of param grids, defaults to ``ModelConfig.TRAIN_SEARCH_SPACE``
+            and to ``DEFAULT_SEARCH_SPACE`` when that is unset
+
+    Returns:
+        Param grids over the ``model`` step of ``build_pipeline``
+    """
+    path = path or ModelConfig.TRAIN_SEARCH_SPACE
+    space = DEFAULT_SEARCH_SPACE
+    if path:
+        with open(path) as f:
+            space = json.load(f)
+
+    grids = []
+    for grid in space:
+        unknown = set(grid["model"]) - set(ESTIMATORS)
+        if unknown:
+            raise ValueError(f"Unknown model types in search space: {sorted(unknown)}")
+        grids.append(
+            {**grid, "model": [clone(ESTIMATORS[name]) for name in grid["model"]]}
+        )
+    return grids
+
+
+def select_model(
+    X: np.ndarray,
+    y: np.ndarray,
+    search: Optional[str] = None,
+    search_space: Optional[List[Dict[str, list]]] = None,
+    n_jobs: Optional[int] = None,
+    seed: int = 42,
+) -> Tuple[Pipeline, str, Dict[str, Any]]:
+    """
+    Select the best candidate pipeline by k-fold cross-validation.
+
+    The folds are split once and shared by all candidates. Candidates are
+    evaluated in parallel on a pool of ``n_jobs`` processes, which map large
+    training arrays from shared memory instead of copying them. With early
+    stopping, candidates are first scored on a subsample of the rows and
+    only the best third go on to more rows, until the last round uses them
+    all (successive halving).
+
+    Args:
+        X: Training features
+        y: Training targets
+        search: "grid" or "random", defaults to ``ModelConfig.TRAIN_SEARCH``
+        search_space: Param grids, defaults to ``load_search_space()``
+        n_jobs: Worker processes, defaults to ``ModelConfig.TRAIN_N_JOBS``
+        seed: Seed of the folds, random candidates and subsamples
+
+    Returns:
+        Tuple of (pipeline refitted on all rows, model type, cross-validation
+        scores and parameters of the winner)
+    """
+    search = search or ModelConfig.TRAIN_SEARCH
+    search_space = search_space or load_search_space()
+    n_jobs = n_jobs or ModelConfig.TRAIN_N_JOBS
+    folds = list(
+        StratifiedKFold(
+            n_splits=ModelConfig.TRAIN_CV_FOLDS, shuffle=True, random_state=seed
+        ).split(X, y)
+    )
+
+    options = {"cv": folds, "scoring": "accuracy", "n_jobs": n_jobs}
+    early_stopping = ModelConfig.TRAIN_SEARCH_EARLY_STOPPING
+    if search == "grid":
+        if early_stopping:
+            searcher = HalvingGridSearchCV(
+                build_pipeline(), search_space, random_state=seed, **options
+            )
+        else:
+            searcher = GridSearchCV(build_pipeline(), search_space, **options)
+    elif search == "random":
+        candidates = ModelConfig.TRAIN_SEARCH_CANDIDATES
+        if early_stopping:
+            searcher = HalvingRandomSearchCV(
+                build_pipeline(),
+                search_space,
+                n_candidates=candidates,
+                random_state=seed,
+                **options,
+            )
+        else:
+            searcher = RandomizedSearchCV(
+                build_pipeline(),
+                search_space,
+                n_iter=candidates,
+                random_state=seed,
+                **options,
+            )
+    else:
+        raise ValueError(f"Unknown model search: {search}")
+
+    logger.info(f"Selecting model by {search} search with {len(folds)}-fold CV")
+    searcher.fit(X, y)
+
+    results = searcher.cv_results_
+    best = searcher.best_index_
+    params = {
+        name: model_type_of(value) if name == "model" else value
+        for name, value in searcher.best_params_.items()
+    }
+    cv_scores = {
+        "scoring": "accuracy",
+        "mean": float(results["mean_test_score"][best]),
+        "std": float(results["std_test_score"][best]),
+        "folds": [
+            float(results[f"split{fold}_test_score"][best])
+            for fold in range(len(folds))
+        ],
+        "params": params,
+        "candidates": len(results["params"]),
+    }
+    model_type = params["model"]
+    logger.info(
+        f"Selected {model_type} {params} with CV accuracy "
+        f"{cv_scores['mean']:.4f} +/- {cv_scores['std']:.4f} "
+        f"out of {cv_scores['candidates']} candidate evaluations"
+    )
+    return searcher.best_estimator_, model_type, cv_scores
+
+def read_training_chunks(
+    path: str, chunk_size: int, dataset: Optional[Dataset] = None
+) -> Iterator[Tuple[np.ndarray, np.ndarray, List[str]]]:
+    """
+    Read a labelled CSV file in chunks.
+
+    Args:
+        path: CSV file with the feature columns and a ``target`` column
+        chunk_size: Rows per chunk
+        dataset: Memory-mapped copy of the file, sliced instead of parsing it
+
+    Returns:
+        Iterator of (features, targets, feature names) per chunk
+    """
+    if dataset is not None:
+        for start in range(0, len(dataset.y), chunk_size):
+            yield (
+                dataset.X[start : start + chunk_size],
+                dataset.y[start : start + chunk_size],
+                dataset.feature_names,
+            )
+        return
+
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        features = chunk.drop(columns="target")
+        yield (
+            features.to_numpy(dtype=np.float64),
+            chunk["target"].to_numpy(),
+            features.columns.tolist(),
+        )
+
+
+def _holdout_mask(chunk_index: int, rows: int, fraction: float, seed: int) -> np.ndarray:
+    """Rows of a chunk held out for evaluation, the same in every pass."""
+    return np.random.default_rng([seed, chunk_index]).random(rows) < fraction
+
+
+def train_streaming(
+    path: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    epochs: Optional[int] = None,
+    holdout_fraction: Optional[float] = None,
+    seed: int = 42,
+    reference: Optional[DriftReference] = None,
+) -> Tuple[Pipeline, float, List[str], List]:
+    """
+    Train a scaler and a linear classifier incrementally over a CSV file.
+
+    Only one chunk of rows is in memory at a time: the scaler statistics are
+    accumulated in a first pass, then an ``SGDClassifier`` (logistic loss, so
+    it serves probabilities) is fitted with ``partial_fit`` over ``epochs``
+    passes, shuffling the rows of each chunk. A random fraction of the rows
+    of every chunk is held out of training and scored in a final pass.
+
+    Args:
+        path: Labelled CSV file, defaults to ``ModelConfig.DATA_PATH``
+        chunk_size: Rows per chunk, defaults to ``ModelConfig.TRAIN_CHUNK_SIZE``
+        epochs: Passes of the classifier over the training rows
+        holdout_fraction: Fraction of rows held out for evaluation
+        seed: Seed of the holdout split, shuffling and classifier
+        reference: Drift reference to add the training rows and the
+            predictions of the held-out rows to
+
+    Returns:
+        Tuple of (fitted pipeline, holdout accuracy, feature names, classes)
+    """
+    path = path or ModelConfig.DATA_PATH
+    chunk_size = chunk_size or ModelConfig.TRAIN_CHUNK_SIZE
+    epochs = epochs or ModelConfig.TRAIN_EPOCHS
+    if holdout_fraction is None:
+        holdout_fraction = ModelConfig.TRAIN_HOLDOUT_FRACTION
+
+    # Every pass slices the cached copy rather than parsing the CSV again
+    dataset = None
+    if ModelConfig.DATASET_CACHE_ENABLED:
+        try:
+            dataset = load_cached_dataset(path)
+        except ValueError as e:
+            logger.warning(f"Could not cache {path}, parsing it every pass: {str(e)}")
+
+    def chunks():
+        batches = read_training_chunks(path, chunk_size, dataset)
+        for index, (X, y, names) in enumerate(batches):
+            yield X, y, names, _holdout_mask(index, len(y), holdout_fraction, seed)
+
+    logger.info(f"Computing scaler statistics of {path} in chunks of {chunk_size} rows")
+    scaler = StandardScaler()
+    classes = set()
+    feature_names: List[str] = []
+    train_rows = 0
+    for X, y, feature_names, holdout in chunks():
+        classes.update(np.unique(y).tolist())
+        if not holdout.all():
+            scaler.partial_fit(X[~holdout])
+            train_rows += int((~holdout).sum())
+            if reference is not None:
+                reference.observe_features(X[~holdout])
+    if train_rows == 0:
+        raise ValueError(f"No training rows in {path}")
+    classes = np.array(sorted(classes))
+
+    classifier = SGDClassifier(loss="log_loss", random_state=seed)
+    rng = np.random.default_rng(seed)
+    for epoch in range(epochs):
+        for X, y, _, holdout in chunks():
+            if holdout.all():
+                continue
+            order = rng.permutation(int((~holdout).sum()))
+            X_train = scaler.transform(X[~holdout])[order]
+            classifier.partial_fit(X_train, y[~holdout][order], classes=classes)
+        logger.info(f"Epoch {epoch + 1}/{epochs} done")
+    pipeline = Pipeline([("scaler", scaler), ("model", classifier)])
+
+    # Confusion matrix of the held-out rows, true classes by row
+    confusion = np.zeros((len(classes), len(classes)), dtype=np.int64)
+    for X, y, _, holdout in chunks():
+        if holdout.any():
+            y_pred = pipeline.predict(X[holdout])
+            if reference is not None:
+                reference.observe_predictions(y_pred)
+            np.add.at(
+                confusion,
+                (np.searchsorted(classes, y[holdout]), np.searchsorted(classes, y_pred)),
+                1,
+            )
+    if confusion.sum() == 0:
+        raise ValueError(f"No rows of {path} held out for evaluation")
+    accuracy = np.trace(confusion) / confusion.sum()
+    logger.info(f"Trained on {train_rows} rows, evaluated on {confusion.sum()} rows")
+    logger.info(f"Confusion matrix (rows are true classes {classes.tolist()}):\n{confusion}")
+
+    return pipeline, float(accuracy), feature_names, classes.tolist()
+
+
+def save_bundle(
+    pipeline: Pipeline, model_info: Dict[str, Any]
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Save a linear pipeline as a content-addressed bundle.
+
+    Args:
+        pipeline: Fitted pipeline
+        model_info: Metadata of the model version
+
+    Returns:
+        Tuple of (bundle directory, metadata path), (None, None) if the
+        pipeline cannot be bundled
+    """
+    extracted = linear_arrays(pipeline)
+    if extracted is None:
+        logger.warning(
+            f"{model_info['model_type']} pipelines cannot be bundled, pickling it"
+        )
+        return None, None
+    arrays, link = extracted
+    digest, bundle_path = write_bundle(
+        arrays,
+        {"kind": "linear", "link": link, "feature_names": model_info["feature_names"]},
+    )
+    metadata_path = bundle_metadata_path(model_info["version"])
+    write_json_atomic(metadata_path, {**model_info, "bundle": digest})
+    logger.info(f"Saved model bundle {bundle_path}")
+    return bundle_path, metadata_path
+
+
+def train_model(version="", streaming=None):
+    """
+    Train the model and save pipeline artifacts.
+
+    Args:
+        version: Model version, defaults to a timestamped version
+        streaming: Train incrementally over chunks of the data, defaults to
+            ``ModelConfig.TRAIN_MODE == "streaming"``
+    """
     # Create artifacts directory
     create_artifacts_dir()
-    
-    # Load data
-    X, y, feature_names, target_names = load_data()
-    
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
-    
-    # Build and train pipeline
-    pipeline = build_pipeline()
-    logger.info("Training model...")
-    pipeline.fit(X_train, y_train)
-    
-    # Evaluate model
-    y_pred = pipeline.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred)
-    logger.info(f"Model accuracy: {accuracy:.4f}")
-    logger.info(f"Classification report:\n{classification_report(y_test, y_pred, target_names=load_iris().target_names)}")
+
+    if streaming is None:
+        streaming = ModelConfig.TRAIN_MODE == "streaming"
+
+    if streaming:
+        if not os.path.exists(ModelConfig.DATA_PATH):
+            load_data()
+        logger.info("Training model incrementally...")
+        reference = DriftReference(ModelConfig.FEATURE_NAMES)
+        pipeline, accuracy, feature_names, target_names = train_streaming(reference=reference)
+        logger.info(f"Model accuracy: {accuracy:.4f}")
+        model_type = "sgd_classifier"
+        cv_scores = None
+    else:
+        # Load data
+        X, y, feature_names, target_names = load_data()
+
+        # Split data
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=42
+        )
+
+        # Select, or build and train, the pipeline
+        cv_scores = None
+        if ModelConfig.TRAIN_SEARCH == "none":
+            pipeline = build_pipeline()
+            logger.info("Training model...")
+            pipeline.fit(X_train, y_train)
+            model_type = "logistic_regression"
+        else:
+            pipeline, model_type, cv_scores = select_model(X_train, y_train)
+
+        # Evaluate model
+        y_pred = pipeline.predict(X_test)
+        accuracy = accuracy_score(y_test, y_pred)
+        logger.info(f"Model accuracy: {accuracy:.4f}")
+        logger.info(f"Classification report:\n{classification_report(y_test, y_pred, target_names=ModelConfig.PREDICTION_LABELS)}")
+
+        # Statistics of the training rows and held-out predictions, the
+        # server measures the drift of its traffic against them
+        reference = DriftReference(ModelConfig.FEATURE_NAMES)
+        reference.observe_features(X_train)
+        reference.observe_predictions(y_pred)
     
     # Create model metadata
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -104,24 +475,34 @@ def train_model(version=""):
         "feature_names": feature_names,
         "target_names": target_names.tolist() if hasattr(target_names, 'tolist') else target_names,
         "created_at": datetime.now().isoformat(),
-        "model_type": "logistic_regression"
+        "model_type": model_type
     }
+    if cv_scores is not None:
+        model_info["cv_scores"] = cv_scores
+    reference_statistics = reference.to_dict()
+    if reference_statistics is not None:
+        model_info["reference_statistics"] = reference_statistics
     
     # Save pipeline and metadata
-    model_path = os.path.join(ModelConfig.ARTIFACTS_DIR, f"model_pipeline_{model_version}.joblib")
-    metadata_path = os.path.join(ModelConfig.ARTIFACTS_DIR, f"model_metadata_{model_version}.joblib")
-    
-    logger.info(f"Saving model to {model_path}")
-    joblib.dump(pipeline, model_path)
-    joblib.dump(model_info, metadata_path)
+    model_path, metadata_path = None, None
+    if ModelConfig.ARTIFACT_FORMAT == "bundle":
+        model_path, metadata_path = save_bundle(pipeline, model_info)
+    if model_path is None:
+        model_path = os.path.join(ModelConfig.ARTIFACTS_DIR, f"model_pipeline_{model_version}.joblib")
+        metadata_path = os.path.join(ModelConfig.ARTIFACTS_DIR, f"model_metadata_{model_version}.joblib")
+
+        logger.info(f"Saving model to {model_path}")
+        write_atomic(model_path, lambda f: joblib.dump(pipeline, f))
+        write_atomic(metadata_path, lambda f: joblib.dump(model_info, f))
     
-    # Save latest version info
+    # Save latest version info, replaced atomically so that servers polling
+    # it never read a partial pointer
     latest_info = {
         "latest_version": model_version,
         "model_path": model_path,
         "metadata_path": metadata_path
     }
-    joblib.dump(latest_info, ModelConfig.LATEST_VERSION_PATH)
+    write_pointer(latest_info)
     
     logger.info(f"Model training completed. Version: {model_version}")
     return model_path, metadata_path, model_info
@@ -129,5 +510,15 @@ def train_model(version=""):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Train a model with optional version.")
     parser.add_argument("--model-version", type=str, help="Specify the model version", default=None)
+    parser.add_argument("--streaming", action="store_true", default=None, help="Train incrementally over chunks of the data")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Rows per chunk when streaming")
+    parser.add_argument("--epochs", type=int, default=None, help="Passes over the data when streaming")
+    parser.add_argument("--search", choices=["grid", "random", "none"], default=None, help="Model selection of batch training")
     args = parser.parse_args()
-    train_model(version=args.model_version)
\ No newline at end of file
+    if args.chunk_size:
+        ModelConfig.TRAIN_CHUNK_SIZE = args.chunk_size
+    if args.epochs:
+        ModelConfig.TRAIN_EPOCHS = args.epochs
+    if args.search:
+        ModelConfig.TRAIN_SEARCH = args.search
+    train_model(version=args.model_version, streaming=args.streaming)
\ No newline at end of file
@@ -0,0 +1,43 @@
+Feature: Admission control
+  As an operator of the ML API
+  I want excess prediction requests shed quickly under overload
+  So that admitted requests keep a bounded latency and probes keep answering
+
+  Scenario: Requests beyond the queue are rejected with Retry-After
+    Given the ML model is loaded
+    And admission allows 0 requests in flight and 0 queued
+    When I send a prediction request for a setosa flower
+    Then the response status should be 429
+    And the response should tell the client when to retry
+    And 1 "queue_full" rejection should be counted
+
+  Scenario: Queued requests time out with 503
+    Given the ML model is loaded
+    And admission allows 0 requests in flight and 1 queued
+    When I send a prediction request for a setosa flower
+    Then the response status should be 503
+    And the response should tell the client when to retry
+    And 1 "queue_timeout" rejection should be counted
+
+  Scenario: Requests past their deadline are dropped before inference
+    Given the ML model is loaded
+    When I send a prediction request for a setosa flower with a deadline of 0 ms
+    Then the response status should be 503
+    And no inference should have run
+    And 1 "deadline" rejection should be counted
+
+  Scenario: Requests within their deadline are served
+    Given the ML model is loaded
+    When I send a prediction request for a setosa flower with a deadline of 5000 ms
+    Then the response status should be 200
+
+  Scenario: Health checks are exempt from admission control
+    Given admission allows 0 requests in flight and 0 queued
+    When I send a health check request
+    Then the response status should be 200
+
+  Scenario: A finished request hands its slot to the first queued one
+    Given an admission controller with 1 slot and a queue of 2
+    When 3 requests are admitted and the first finishes
+    Then the queued requests should be admitted in arrival order
+    And no slot should be left in use
@@ -0,0 +1,31 @@
+Feature: Model artifacts
+  As an operator of the ML API
+  I want model artifacts that load fast and are published safely
+  So that training and serving can share a volume without downtime
+
+  Background:
+    Given artifacts are written to a temporary directory
+
+  Scenario: Identical retrains share one content-addressed bundle
+    Given models are saved as bundles
+    When I train the model versions "bdd-a,bdd-b" on the same data
+    Then the versions should share 1 bundle
+    And the model loader should serve version "bdd-b" from its bundle
+    And a setosa flower should be classified
+    And the registry should list the versions "bdd-a,bdd-b"
+
+  Scenario: Loading a bundle imports neither sklearn nor joblib
+    Given models are saved as bundles
+    When I train the model versions "bdd-fast" on the same data
+    And I load the latest model in a new process
+    Then the model should be loaded without sklearn or joblib
+
+  Scenario: Models that cannot be bundled are pickled
+    Given models are saved as bundles
+    And only decision trees are searched
+    When I train the model versions "bdd-tree" on the same data
+    Then the model loader should serve a pickled model
+
+  Scenario: Readers never see a partially written version pointer
+    When the version pointer is rewritten 200 times while it is read
+    Then every read should return a complete pointer
@@ -0,0 +1,16 @@
+Feature: Benchmark suite
+  As a developer of the ML API
+  I want to measure throughput and tail latency of the serving path
+  So that performance regressions are caught before they ship
+
+  Scenario: A closed-loop run reports throughput and latency percentiles
+    Given the ML model is trained
+    When I send 50 health requests to the in-process server with a concurrency of 4
+    Then the report should count 50 requests and 0 errors
+    And the report should have the latency percentiles "p50,p95,p99,p999"
+
+  Scenario: Results worse than the baseline beyond the threshold are regressions
+    Given a baseline of 1000 requests per second and a p99 of 10 ms
+    When the results are 850 requests per second and a p99 of 11 ms
+    Then the throughput should be reported as a regression
+    And the p99 latency should not be reported as a regression
@@ -0,0 +1,46 @@
+Feature: Prediction capture and replay
+  As an operator of the ML API
+  I want a record of the rows we score and a way to replay them
+  So that I can reproduce incidents and benchmark new versions on real traffic
+
+  Scenario: Scored rows are captured to columnar segments
+    Given the ML model is trained and loaded
+    And a started capture store
+    When I score 5 rows as a batch and 3 rows as a matrix
+    And the capture store is flushed
+    Then the segments should hold 8 rows with their predictions
+    And every captured row should carry the served model version
+
+  Scenario: Nothing is captured before the store is started
+    Given the ML model is trained and loaded
+    And a capture store that is not started
+    When I score 5 rows as a batch and 3 rows as a matrix
+    Then the capture store should buffer 0 rows
+
+  Scenario: The oldest rows are dropped when the buffer is full
+    Given a capture store holding at most 10 rows
+    When 13 single rows are recorded
+    And the capture store is flushed
+    Then the segments should hold rows 3 to 12
+
+  Scenario: Only the most recent segments are kept
+    Given a capture store with 2 rows per segment keeping 2 segments
+    When 7 single rows are recorded
+    And the capture store is flushed
+    Then there should be 2 segments holding rows 4 to 6
+
+  Scenario: Replaying against the captured model reports no changes
+    Given the ML model is trained and loaded
+    And a started capture store
+    When I score 5 rows as a batch and 3 rows as a matrix
+    And the capture store is flushed
+    And I replay the capture against the loaded model as fast as possible
+    Then the replay should report 8 requests and 0 errors
+    And the replay should report 0 changed predictions
+
+  Scenario: Replaying against another model reports changed predictions
+    Given a started capture store
+    When 6 single rows predicted as class 0 are recorded
+    And the capture store is flushed
+    And I replay the capture against a model predicting class 2
+    Then the replay should report 6 changed predictions from 0 to 2
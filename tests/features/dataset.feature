@@ -0,0 +1,26 @@
+Feature: Training dataset cache
+  As a data scientist
+  I want training runs to skip parsing data they have read before
+  So that repeated training in CI and hyperparameter sweeps starts fast
+
+  Scenario: A CSV file is converted once and memory-mapped afterwards
+    Given a labelled CSV file of iris measurements and an empty dataset cache
+    When I load the dataset 2 times
+    Then the CSV file should have been converted 1 time
+    And the features should be memory-mapped
+    And the dataset should hold the 150 rows of the CSV file
+
+  Scenario: A changed CSV file invalidates its cached copy
+    Given a labelled CSV file of iris measurements and an empty dataset cache
+    When I load the dataset 1 time
+    And a row is appended to the CSV file
+    And I load the dataset 1 time
+    Then the CSV file should have been converted 2 times
+    And the dataset should hold the 151 rows of the CSV file
+    And the dataset cache should hold 1 copy
+
+  Scenario: Files that cannot be cached are parsed
+    Given a labelled CSV file with text targets and an empty dataset cache
+    When I load the dataset 1 time
+    Then the features should not be memory-mapped
+    And the dataset should hold the 3 rows of the CSV file
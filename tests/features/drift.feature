@@ -0,0 +1,43 @@
+Feature: Drift monitoring
+  As an operator of the ML API
+  I want live statistics of the features and predictions we serve
+  So that I can alert on drift from the training data without offline jobs
+
+  Scenario: Running statistics match the exact ones in constant memory
+    Given 100000 rows of log-normal measurements
+    When I add them to feature statistics in batches of 1000 rows
+    Then the means and standard deviations should match the exact ones
+    And the quantiles should be within 1 percent of the exact ones
+    And the sketch should hold as many buckets as when empty
+
+  Scenario: Training saves reference statistics in the model metadata
+    Given artifacts are written to a temporary directory
+    When I train a model without model search
+    Then the model info should hold reference statistics of every feature
+    And the reference bin fractions of every feature should sum to 1
+
+  Scenario: Traffic like the training data shows no drift
+    Given a drift monitor with a reference of iris measurements
+    When it observes 5000 rows sampled from the iris measurements
+    Then no feature should be reported as drifted
+    And the PSI of every feature should be below 0.1
+
+  Scenario: Shifted traffic is reported as drifted
+    Given a drift monitor with a reference of iris measurements
+    When it observes 5000 rows sampled from the iris measurements with petal length scaled by 1.5
+    Then "petal_length" should be reported as drifted
+    And "sepal_width" should not be reported as drifted
+
+  Scenario: Served predictions feed the drift endpoint and metrics
+    Given artifacts are written to a temporary directory
+    And a model trained without model search is served
+    When I send a batch prediction request with the iris measurements
+    Then the drift endpoint should report 150 rows against the reference
+    And the drift metrics should report the PSI of every feature
+
+  Scenario: Warm-up rows are not tracked for drift, and traffic is kept
+    Given artifacts are written to a temporary directory
+    And a model trained without model search is served
+    When I send a batch prediction request with the iris measurements
+    And the server is warmed up
+    Then the drift endpoint should report 150 rows against the reference
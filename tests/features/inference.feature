@@ -0,0 +1,26 @@
+Feature: Compiled model inference
+  As an operator of the ML API
+  I want supported pipelines to be evaluated with plain NumPy
+  So that inference is fast without changing predictions
+
+  Scenario: Compiled inference matches the sklearn pipeline
+    Given a StandardScaler and LogisticRegression pipeline is trained
+    When I compile the pipeline
+    Then the compiled pipeline should be available
+    And the compiled probabilities should match sklearn for 500 random rows
+
+  Scenario: Compiled float32 inference matches the sklearn pipeline
+    Given a StandardScaler and LogisticRegression pipeline is trained
+    When I compile the pipeline with dtype "float32"
+    Then the compiled pipeline should be available
+    And the compiled probabilities should match sklearn for 500 random rows
+
+  Scenario: Compiled inference rejects non-finite input
+    Given a StandardScaler and LogisticRegression pipeline is trained
+    When I compile the pipeline
+    Then the compiled pipeline should reject rows containing NaN or infinity
+
+  Scenario: Unsupported pipelines fall back to sklearn
+    Given a StandardScaler and DecisionTreeClassifier pipeline is trained
+    When I compile the pipeline
+    Then the compiled pipeline should not be available
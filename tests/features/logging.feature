@@ -0,0 +1,21 @@
+Feature: Request logging
+  As an operator of the ML API
+  I want request logs written off the request path
+  So that full request logging can stay enabled under load
+
+  Background:
+    Given the ML model is loaded
+
+  Scenario: Prediction requests are logged as JSON by the background writer
+    When I send a prediction request for a setosa flower
+    Then a JSON request record for route "predict" should be written
+    And the logged response should have the prediction "setosa"
+
+  Scenario: Requests to routes sampled at zero are not logged
+    Given requests to route "predict" are logged at a rate of 0
+    When I send a prediction request for a setosa flower
+    Then no request record should be written
+
+  Scenario: Records are dropped rather than blocking when the queue is full
+    When I log 3 records through a queue holding 1 record
+    Then 2 log records should be counted as dropped
@@ -0,0 +1,18 @@
+Feature: Model memory sharing
+  As an operator of the ML API
+  I want model weights to be shared between serving processes
+  So that adding workers does not multiply the model's memory footprint
+
+  Background:
+    Given the ML model is loaded
+
+  Scenario: Memory usage of the server process is reported
+    When I report the memory usage of the server
+    Then the resident set size of the server should be reported
+    And the memory gauge of the server should be exported
+
+  Scenario: Memory-mapped models also map their compiled weights
+    Given the model artifacts are loaded with mmap mode "r"
+    Then the model arrays should be memory-mapped
+    And the compiled weights should be memory-mapped
+    And the memory-mapped model should predict like the loaded model
@@ -0,0 +1,25 @@
+Feature: Prometheus metrics
+  As an operator of the ML API
+  I want metrics that stay bounded and cover every server process
+  So that dashboards remain accurate and cheap to scrape under load
+
+  Scenario: Requests are labelled with their route template
+    When I request the path "/api/v1/models/bdd-missing/predict" with a POST
+    Then the request should be counted for the endpoint "models/{version}/predict"
+    And no series should be labelled with the path "bdd-missing"
+
+  Scenario: Requests to unknown paths share one label
+    When I request the path "/api/v1/bdd-scanner-probe" with a GET
+    Then the request should be counted for the endpoint "unmatched"
+    And no series should be labelled with the path "bdd-scanner-probe"
+
+  Scenario: Inference latency buckets resolve sub-millisecond latencies
+    When an inference of model version "bdd-buckets" taking 80 microseconds is observed
+    And I scrape the metrics endpoint
+    Then the inference should be counted in the bucket at 0.0001 seconds
+    And the inference should not be counted in the bucket at 0.00005 seconds
+
+  Scenario: Samples of several processes are aggregated in multiprocess mode
+    Given a shared multiprocess metrics directory
+    When 2 processes each count 3 successful inferences
+    Then the aggregated metrics should count 6 successful inferences
@@ -39,7 +39,152 @@ Feature: Iris Flower Classification API
     Then I should receive an error response
     And the error message should mention "Measurement must be positive"
 
+  Scenario: Invalid request with infinite values
+    When I provide the following measurements:
+      | sepal_length | sepal_width | petal_length | petal_width |
+      | inf          | 3.5         | 1.4          | 0.2         |
+    And I send a prediction request
+    Then I should receive an error response
+    And the error message should mention "Measurement must be finite"
+
+  Scenario: Invalid request with a malformed JSON body
+    When I send a prediction request with the body "{"sepal_length": 5.1,"
+    Then I should receive an error response
+    And the error message should mention "JSON decode error"
+
   Scenario: Health check indicates model is loaded
     When I check the API health status
     Then the health check should report "healthy"
     And the model version should be available in the response
+
+  Scenario: Batch prediction scores valid rows and reports invalid rows by index
+    When I provide the following batch of measurements:
+      | sepal_length | sepal_width | petal_length | petal_width |
+      | 5.1          | 3.5         | 1.4          | 0.2         |
+      | -1.0         | 3.5         | 1.4          | 0.2         |
+      | 7.7          | 3.0         | 6.1          | 2.3         |
+    And I send a batch prediction request
+    Then I should receive a successful response
+    And the batch predictions should be "setosa,virginica"
+    And row 1 of the batch should be rejected with "Measurement must be positive"
+
+  Scenario: Batch rows that are not objects are rejected by index
+    When I provide the following batch of measurements:
+      | sepal_length | sepal_width | petal_length | petal_width |
+      | 5.1          | 3.5         | 1.4          | 0.2         |
+    And the batch also contains a row that is not an object
+    And I send a batch prediction request
+    Then I should receive a successful response
+    And the batch predictions should be "setosa"
+    And row 1 of the batch should be rejected with "valid dictionary"
+
+  Scenario Outline: Batches are scored from raw float and Arrow IPC bodies
+    When I provide the following batch of measurements:
+      | sepal_length | sepal_width | petal_length | petal_width |
+      | 5.1          | 3.5         | 1.4          | 0.2         |
+      | -1.0         | 3.5         | 1.4          | 0.2         |
+      | 7.7          | 3.0         | 6.1          | 2.3         |
+    And I send the batch as "<format>"
+    Then the response should be in the "<format>" format
+    And the binary batch predictions should be "setosa,-,virginica"
+
+    Examples:
+      | format  |
+      | float64 |
+      | float32 |
+      | arrow   |
+
+  Scenario: Binary batches of invalid rows only are answered without inference
+    Given the model is served with sklearn inference
+    When I provide the following batch of measurements:
+      | sepal_length | sepal_width | petal_length | petal_width |
+      | -1.0         | 3.5         | 1.4          | 0.2         |
+      | 5.1          | 0.0         | 1.4          | 0.2         |
+    And I send the batch as "float64"
+    Then the response should be in the "float64" format
+    And the binary batch predictions should be "-,-"
+
+  Scenario: Raw float bodies holding partial rows are rejected
+    When I send a raw float body of 20 bytes
+    Then I should receive an error response
+    And the error message should mention "whole rows"
+
+  Scenario: Concurrent predictions are coalesced when micro-batching is enabled
+    Given micro-batching is enabled
+    When I send 8 concurrent prediction requests for a setosa flower
+    Then all concurrent predictions should be "setosa"
+    And the concurrent requests should be scored in fewer model calls
+
+  Scenario: Stopping the micro-batcher fails requests being scored
+    When a micro-batch is being scored while the micro-batcher stops
+    Then the waiting prediction should fail with "Micro-batcher stopped"
+
+  Scenario: Repeated predictions are served from the cache until the model is reloaded
+    Given the prediction cache is enabled
+    When I provide the following measurements:
+      | sepal_length | sepal_width | petal_length | petal_width |
+      | 5.1          | 3.5         | 1.4          | 0.2         |
+    And I send a prediction request
+    And I send a prediction request
+    Then I should receive a successful response
+    And the prediction should be "setosa"
+    And the prediction cache should have 1 hit
+    When I reload the model
+    Then the prediction cache should be empty
+
+  Scenario Outline: Predictions and reloads are dispatched through a worker pool
+    Given inference runs in "<mode>" mode
+    When I provide the following measurements:
+      | sepal_length | sepal_width | petal_length | petal_width |
+      | 6.4          | 3.2         | 4.5          | 1.5         |
+    And I send a prediction request
+    Then I should receive a successful response
+    And the prediction should be "versicolor"
+    When I reload the model
+    And I send a prediction request
+    Then I should receive a successful response
+    And the prediction should be "versicolor"
+
+    Examples:
+      | mode    |
+      | thread  |
+      | process |
+
+  Scenario: Requests are routed to the model version in the header
+    Given a model version "bdd-canary" is published
+    When I provide the following measurements:
+      | sepal_length | sepal_width | petal_length | petal_width |
+      | 7.7          | 3.0         | 6.1          | 2.3         |
+    And I send a prediction request for model version "bdd-canary"
+    Then I should receive a successful response
+    And the prediction should be "virginica"
+    And the model version should be "bdd-canary"
+
+  Scenario: Pinned model versions are loaded by the server in process mode
+    Given inference runs in "process" mode
+    And a model version "bdd-pinned" is published
+    When I provide the following measurements:
+      | sepal_length | sepal_width | petal_length | petal_width |
+      | 5.1          | 3.5         | 1.4          | 0.2         |
+    And I send a prediction request for model version "bdd-pinned"
+    Then I should receive a successful response
+    And the model version should be "bdd-pinned"
+    And the model version "bdd-pinned" should be resident in the server
+
+  Scenario: Requests for an unknown model version are rejected
+    When I provide the following measurements:
+      | sepal_length | sepal_width | petal_length | petal_width |
+      | 5.1          | 3.5         | 1.4          | 0.2         |
+    And I send a prediction request for model version "does-not-exist"
+    Then I should receive an error response
+    And the error message should mention "Model version not found"
+
+  Scenario: Streaming predictions are scored in chunks and returned in order
+    When I stream 2500 rows alternating between setosa and virginica measurements
+    And one streamed row has a negative measurement
+    And one streamed row has an infinite measurement
+    And I send a streaming prediction request
+    Then I should receive 2500 streamed results in input order
+    And the streamed predictions should alternate between "setosa" and "virginica"
+    And the streamed row with a negative measurement should mention "Measurement must be positive"
+    And the streamed row with an infinite measurement should mention "Measurement must be finite"
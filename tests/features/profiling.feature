@@ -0,0 +1,41 @@
+Feature: Latency breakdown and profiling
+  As an operator of the ML API
+  I want to see where request time goes and profile the live server
+  So that latency regressions can be traced to their cause
+
+  Scenario: Prediction requests are timed stage by stage
+    Given the ML model is loaded
+    When I send a prediction request for a setosa flower
+    Then the "parse" stage of the "predict" endpoint should be observed
+    And the "response" stage of the "predict" endpoint should be observed
+    And the "model" inference stage should be observed
+
+  Scenario: Profiling is disabled by default
+    When I request a "cpu" profile of 0.1 seconds
+    Then the profile response status should be 404
+
+  Scenario: Profiling stays disabled without a token
+    Given profiling is enabled without a token
+    When I request a "cpu" profile of 0.1 seconds
+    Then the profile response status should be 404
+
+  Scenario: Profiling requires the token
+    Given profiling is enabled with the token "bdd-secret"
+    When I request a "cpu" profile of 0.1 seconds with the token "wrong"
+    Then the profile response status should be 403
+
+  Scenario: CPU samples are at least a millisecond apart
+    Given profiling is enabled with the token "bdd-secret"
+    When I request a "cpu" profile of 0.1 seconds every 0.01 ms with the token "bdd-secret"
+    Then the profile response status should be 400
+
+  Scenario Outline: Profiles are reported as collapsed stacks
+    Given profiling is enabled with the token "bdd-secret"
+    When I request a "<kind>" profile of 0.2 seconds with the token "bdd-secret"
+    Then the profile response status should be 200
+    And the profile should be in the collapsed stack format
+
+    Examples:
+      | kind   |
+      | cpu    |
+      | memory |
@@ -0,0 +1,17 @@
+Feature: Model hot reload
+  As an operator of the ML API
+  I want newly published models to be picked up without downtime
+  So that deployments do not cause latency spikes or manual reloads
+
+  Background:
+    Given the ML model is loaded
+
+  Scenario: Reloading swaps in a complete model snapshot
+    When I reload the model in the background
+    Then the served snapshot should be replaced
+    And the served snapshot version should match its metadata
+
+  Scenario: The watcher reloads the model when the version pointer changes
+    Given the model watcher is watching the version pointer
+    When the version pointer is republished
+    Then the watcher should reload the model
@@ -0,0 +1,20 @@
+Feature: Offline batch scoring
+  As a data engineer
+  I want to score large files without going through the API
+  So that I can backfill predictions efficiently
+
+  Scenario: A CSV file is scored in chunks on several workers
+    Given the ML model is trained and available
+    And a CSV file with 1000 rows alternating between setosa and virginica measurements
+    And row 7 of the file has a negative measurement
+    When I score the file with 2 workers in chunks of 64 rows
+    Then the output should have 1000 rows in input order
+    And the scored predictions should alternate between "setosa" and "virginica"
+    And row 7 of the output should have an error
+    And the throughput should be reported
+
+  Scenario: An empty file is scored to an output with only the header
+    Given the ML model is trained and available
+    And an empty CSV file
+    When I score the file with 1 workers in chunks of 64 rows
+    Then the output should have no rows and the header of the scored columns
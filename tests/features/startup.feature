@@ -0,0 +1,19 @@
+Feature: Server start-up
+  As an operator of the ML API
+  I want servers to start fast and only take traffic once warmed up
+  So that scale-out and rollouts do not cause latency spikes
+
+  Scenario: Importing the application does not load the model
+    When I import the application in a new process
+    Then no model should be loaded
+    And sklearn should not be imported
+
+  Scenario: The server is only ready once the model is warmed up
+    Given the ML model is trained
+    And the warm-up is held back
+    When the server starts
+    Then the liveness probe should report "alive"
+    And the readiness probe should report "starting"
+    When the warm-up is released
+    Then the readiness probe should report "healthy"
+    And the start-up phases "import,load,warmup" should be exported
@@ -0,0 +1,176 @@
+"""
+Step definitions for admission.feature
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from pytest_bdd import given, parsers, scenarios, then, when
+
+from app.admission import AdmissionController
+from app.main import admission_controller, app
+from app.utils import model_loader
+from model.config import ModelConfig
+from model.train import train_model
+
+# Load scenarios from feature file
+scenarios("../admission.feature")
+
+SETOSA = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+
+
+@pytest.fixture()
+def context():
+    """Fixture to store state between steps."""
+    return {}
+
+
+def _rejections(reason):
+    """Number of requests rejected for a reason."""
+    return (
+        REGISTRY.get_sample_value("admission_rejections_total", {"reason": reason})
+        or 0
+    )
+
+
+def _inferences():
+    """Number of model calls made so far."""
+    return (
+        REGISTRY.get_sample_value(
+            "inference_stage_duration_seconds_count", {"stage": "model"}
+        )
+        or 0
+    )
+
+
+@given("the ML model is loaded")
+def ensure_model_is_loaded():
+    """Ensure a model is loaded."""
+    if model_loader.model is None and not model_loader.reload_model():
+        train_model()
+        model_loader.reload_model()
+    assert model_loader.model is not None
+
+
+@given(
+    parsers.parse(
+        "admission allows {in_flight:d} requests in flight and {queued:d} queued"
+    )
+)
+def limit_admission(monkeypatch, in_flight, queued):
+    """Limit the admission controller of the app."""
+    monkeypatch.setattr(admission_controller, "max_in_flight", in_flight)
+    monkeypatch.setattr(admission_controller, "max_queue", queued)
+    monkeypatch.setattr(admission_controller, "queue_timeout", 0.05)
+
+
+@given(
+    parsers.parse(
+        "an admission controller with {slots:d} slot and a queue of {queued:d}"
+    )
+)
+def new_controller(context, slots, queued):
+    """Create an admission controller."""
+    context["controller"] = AdmissionController(slots, queued, queue_timeout=5)
+
+
+def _send_prediction(context, headers=None):
+    """Send a prediction request, remembering the counters before it."""
+    context["before"] = {
+        reason: _rejections(reason)
+        for reason in ("queue_full", "queue_timeout", "deadline")
+    }
+    context["inferences"] = _inferences()
+    context["response"] = TestClient(app).post(
+        "/api/v1/predict", json=SETOSA, headers=headers or {}
+    )
+
+
+@when("I send a prediction request for a setosa flower")
+def send_prediction(context):
+    """Send a prediction request."""
+    _send_prediction(context)
+
+
+@when(
+    parsers.parse(
+        "I send a prediction request for a setosa flower with a deadline of {ms:d} ms"
+    )
+)
+def send_prediction_with_deadline(context, ms):
+    """Send a prediction request with a time budget."""
+    _send_prediction(context, {ModelConfig.DEADLINE_HEADER: str(ms)})
+
+
+@when("I send a health check request")
+def send_health_check(context):
+    """Send a health check request."""
+    context["response"] = TestClient(app).get("/api/v1/health")
+
+
+@when(parsers.parse("{count:d} requests are admitted and the first finishes"))
+def admit_requests(context, count):
+    """Admit requests concurrently, finishing the first one admitted."""
+    controller = context["controller"]
+    admitted = []
+
+    async def request(index):
+        await controller.acquire()
+        admitted.append(index)
+
+    async def run():
+        tasks = []
+        for index in range(count):
+            tasks.append(asyncio.create_task(request(index)))
+            # Let each request reach the controller before the next one
+            await asyncio.sleep(0)
+        context["queued"] = controller.queued
+        controller.release()
+        await asyncio.sleep(0)
+        controller.release()
+        await asyncio.gather(*tasks)
+        controller.release()
+
+    asyncio.run(run())
+    context["admitted"] = admitted
+
+
+@then(parsers.parse("the response status should be {code:d}"))
+def check_status(context, code):
+    """Check the status code of the response."""
+    assert context["response"].status_code == code, context["response"].text
+
+
+@then("the response should tell the client when to retry")
+def check_retry_after(context):
+    """Check the response carries a Retry-After header."""
+    retry_after = context["response"].headers["Retry-After"]
+    assert retry_after == str(ModelConfig.ADMISSION_RETRY_AFTER_SECONDS)
+
+
+@then(parsers.parse('{count:d} "{reason}" rejection should be counted'))
+def check_rejections(context, count, reason):
+    """Check the rejection counter of a reason."""
+    assert _rejections(reason) == context["before"][reason] + count
+
+
+@then("no inference should have run")
+def check_no_inference(context):
+    """Check the model was not called."""
+    assert _inferences() == context["inferences"]
+
+
+@then("the queued requests should be admitted in arrival order")
+def check_order(context):
+    """Check queued requests were admitted first come first served."""
+    assert context["queued"] == 2
+    assert context["admitted"] == [0, 1, 2]
+
+
+@then("no slot should be left in use")
+def check_released(context):
+    """Check every slot was given back."""
+    controller = context["controller"]
+    assert controller.in_flight == 0
+    assert controller.queued == 0
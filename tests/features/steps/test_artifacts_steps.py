@@ -0,0 +1,178 @@
+"""
+Step definitions for artifacts.feature
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+from pytest_bdd import given, parsers, scenarios, then, when
+
+from app.registry import ModelRegistry
+from app.utils import ModelLoader
+from model.artifacts import BUNDLES_DIR, read_pointer, write_pointer
+from model.config import ModelConfig
+from model.train import train_model
+
+# Load scenarios from feature file
+scenarios("../artifacts.feature")
+
+PROJECT_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+
+@pytest.fixture()
+def context():
+    """Fixture to store state between steps."""
+    return {}
+
+
+@given("artifacts are written to a temporary directory")
+def temporary_artifacts(context, monkeypatch, tmp_path):
+    """Keep the trained models out of the shared artifacts directory."""
+    artifacts_dir = tmp_path / "artifacts"
+    artifacts_dir.mkdir()
+    monkeypatch.setattr(ModelConfig, "ARTIFACTS_DIR", str(artifacts_dir))
+    monkeypatch.setattr(
+        ModelConfig,
+        "LATEST_VERSION_PATH",
+        str(artifacts_dir / "latest_version.joblib"),
+    )
+    monkeypatch.setattr(ModelConfig, "TRAIN_SEARCH", "none")
+    monkeypatch.setattr(ModelConfig, "TRAIN_MODE", "batch")
+
+
+@given("models are saved as bundles")
+def save_bundles(monkeypatch):
+    """Train models into the bundle format."""
+    monkeypatch.setattr(ModelConfig, "ARTIFACT_FORMAT", "bundle")
+
+
+@given("only decision trees are searched")
+def search_trees(monkeypatch, tmp_path):
+    """Select among decision trees, which cannot be bundled."""
+    path = tmp_path / "search_space.json"
+    path.write_text(json.dumps([{"model": ["decision_tree"], "model__max_depth": [3]}]))
+    monkeypatch.setattr(ModelConfig, "TRAIN_SEARCH_SPACE", str(path))
+    monkeypatch.setattr(ModelConfig, "TRAIN_SEARCH", "grid")
+    monkeypatch.setattr(ModelConfig, "TRAIN_N_JOBS", 1)
+
+
+@when(parsers.parse('I train the model versions "{versions}" on the same data'))
+def train_versions(context, versions):
+    """Train one model per version."""
+    for version in versions.split(","):
+        train_model(version=version)
+
+
+@when("I load the latest model in a new process")
+def load_in_new_process(context):
+    """Load the latest model and report what was imported."""
+    code = (
+        "import json, sys; from app.utils import ModelLoader; "
+        "from model.config import ModelConfig; "
+        f"ModelConfig.ARTIFACTS_DIR = {ModelConfig.ARTIFACTS_DIR!r}; "
+        f"ModelConfig.LATEST_VERSION_PATH = {ModelConfig.LATEST_VERSION_PATH!r}; "
+        "loader = ModelLoader(); loaded = loader.reload_model(); "
+        "print(json.dumps({'loaded': loaded and loader.model is not None, "
+        "'sklearn': 'sklearn' in sys.modules, 'joblib': 'joblib' in sys.modules}))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    context["imported"] = json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@when(parsers.parse("the version pointer is rewritten {count:d} times while it is read"))
+def rewrite_pointer(context, count):
+    """Publish pointers in a thread while reading them."""
+    pointers = [
+        {"latest_version": f"v{i}", "model_path": "m" * (i % 50), "metadata_path": "x"}
+        for i in range(count)
+    ]
+    write_pointer(pointers[0])
+    done = threading.Event()
+
+    def publish():
+        for pointer in pointers:
+            write_pointer(pointer)
+        done.set()
+
+    writer = threading.Thread(target=publish)
+    writer.start()
+    context["reads"] = []
+    context["errors"] = []
+    while not done.is_set():
+        try:
+            context["reads"].append(read_pointer())
+        except Exception as e:
+            context["errors"].append(e)
+    writer.join()
+    context["pointers"] = pointers
+
+
+@then(parsers.parse("the versions should share {count:d} bundle"))
+def check_bundles(context, count):
+    """Check identical models were deduplicated."""
+    bundles = os.listdir(os.path.join(ModelConfig.ARTIFACTS_DIR, BUNDLES_DIR))
+    assert len(bundles) == count
+
+
+@then(parsers.parse('the model loader should serve version "{version}" from its bundle'))
+def check_bundle_served(context, version):
+    """Load the latest model."""
+    loader = ModelLoader()
+    assert loader.reload_model()
+    assert loader.model_info["version"] == version
+    assert os.path.isdir(loader.model_path)
+    assert loader.compiled is not None
+    context["loader"] = loader
+
+
+@then("a setosa flower should be classified")
+def check_prediction(context):
+    """Score a flower with the loaded model."""
+    features = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+    _, label, probabilities = context["loader"].predict(features)
+    assert label == "setosa"
+    assert sum(probabilities) == pytest.approx(1.0)
+
+
+@then(parsers.parse('the registry should list the versions "{versions}"'))
+def check_registry(context, versions):
+    """Check bundled versions are discovered and loadable."""
+    registry = ModelRegistry(context["loader"], artifacts_dir=ModelConfig.ARTIFACTS_DIR)
+    assert registry.versions() == versions.split(",")
+    assert registry.get(versions.split(",")[0]).model_info["version"] == "bdd-a"
+
+
+@then("the model should be loaded without sklearn or joblib")
+def check_imports(context):
+    """Check the fast loader imported nothing heavy."""
+    assert context["imported"] == {"loaded": True, "sklearn": False, "joblib": False}
+
+
+@then("the model loader should serve a pickled model")
+def check_pickled(context):
+    """Check the model fell back to the joblib format."""
+    loader = ModelLoader()
+    assert loader.reload_model()
+    assert loader.model_path.endswith(".joblib")
+    assert loader.model_info["model_type"] == "decision_tree"
+
+
+@then("every read should return a complete pointer")
+def check_pointer_reads(context):
+    """Check no read failed or returned a torn pointer."""
+    assert not context["errors"]
+    assert context["reads"]
+    for pointer in context["reads"]:
+        assert pointer in context["pointers"]
@@ -0,0 +1,96 @@
+"""
+Step definitions for benchmark.feature
+"""
+import asyncio
+import os
+
+import pytest
+from pytest_bdd import given, parsers, scenarios, then, when
+
+from benchmarks.loadgen import run_closed_loop
+from benchmarks.run import ENDPOINTS, compare, inprocess_server
+from model.config import ModelConfig
+from model.train import train_model
+
+# Load scenarios from feature file
+scenarios("../benchmark.feature")
+
+
+@pytest.fixture()
+def context():
+    """Fixture to store state between steps."""
+    return {}
+
+
+@given("the ML model is trained")
+def ensure_model_is_trained():
+    """Ensure a model version is published."""
+    if not os.path.exists(ModelConfig.LATEST_VERSION_PATH):
+        train_model()
+
+
+@given(
+    parsers.parse(
+        "a baseline of {rps:g} requests per second and a p99 of {p99:g} ms"
+    )
+)
+def baseline(context, rps, p99):
+    """Store baseline results."""
+    context["baseline"] = {"uvicorn/predict": {"throughput_rps": rps, "p99_ms": p99}}
+
+
+@when(
+    parsers.parse(
+        "I send {requests:d} health requests to the in-process server"
+        " with a concurrency of {concurrency:d}"
+    )
+)
+def run_health_load(context, requests, concurrency):
+    """Drive the health endpoint of the app served in-process."""
+
+    async def run():
+        async with inprocess_server(concurrency) as client:
+            return await run_closed_loop(
+                client, ENDPOINTS["health"], concurrency, requests
+            )
+
+    context["report"] = asyncio.run(run())
+
+
+@when(
+    parsers.parse(
+        "the results are {rps:g} requests per second and a p99 of {p99:g} ms"
+    )
+)
+def compare_results(context, rps, p99):
+    """Compare results with the baseline at the default thresholds."""
+    results = {"uvicorn/predict": {"throughput_rps": rps, "p99_ms": p99}}
+    context["regressions"] = compare(results, context["baseline"], 0.10, 0.25)
+
+
+@then(parsers.parse("the report should count {requests:d} requests and {errors:d} errors"))
+def check_counts(context, requests, errors):
+    """Check every request was measured."""
+    assert context["report"]["requests"] == requests
+    assert context["report"]["errors"] == errors
+    assert context["report"]["throughput_rps"] > 0
+
+
+@then(parsers.parse('the report should have the latency percentiles "{names}"'))
+def check_percentiles(context, names):
+    """Check the percentiles are reported in order."""
+    values = [context["report"][f"{name}_ms"] for name in names.split(",")]
+    assert all(value > 0 for value in values)
+    assert values == sorted(values), f"Percentiles out of order: {values}"
+
+
+@then("the throughput should be reported as a regression")
+def check_throughput_regression(context):
+    """Check the throughput drop beyond 10% is a regression."""
+    assert any("throughput_rps" in r for r in context["regressions"])
+
+
+@then("the p99 latency should not be reported as a regression")
+def check_no_tail_regression(context):
+    """Check a p99 increase within 25% is tolerated."""
+    assert not any("p99_ms" in r for r in context["regressions"])
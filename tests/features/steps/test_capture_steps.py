@@ -0,0 +1,225 @@
+"""
+Step definitions for capture.feature
+"""
+import asyncio
+import os
+
+import numpy as np
+import pytest
+from pytest_bdd import given, parsers, scenarios, then, when
+
+from app.capture import CaptureStore, list_segments, read_segment
+from app.executor import InferenceExecutor
+from app.registry import model_registry
+from app.utils import model_loader
+from benchmarks.replay import loader_scorer, read_captured, replay
+from model.config import ModelConfig
+from model.train import train_model
+
+# Load scenarios from feature file
+scenarios("../capture.feature")
+
+ROW = {
+    "sepal_length": 6.1,
+    "sepal_width": 2.8,
+    "petal_length": 4.7,
+    "petal_width": 1.2,
+}
+
+
+@pytest.fixture()
+def context():
+    """Fixture to store state between steps."""
+    return {}
+
+
+def _capture_store(context, request, tmp_path, start=True, **kwargs):
+    """Create a capture store writing to a temporary directory."""
+    store = CaptureStore(str(tmp_path / "capture"), flush_interval=3600, **kwargs)
+    if start:
+        store.start()
+        request.addfinalizer(store.stop)
+    context["store"] = store
+    return store
+
+
+def _captured(context):
+    """Columns of every segment written, oldest first."""
+    return [read_segment(path) for path in list_segments(context["store"].directory)]
+
+
+@given("the ML model is trained and loaded")
+def trained_model_loaded():
+    """Ensure a model version is published and served."""
+    if not os.path.exists(ModelConfig.LATEST_VERSION_PATH):
+        train_model()
+    assert model_loader.reload_model()
+
+
+@given("a started capture store")
+def started_store(context, request, tmp_path):
+    """Create and start a capture store."""
+    _capture_store(context, request, tmp_path)
+
+
+@given("a capture store that is not started")
+def stopped_store(context, request, tmp_path):
+    """Create a capture store without starting it."""
+    _capture_store(context, request, tmp_path, start=False)
+
+
+@given(parsers.parse("a capture store holding at most {rows:d} rows"))
+def small_store(context, request, tmp_path, rows):
+    """Create a capture store with a small buffer, flushed by the steps only."""
+    _capture_store(context, request, tmp_path, start=False, capacity=rows)
+
+
+@given(
+    parsers.parse(
+        "a capture store with {rows:d} rows per segment"
+        " keeping {segments:d} segments"
+    )
+)
+def rotating_store(context, request, tmp_path, rows, segments):
+    """Create a capture store with small segments, flushed by the steps only."""
+    _capture_store(
+        context,
+        request,
+        tmp_path,
+        start=False,
+        segment_rows=rows,
+        max_segments=segments,
+    )
+
+
+@when(parsers.parse("I score {batch:d} rows as a batch and {matrix:d} rows as a matrix"))
+def score_rows(context, batch, matrix):
+    """Score rows through an executor capturing to the store."""
+    executor = InferenceExecutor(
+        model_loader, model_registry, capture=context["store"]
+    )
+    X = np.array([[ROW[name] for name in ModelConfig.FEATURE_NAMES]] * matrix)
+
+    async def run():
+        _, results = await executor.predict_batch([dict(ROW)] * batch)
+        _, predictions, _ = await executor.predict_array(X)
+        return [prediction for prediction, _, _ in results] + predictions.tolist()
+
+    context["predictions"] = asyncio.run(run())
+
+
+@when(parsers.parse("{rows:d} single rows are recorded"))
+def record_rows(context, rows):
+    """Record rows numbered in their last feature."""
+    for index in range(rows):
+        context["store"].record("test", [[1.0, 1.0, 1.0, float(index)]], [0])
+
+
+@when(parsers.parse("{rows:d} single rows predicted as class {prediction:d} are recorded"))
+def record_predicted_rows(context, rows, prediction):
+    """Record rows with a prediction and its probabilities."""
+    probabilities = [[1.0 if c == prediction else 0.0 for c in range(3)]]
+    for _ in range(rows):
+        values = [[ROW[name] for name in ModelConfig.FEATURE_NAMES]]
+        context["store"].record("captured", values, [prediction], probabilities)
+
+
+@when("the capture store is flushed")
+def flush_store(context):
+    """Write the buffered rows out."""
+    context["store"].flush()
+
+
+@when("I replay the capture against the loaded model as fast as possible")
+def replay_loader(context):
+    """Replay the captured rows against the served model."""
+    segments = read_captured(context["store"].directory)
+    context["report"] = asyncio.run(replay(segments, loader_scorer(), speed=0))
+
+
+@when(parsers.parse("I replay the capture against a model predicting class {prediction:d}"))
+def replay_fake(context, prediction):
+    """Replay the captured rows against a stand-in model."""
+
+    async def score(values):
+        return "replayed", prediction, None
+
+    segments = read_captured(context["store"].directory)
+    context["report"] = asyncio.run(replay(segments, score, speed=0))
+
+
+@then(parsers.parse("the segments should hold {rows:d} rows with their predictions"))
+def check_segment_rows(context, rows):
+    """Check the captured columns."""
+    segments = _captured(context)
+    features = np.concatenate([segment["features"] for segment in segments])
+    predictions = np.concatenate([segment["prediction"] for segment in segments])
+    probabilities = np.concatenate([segment["probabilities"] for segment in segments])
+    assert features.shape == (rows, len(ModelConfig.FEATURE_NAMES))
+    assert np.allclose(features, [[ROW[name] for name in ModelConfig.FEATURE_NAMES]])
+    assert predictions.tolist() == context["predictions"]
+    assert probabilities.shape == (rows, len(ModelConfig.PREDICTION_LABELS))
+    assert list(segments[0]["feature_names"]) == ModelConfig.FEATURE_NAMES
+
+
+@then("every captured row should carry the served model version")
+def check_segment_versions(context):
+    """Check the version column."""
+    for segment in _captured(context):
+        versions = segment["versions"][segment["version"]]
+        assert set(versions.tolist()) == {model_loader.snapshot.version}
+
+
+@then(parsers.parse("the capture store should buffer {rows:d} rows"))
+def check_buffered(context, rows):
+    """Check the rows waiting to be flushed."""
+    assert context["store"].buffered == rows
+
+
+@then(parsers.parse("the segments should hold rows {first:d} to {last:d}"))
+def check_kept_rows(context, first, last):
+    """Check which numbered rows were written out."""
+    segments = _captured(context)
+    numbers = np.concatenate([segment["features"][:, 3] for segment in segments])
+    assert numbers.tolist() == list(range(first, last + 1))
+
+
+@then(
+    parsers.parse(
+        "there should be {count:d} segments holding rows {first:d} to {last:d}"
+    )
+)
+def check_rotation(context, count, first, last):
+    """Check the oldest segments were deleted."""
+    assert len(list_segments(context["store"].directory)) == count
+    check_kept_rows(context, first, last)
+
+
+@then(parsers.parse("the replay should report {requests:d} requests and {errors:d} errors"))
+def check_replay_counts(context, requests, errors):
+    """Check every row was replayed."""
+    assert context["report"]["requests"] == requests
+    assert context["report"]["errors"] == errors
+
+
+@then(parsers.parse("the replay should report {changed:d} changed predictions"))
+def check_replay_unchanged(context, changed):
+    """Check the replayed predictions match the captured ones."""
+    assert context["report"]["diffs"]["changed"] == changed
+    for entry in context["report"]["diffs"]["versions"].values():
+        assert entry["max_probability_delta"] == pytest.approx(0.0)
+
+
+@then(
+    parsers.parse(
+        "the replay should report {changed:d} changed predictions"
+        " from {before:d} to {after:d}"
+    )
+)
+def check_replay_changes(context, changed, before, after):
+    """Check the changes are reported by pair of versions."""
+    diffs = context["report"]["diffs"]
+    assert diffs["changed"] == changed
+    assert diffs["change_rate"] == 1.0
+    entry = diffs["versions"]["captured -> replayed"]
+    assert entry["changes"] == {f"{before} -> {after}": changed}
@@ -0,0 +1,105 @@
+"""
+Step definitions for dataset.feature
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from pytest_bdd import given, parsers, scenarios, then, when
+from sklearn.datasets import load_iris
+
+import model.dataset
+from model.config import ModelConfig
+from model.dataset import load_dataset
+
+# Load scenarios from feature file
+scenarios("../dataset.feature")
+
+
+@pytest.fixture()
+def context(monkeypatch, tmp_path):
+    """Fixture to store state between steps, counting conversions."""
+    context = {"conversions": 0}
+    convert = model.dataset._convert
+
+    def counting_convert(*args, **kwargs):
+        context["conversions"] += 1
+        return convert(*args, **kwargs)
+
+    monkeypatch.setattr(model.dataset, "_convert", counting_convert)
+    monkeypatch.setattr(ModelConfig, "DATASET_CACHE_ENABLED", True)
+    monkeypatch.setattr(ModelConfig, "DATASET_CACHE_DIR", str(tmp_path / "cache"))
+    context["path"] = str(tmp_path / "data.csv")
+    return context
+
+
+@given("a labelled CSV file of iris measurements and an empty dataset cache")
+def iris_csv(context):
+    """Write the iris dataset to a CSV file."""
+    iris = load_iris(as_frame=True)
+    df = iris.data.copy()
+    df["target"] = iris.target
+    df.to_csv(context["path"], index=False)
+
+
+@given("a labelled CSV file with text targets and an empty dataset cache")
+def text_target_csv(context):
+    """Write a CSV file labelled with class names."""
+    df = pd.DataFrame(
+        {"length": [1.0, 2.0, 3.0], "target": ["setosa", "versicolor", "virginica"]}
+    )
+    df.to_csv(context["path"], index=False)
+
+
+@when(parsers.parse("I load the dataset {count:d} time"))
+@when(parsers.parse("I load the dataset {count:d} times"))
+def load(context, count):
+    """Load the dataset through the cache."""
+    for _ in range(count):
+        context["dataset"] = load_dataset(context["path"])
+
+
+@when("a row is appended to the CSV file")
+def append_row(context):
+    """Change the CSV file."""
+    with open(context["path"], "a") as f:
+        f.write("6.0,3.0,4.5,1.5,1\n")
+
+
+@then(parsers.parse("the CSV file should have been converted {count:d} time"))
+@then(parsers.parse("the CSV file should have been converted {count:d} times"))
+def check_conversions(context, count):
+    """Check how often the CSV file was converted."""
+    assert context["conversions"] == count
+
+
+@then("the features should be memory-mapped")
+def check_memory_mapped(context):
+    """Check the arrays are mapped from the cache."""
+    assert isinstance(context["dataset"].X, np.memmap)
+    assert isinstance(context["dataset"].y, np.memmap)
+
+
+@then("the features should not be memory-mapped")
+def check_not_memory_mapped(context):
+    """Check the arrays were parsed."""
+    assert not isinstance(context["dataset"].X, np.memmap)
+
+
+@then(parsers.parse("the dataset should hold the {rows:d} rows of the CSV file"))
+def check_rows(context, rows):
+    """Check the dataset matches the CSV file."""
+    df = pd.read_csv(context["path"])
+    dataset = context["dataset"]
+    assert len(dataset.y) == rows
+    np.testing.assert_array_equal(dataset.X, df.drop(columns="target").to_numpy())
+    np.testing.assert_array_equal(dataset.y, df["target"].to_numpy())
+    assert dataset.feature_names == df.drop(columns="target").columns.tolist()
+    assert dataset.target_names == sorted(df["target"].unique().tolist())
+
+
+@then(parsers.parse("the dataset cache should hold {count:d} copy"))
+def check_cached_copies(count):
+    """Check stale copies were removed."""
+    assert len(os.listdir(ModelConfig.DATASET_CACHE_DIR)) == count
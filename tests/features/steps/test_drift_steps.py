@@ -0,0 +1,225 @@
+"""
+Step definitions for drift.feature
+"""
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from pytest_bdd import given, parsers, scenarios, then, when
+from sklearn.datasets import load_iris
+
+from app.drift import DriftMonitor
+from app.main import _warm_up, app
+from app.utils import load_snapshot, model_loader
+from model.config import ModelConfig
+from model.drift import QUANTILES, DriftReference, FeatureStatistics
+from model.train import train_model
+
+# Load scenarios from feature file
+scenarios("../drift.feature")
+
+
+@pytest.fixture()
+def context():
+    """Fixture to store state between steps."""
+    return {}
+
+
+@given("artifacts are written to a temporary directory")
+def temporary_artifacts(monkeypatch, tmp_path):
+    """Keep the trained model out of the shared artifacts directory."""
+    monkeypatch.setattr(ModelConfig, "ARTIFACTS_DIR", str(tmp_path))
+    monkeypatch.setattr(
+        ModelConfig, "LATEST_VERSION_PATH", str(tmp_path / "latest_version.joblib")
+    )
+    monkeypatch.setattr(ModelConfig, "DATASET_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(ModelConfig, "TRAIN_SEARCH", "none")
+
+
+@given(parsers.parse("{rows:d} rows of log-normal measurements"))
+def lognormal_rows(context, rows):
+    """Generate positive measurements of 3 features."""
+    rng = np.random.default_rng(0)
+    context["X"] = rng.lognormal(mean=1.0, sigma=0.5, size=(rows, 3))
+
+
+@given("a drift monitor with a reference of iris measurements")
+def monitor_with_reference(context):
+    """Create a drift monitor comparing against the iris measurements."""
+    X = load_iris().data
+    reference = DriftReference(ModelConfig.FEATURE_NAMES)
+    reference.observe_features(X)
+    reference.observe_predictions(load_iris().target)
+    context["X"] = X
+    context["monitor"] = DriftMonitor(ModelConfig.FEATURE_NAMES, min_rows=100)
+    context["monitor"].reset("reference-test", reference.to_dict())
+
+
+@given("a model trained without model search is served")
+def serve_trained_model(context, request):
+    """Train a model and serve it, restoring the served model afterwards."""
+    model_path, metadata_path, _ = train_model(version="drift-test")
+    previous = model_loader.snapshot
+    request.addfinalizer(lambda: setattr(model_loader, "snapshot", previous))
+    model_loader.snapshot = load_snapshot(model_path, metadata_path)
+
+
+@when(parsers.parse("I add them to feature statistics in batches of {size:d} rows"))
+def add_statistics(context, size):
+    """Add the rows to running statistics batch by batch."""
+    stats = FeatureStatistics(context["X"].shape[1])
+    context["buckets"] = stats.buckets.size
+    for offset in range(0, len(context["X"]), size):
+        stats.update(context["X"][offset : offset + size])
+    context["statistics"] = stats
+
+
+@when("I train a model without model search")
+def train_without_search(context):
+    """Train a model."""
+    _, _, context["model_info"] = train_model(version="drift-test")
+
+
+@when(parsers.parse("it observes {rows:d} rows sampled from the iris measurements"))
+def observe_sample(context, rows):
+    """Feed rows resampled from the iris measurements to the monitor."""
+    _observe_sample(context, rows, scale=1.0)
+
+
+@when(
+    parsers.parse(
+        "it observes {rows:d} rows sampled from the iris measurements "
+        "with petal length scaled by {scale:g}"
+    )
+)
+def observe_shifted_sample(context, rows, scale):
+    """Feed resampled rows with a shifted feature to the monitor."""
+    _observe_sample(context, rows, scale=scale)
+
+
+def _observe_sample(context, rows, scale):
+    """Feed resampled rows to the monitor, one row or a batch at a time."""
+    rng = np.random.default_rng(1)
+    indices = rng.integers(0, len(context["X"]), rows)
+    X = context["X"][indices].copy()
+    X[:, ModelConfig.FEATURE_NAMES.index("petal_length")] *= scale
+    predictions = load_iris().target[indices]
+    monitor = context["monitor"]
+    half = rows // 2
+    for values, prediction in zip(X[:half], predictions[:half]):
+        monitor.observe_row(values, prediction)
+    monitor.observe(X[half:], predictions[half:])
+    context["summary"] = monitor.summary()
+
+
+@when("the server is warmed up")
+def warm_up_server(context, request):
+    """Run the start-up warm-up against the served model."""
+    warmed_up = getattr(app.state, "warmed_up", True)
+    request.addfinalizer(lambda: setattr(app.state, "warmed_up", warmed_up))
+    asyncio.run(_warm_up())
+
+
+@when("I send a batch prediction request with the iris measurements")
+def send_iris_batch(context):
+    """Score the iris measurements through the API."""
+    instances = [
+        dict(zip(ModelConfig.FEATURE_NAMES, row)) for row in load_iris().data.tolist()
+    ]
+    response = TestClient(app).post(
+        "/api/v1/predict/batch", json={"instances": instances}
+    )
+    assert response.status_code == 200, response.text
+
+
+@then("the means and standard deviations should match the exact ones")
+def check_moments(context):
+    """Check the running moments against NumPy's."""
+    stats = context["statistics"]
+    np.testing.assert_allclose(stats.mean, context["X"].mean(axis=0), rtol=1e-9)
+    np.testing.assert_allclose(stats.std, context["X"].std(axis=0), rtol=1e-9)
+
+
+@then(parsers.parse("the quantiles should be within {percent:d} percent of the exact ones"))
+def check_quantiles(context, percent):
+    """Check the sketch quantiles against NumPy's."""
+    exact = np.quantile(context["X"], QUANTILES, axis=0).T
+    np.testing.assert_allclose(
+        context["statistics"].quantiles(), exact, rtol=percent / 100
+    )
+
+
+@then("the sketch should hold as many buckets as when empty")
+def check_constant_memory(context):
+    """Check the sketch did not grow."""
+    assert context["statistics"].buckets.size == context["buckets"]
+
+
+@then("the model info should hold reference statistics of every feature")
+def check_reference(context):
+    """Check the reference statistics saved with the model."""
+    reference = context["model_info"]["reference_statistics"]
+    assert set(reference["features"]) == set(ModelConfig.FEATURE_NAMES)
+    assert reference["rows"] == 120
+    assert sum(reference["predictions"].values()) == pytest.approx(1)
+
+
+@then("the reference bin fractions of every feature should sum to 1")
+def check_reference_bins(context):
+    """Check the PSI bins of the reference cover all rows."""
+    reference = context["model_info"]["reference_statistics"]
+    for feature in reference["features"].values():
+        assert sum(feature["psi_fractions"]) == pytest.approx(1)
+        assert len(feature["psi_fractions"]) == len(feature["psi_edges"]) + 1
+
+
+@then("no feature should be reported as drifted")
+def check_not_drifted(context):
+    """Check nothing was reported as drifted."""
+    assert context["summary"]["drifted"] == []
+
+
+@then(parsers.parse("the PSI of every feature should be below {limit:g}"))
+def check_psi_below(context, limit):
+    """Check the PSI of every feature and of the predictions."""
+    for name, feature in context["summary"]["features"].items():
+        assert feature["psi"] < limit, name
+    assert context["summary"]["predictions"]["psi"] < limit
+
+
+@then(parsers.parse('"{name}" should be reported as drifted'))
+def check_drifted(context, name):
+    """Check a feature was reported as drifted."""
+    assert name in context["summary"]["drifted"]
+
+
+@then(parsers.parse('"{name}" should not be reported as drifted'))
+def check_feature_not_drifted(context, name):
+    """Check a feature was not reported as drifted."""
+    assert name not in context["summary"]["drifted"]
+
+
+@then(parsers.parse("the drift endpoint should report {rows:d} rows against the reference"))
+def check_endpoint(context, rows):
+    """Check the drift endpoint counted the scored rows."""
+    response = TestClient(app).get("/api/v1/drift")
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["model_version"] == "drift-test"
+    assert summary["reference"] is True
+    assert summary["rows"] == rows
+    for feature in summary["features"].values():
+        assert feature["psi"] is not None
+
+
+@then("the drift metrics should report the PSI of every feature")
+def check_metrics(context):
+    """Check the drift gauges were published."""
+    assert TestClient(app).get("/api/v1/metrics").status_code == 200
+    for name in ModelConfig.FEATURE_NAMES:
+        psi = REGISTRY.get_sample_value("feature_drift_psi", {"feature": name})
+        assert psi is not None and psi >= 0
+        mean = REGISTRY.get_sample_value("feature_mean", {"feature": name})
+        assert mean > 0
@@ -0,0 +1,91 @@
+"""
+Step definitions for inference.feature
+"""
+import numpy as np
+import pytest
+from pytest_bdd import given, parsers, scenarios, then, when
+from sklearn.datasets import load_iris
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from app.compiled import compile_pipeline
+from model.train import build_pipeline
+
+# Load scenarios from feature file
+scenarios("../inference.feature")
+
+
+@pytest.fixture()
+def context():
+    """Fixture to store state between steps."""
+    return {}
+
+
+@given("a StandardScaler and LogisticRegression pipeline is trained")
+def train_logistic_pipeline(context):
+    """Train the default pipeline on the iris dataset."""
+    X, y = load_iris(return_X_y=True)
+    context["pipeline"] = build_pipeline().fit(X, y)
+
+
+@given("a StandardScaler and DecisionTreeClassifier pipeline is trained")
+def train_tree_pipeline(context):
+    """Train a pipeline the compiled path does not support."""
+    X, y = load_iris(return_X_y=True)
+    pipeline = Pipeline(
+        [("scaler", StandardScaler()), ("model", DecisionTreeClassifier())]
+    )
+    context["pipeline"] = pipeline.fit(X, y)
+
+
+@when("I compile the pipeline")
+def compile_default(context):
+    """Compile the trained pipeline."""
+    context["compiled"] = compile_pipeline(context["pipeline"])
+    context["atol"] = 1e-12
+
+
+@when(parsers.parse('I compile the pipeline with dtype "{dtype}"'))
+def compile_with_dtype(context, dtype):
+    """Compile the trained pipeline with a given floating point type."""
+    context["compiled"] = compile_pipeline(context["pipeline"], dtype=dtype)
+    context["atol"] = 1e-5
+
+
+@then("the compiled pipeline should be available")
+def check_compiled(context):
+    """Check the pipeline was compiled."""
+    assert context["compiled"] is not None, "Pipeline was not compiled"
+
+
+@then("the compiled pipeline should not be available")
+def check_not_compiled(context):
+    """Check the pipeline falls back to sklearn."""
+    assert context["compiled"] is None, "Unsupported pipeline was compiled"
+
+
+@then(parsers.parse("the compiled probabilities should match sklearn for {rows:d} random rows"))
+def check_parity(context, rows):
+    """Compare compiled and sklearn predictions."""
+    rng = np.random.default_rng(42)
+    X = rng.uniform(0.1, 8.0, size=(rows, 4))
+
+    expected = context["pipeline"].predict_proba(X)
+    actual = context["compiled"].predict_proba(X)
+
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=context["atol"])
+    np.testing.assert_array_equal(
+        context["compiled"].predict(X), context["pipeline"].predict(X)
+    )
+
+
+@then("the compiled pipeline should reject rows containing NaN or infinity")
+def check_non_finite_rejected(context):
+    """Check non-finite rows raise like sklearn instead of yielding NaN."""
+    for value in (np.nan, np.inf, -np.inf):
+        X = np.array([[5.1, 3.5, 1.4, 0.2], [value, 3.0, 6.1, 2.3]])
+        with pytest.raises(ValueError):
+            context["compiled"].predict_proba(X)
+        with pytest.raises(ValueError):
+            context["pipeline"].predict_proba(X)
@@ -0,0 +1,125 @@
+"""
+Step definitions for logging.feature
+"""
+import io
+import json
+import logging
+import os
+import queue
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from pytest_bdd import given, parsers, scenarios, then, when
+
+import app.log
+from app.log import JSONFormatter, NonBlockingQueueHandler
+from app.main import app as api
+from app.utils import model_loader
+from model.config import ModelConfig
+from model.train import train_model
+
+# Load scenarios from feature file
+scenarios("../logging.feature")
+
+
+@pytest.fixture()
+def context(monkeypatch):
+    """Fixture to store state between steps, capturing the log writer output."""
+    output = io.StringIO()
+    handler = logging.StreamHandler(output)
+    handler.setFormatter(JSONFormatter())
+    assert app.log._listener is not None, "Logging is not configured"
+    monkeypatch.setattr(app.log._listener, "handlers", (handler,))
+    return {"output": output}
+
+
+def _written_records(context):
+    """Wait for the writer to drain the queue and return the JSON records."""
+    marker = uuid.uuid4().hex
+    logging.getLogger("tests").warning(marker)
+    deadline = time.monotonic() + 5
+    while marker not in context["output"].getvalue():
+        assert time.monotonic() < deadline, "Log writer did not write the records"
+        time.sleep(0.01)
+    records = [json.loads(line) for line in context["output"].getvalue().splitlines()]
+    return [record for record in records if record["message"] != marker]
+
+
+@given("the ML model is loaded")
+def ensure_model_is_loaded():
+    """Ensure a model is trained and loaded."""
+    if not os.path.exists(ModelConfig.LATEST_VERSION_PATH):
+        train_model()
+    if model_loader.model is None:
+        model_loader.reload_model()
+    assert model_loader.model is not None, "Model could not be loaded"
+
+
+@given(parsers.parse('requests to route "{route}" are logged at a rate of {rate:g}'))
+def set_sample_rate(route, rate, monkeypatch):
+    """Sample the request records of a route."""
+    monkeypatch.setitem(app.log._sample_rates, route, rate)
+
+
+@when("I send a prediction request for a setosa flower")
+def send_prediction_request(context):
+    """Send a prediction request to the API."""
+    response = TestClient(api).post(
+        "/api/v1/predict",
+        json={
+            "sepal_length": 5.1,
+            "sepal_width": 3.5,
+            "petal_length": 1.4,
+            "petal_width": 0.2,
+        },
+    )
+    assert response.status_code == 200, f"Unexpected response {response.text}"
+
+
+@when(parsers.parse("I log {count:d} records through a queue holding {size:d} record"))
+def log_through_full_queue(context, count, size):
+    """Log records through a queue handler whose queue is never drained."""
+    context["dropped"] = REGISTRY.get_sample_value("log_records_dropped_total")
+    handler = NonBlockingQueueHandler(queue.Queue(size))
+    test_logger = logging.getLogger("tests.queue")
+    test_logger.propagate = False
+    test_logger.addHandler(handler)
+    try:
+        for index in range(count):
+            test_logger.warning("Record %d", index)
+    finally:
+        test_logger.removeHandler(handler)
+        test_logger.propagate = True
+
+
+@then(parsers.parse('a JSON request record for route "{route}" should be written'))
+def check_request_record(context, route):
+    """Check the request record and its structured fields."""
+    records = [r for r in _written_records(context) if r["logger"] == "app.requests"]
+    assert len(records) == 1, f"Expected one request record, got {records}"
+    assert records[0]["route"] == route
+    assert records[0]["request"]["sepal_length"] == 5.1
+    context["record"] = records[0]
+
+
+@then(parsers.parse('the logged response should have the prediction "{prediction}"'))
+def check_logged_response(context, prediction):
+    """Check the response logged with the request."""
+    assert context["record"]["response"]["prediction_label"] == prediction
+
+
+@then("no request record should be written")
+def check_no_request_record(context):
+    """Check no request record was written."""
+    records = [r for r in _written_records(context) if r["logger"] == "app.requests"]
+    assert records == [], f"Unexpected request records {records}"
+
+
+@then(parsers.parse("{count:d} log records should be counted as dropped"))
+def check_dropped_records(context, count):
+    """Check records that did not fit the queue were counted."""
+    dropped = REGISTRY.get_sample_value("log_records_dropped_total")
+    assert dropped - context["dropped"] == count
@@ -0,0 +1,109 @@
+"""
+Step definitions for memory.feature
+"""
+import os
+import shutil
+
+import numpy as np
+import pytest
+from prometheus_client import REGISTRY
+from pytest_bdd import given, parsers, scenarios, then, when
+
+from app.memory import report_memory
+from app.utils import load_snapshot, model_loader
+from model.config import ModelConfig
+from model.train import train_model
+
+# Load scenarios from feature file
+scenarios("../memory.feature")
+
+
+@pytest.fixture()
+def context():
+    """Fixture to store state between steps."""
+    return {}
+
+
+def _is_mapped(array):
+    """Check whether an array is backed by a memory-mapped file."""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+
+@given("the ML model is loaded")
+def ensure_model_is_loaded():
+    """Ensure a model is trained and loaded."""
+    if not os.path.exists(ModelConfig.LATEST_VERSION_PATH):
+        train_model()
+    if model_loader.model is None:
+        model_loader.reload_model()
+    assert model_loader.model is not None, "Model could not be loaded"
+
+
+@given(parsers.parse('the model artifacts are loaded with mmap mode "{mode}"'))
+def load_mapped_snapshot(context, mode, tmp_path, monkeypatch):
+    """Load a copy of the current artifacts with memory mapping enabled."""
+    snapshot = model_loader.snapshot
+    assert snapshot.model_path is not None, "No model loaded"
+    metadata_path = snapshot.model_path.replace("model_pipeline_", "model_metadata_")
+    model_path = shutil.copy(snapshot.model_path, tmp_path)
+    metadata_path = shutil.copy(metadata_path, tmp_path)
+
+    monkeypatch.setattr(ModelConfig, "MODEL_MMAP_MODE", mode)
+    monkeypatch.setattr(ModelConfig, "INFERENCE_MODE", "compiled")
+    context["snapshot"] = load_snapshot(model_path, metadata_path)
+    context["reference"] = snapshot
+    context["files"] = os.listdir(tmp_path)
+
+
+@when("I report the memory usage of the server")
+def report_server_memory(context):
+    """Report the memory usage of the current process."""
+    context["report"] = report_memory("bdd-server")
+
+
+@then("the resident set size of the server should be reported")
+def check_rss_reported(context):
+    """Check the report contains the RSS of this process."""
+    usage = context["report"][os.getpid()]
+    assert usage.get("rss", 0) > 0, f"Unexpected memory usage {usage}"
+
+
+@then("the memory gauge of the server should be exported")
+def check_memory_gauge(context):
+    """Check the RSS was exported as a metric."""
+    value = REGISTRY.get_sample_value(
+        "serving_process_memory_bytes", {"process": "bdd-server", "kind": "rss"}
+    )
+    assert value and value > 0, "Memory gauge was not exported"
+
+
+@then("the model arrays should be memory-mapped")
+def check_model_mapped(context):
+    """Check the pipeline's fitted arrays are mapped from the artifact."""
+    classifier = context["snapshot"].model.steps[-1][1]
+    assert _is_mapped(classifier.coef_), "Model coefficients are not mapped"
+
+
+@then("the compiled weights should be memory-mapped")
+def check_compiled_mapped(context):
+    """Check the folded weights are mapped from files next to the artifact."""
+    compiled = context["snapshot"].compiled
+    assert compiled is not None, "Model was not compiled"
+    assert _is_mapped(compiled.weights), "Compiled weights are not mapped"
+    assert _is_mapped(compiled.bias), "Compiled bias is not mapped"
+    assert any(name.endswith(".weights.npy") for name in context["files"])
+
+
+@then("the memory-mapped model should predict like the loaded model")
+def check_mapped_predictions(context):
+    """Compare predictions of the mapped and the regular snapshot."""
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0.1, 8.0, size=(100, len(ModelConfig.FEATURE_NAMES)))
+    expected = context["reference"].predict_array(X)
+    actual = context["snapshot"].predict_array(X)
+    np.testing.assert_array_equal(actual[0], expected[0])
+    np.testing.assert_allclose(actual[1], expected[1])
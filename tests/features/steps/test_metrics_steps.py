@@ -0,0 +1,161 @@
+"""
+Step definitions for metrics.feature
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+from pytest_bdd import given, parsers, scenarios, then, when
+
+from app.main import app
+from app.metrics import INFERENCE_LATENCY
+
+# Load scenarios from feature file
+scenarios("../metrics.feature")
+
+PROJECT_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+
+@pytest.fixture()
+def context():
+    """Fixture to store state between steps."""
+    return {}
+
+
+def _request_count(endpoint):
+    """Total of the request counter for an endpoint label."""
+    return sum(
+        sample.value
+        for metric in REGISTRY.collect()
+        if metric.name == "http_requests"
+        for sample in metric.samples
+        if sample.name == "http_requests_total"
+        and sample.labels["endpoint"] == endpoint
+    )
+
+
+def _run_with_metrics_dir(context, code):
+    """Run Python code in a new process sharing the multiprocess directory."""
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": context["multiproc_dir"]}
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+@given("a shared multiprocess metrics directory")
+def multiprocess_dir(context, tmp_path):
+    """Create an empty directory for the per-process sample files."""
+    context["multiproc_dir"] = str(tmp_path)
+
+
+@when(parsers.parse('I request the path "{path}" with a {method}'))
+def request_path(context, path, method):
+    """Send a request, remembering the counts before it."""
+    context["before"] = {
+        endpoint: _request_count(endpoint)
+        for endpoint in ("models/{version}/predict", "unmatched")
+    }
+    TestClient(app).request(method, path, json={})
+
+
+@when(
+    parsers.parse(
+        'an inference of model version "{version}" taking {micros:d} microseconds'
+        " is observed"
+    )
+)
+def observe_inference(context, version, micros):
+    """Record an inference latency."""
+    context["version"] = version
+    INFERENCE_LATENCY.labels(version).observe(micros / 1e6)
+
+
+@when("I scrape the metrics endpoint")
+def scrape_metrics(context):
+    """Scrape the metrics endpoint."""
+    response = TestClient(app).get("/api/v1/metrics")
+    assert response.status_code == 200
+    context["families"] = list(text_string_to_metric_families(response.text))
+
+
+@when(parsers.parse("{count:d} processes each count {inferences:d} successful inferences"))
+def count_in_processes(context, count, inferences):
+    """Count inferences in separate processes."""
+    for _ in range(count):
+        _run_with_metrics_dir(
+            context,
+            "from app.metrics import INFERENCE_COUNT; "
+            f"INFERENCE_COUNT.labels('bdd', 'success').inc({inferences})",
+        )
+
+
+@then(parsers.parse('the request should be counted for the endpoint "{endpoint}"'))
+def check_request_counted(context, endpoint):
+    """Check the request counter of the route template went up."""
+    assert _request_count(endpoint) == context["before"][endpoint] + 1
+
+
+@then(parsers.parse('no series should be labelled with the path "{text}"'))
+def check_no_raw_path_label(text):
+    """Check no label value holds the raw request path."""
+    for metric in REGISTRY.collect():
+        for sample in metric.samples:
+            assert not any(
+                text in str(value) for value in sample.labels.values()
+            ), f"Raw path in {sample}"
+
+
+def _bucket_count(context, bound):
+    """Cumulative count of the observed version's latency bucket."""
+    for family in context["families"]:
+        for sample in family.samples:
+            if (
+                sample.name == "inference_duration_seconds_bucket"
+                and sample.labels["model_version"] == context["version"]
+                and float(sample.labels["le"]) == bound
+            ):
+                return sample.value
+    raise AssertionError(f"No latency bucket at {bound} seconds")
+
+
+@then(parsers.parse("the inference should be counted in the bucket at {bound:g} seconds"))
+def check_in_bucket(context, bound):
+    """Check the observation falls in a bucket."""
+    assert _bucket_count(context, bound) == 1
+
+
+@then(parsers.parse("the inference should not be counted in the bucket at {bound:g} seconds"))
+def check_not_in_bucket(context, bound):
+    """Check the observation is above a bucket."""
+    assert _bucket_count(context, bound) == 0
+
+
+@then(parsers.parse("the aggregated metrics should count {total:d} successful inferences"))
+def check_aggregated_count(context, total):
+    """Render the metrics of all processes from another process."""
+    output = _run_with_metrics_dir(
+        context,
+        "from app.metrics import render_metrics; "
+        "print(render_metrics()[0].decode())",
+    )
+    values = [
+        sample.value
+        for family in text_string_to_metric_families(output)
+        for sample in family.samples
+        if sample.name == "inference_requests_total"
+        and sample.labels.get("model_version") == "bdd"
+    ]
+    assert values == [total], f"Unexpected samples {values}"
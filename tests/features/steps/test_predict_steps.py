@@ -1,17 +1,27 @@
 """
 Step definitions for predict.feature
 """
+import asyncio
+import json
 import os
 from contextlib import contextmanager
 from io import StringIO
 from unittest.mock import patch
 
+import httpx
+import joblib
+import numpy as np
 import pandas as pd
 import pytest
 from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
 from pytest_bdd import given, parsers, scenarios, then, when
 
-from app.main import app
+from app.batching import MicroBatcher
+from app.binary import ARROW_MEDIA_TYPE, BINARY_MEDIA_TYPE
+from app.cache import PredictionCache
+from app.main import app, inference_executor, micro_batcher
+from app.registry import model_registry
 from app.utils import model_loader
 from model.config import ModelConfig
 from model.train import train_model
@@ -26,16 +36,12 @@ scenarios("../predict.feature")
 @contextmanager
 def temp_model_loader():
     """Context manager to temporarily modify model loader for testing."""
-    original_model = model_loader.model
-    original_model_info = model_loader.model_info
-    original_model_path = model_loader.model_path
+    original_snapshot = model_loader.snapshot
 
     try:
         yield model_loader
     finally:
-        model_loader.model = original_model
-        model_loader.model_info = original_model_info
-        model_loader.model_path = original_model_path
+        model_loader.snapshot = original_snapshot
 
 
 @pytest.fixture()
@@ -66,6 +72,64 @@ def ensure_model_is_trained():
     assert model_loader.model is not None, "Model could not be loaded"
 
 
+@given("micro-batching is enabled")
+def enable_micro_batching(monkeypatch):
+    """Route single-row predictions through the micro-batcher."""
+    monkeypatch.setattr(ModelConfig, "MICRO_BATCH_ENABLED", True)
+
+
+@given("the prediction cache is enabled")
+def enable_prediction_cache(request_data, monkeypatch):
+    """Put a fresh prediction cache in front of the model loader."""
+    monkeypatch.setattr(model_loader, "cache", PredictionCache(max_size=100))
+    request_data["cache_hits"] = REGISTRY.get_sample_value(
+        "prediction_cache_hits_total"
+    )
+
+
+@given(parsers.parse('inference runs in "{mode}" mode'))
+def set_inference_mode(mode, monkeypatch, request):
+    """Dispatch inference through a worker pool for the scenario."""
+    monkeypatch.setattr(inference_executor, "mode", mode)
+    monkeypatch.setattr(inference_executor, "workers", 2)
+    request.addfinalizer(inference_executor.shutdown)
+
+
+@given("the model is served with sklearn inference")
+def serve_sklearn_model(monkeypatch, request):
+    """Serve the model with the sklearn pipeline instead of compiled inference."""
+    original_snapshot = model_loader.snapshot
+    monkeypatch.setattr(ModelConfig, "INFERENCE_MODE", "sklearn")
+    assert model_loader.reload_model()
+    assert model_loader.snapshot.compiled is None
+
+    def restore():
+        model_loader.snapshot = original_snapshot
+
+    request.addfinalizer(restore)
+
+
+@given(parsers.parse('a model version "{version}" is published'))
+def publish_model_version(version, request):
+    """Publish a copy of the current model under another version."""
+    snapshot = model_loader.snapshot
+    model_path = os.path.join(
+        ModelConfig.ARTIFACTS_DIR, f"model_pipeline_{version}.joblib"
+    )
+    metadata_path = os.path.join(
+        ModelConfig.ARTIFACTS_DIR, f"model_metadata_{version}.joblib"
+    )
+    joblib.dump(snapshot.model, model_path)
+    joblib.dump({**snapshot.model_info, "version": version}, metadata_path)
+
+    def unpublish():
+        os.remove(model_path)
+        os.remove(metadata_path)
+
+    request.addfinalizer(unpublish)
+    assert version in model_registry.versions(), "Version was not discovered"
+
+
 @when(parsers.parse("I provide the following measurements:\n{measurements}"))
 def provide_measurements(request_data, measurements):
     """Parse measurement table to dict."""
@@ -80,12 +144,36 @@ def provide_measurements(request_data, measurements):
     print(f"sending request {request_data}")
 
 
+@when(parsers.parse("I provide the following batch of measurements:\n{measurements}"))
+def provide_batch_measurements(request_data, measurements):
+    """Parse measurement table to a list of rows."""
+    df = pd.read_csv(StringIO(measurements), sep="|", skipinitialspace=True)
+    df = df.dropna(axis=1, how="all")  # Remove empty columns
+    df.columns = df.columns.str.strip()
+
+    request_data["instances"] = df.to_dict(orient="records")
+
+
+@when("the batch also contains a row that is not an object")
+def add_non_object_row(request_data):
+    """Append a row given as a list of values instead of an object."""
+    request_data["instances"].append([5.1, 3.5, 1.4, 0.2])
+
+
 @when("I send a prediction request")
 def send_prediction_request(request_data, test_client):
     """Send prediction request to API."""
     # Store response in request_data for use in then steps
+    payload = {
+        name: request_data[name]
+        for name in ModelConfig.FEATURE_NAMES
+        if name in request_data
+    }
+    # Encode with json.dumps, which writes non-finite values as Infinity/NaN
     response = test_client.post(
-        "/api/v1/predict", headers={"Content-Type": "application/json"}, json=request_data
+        "/api/v1/predict",
+        headers={"Content-Type": "application/json"},
+        content=json.dumps(payload),
     )
     print(f"response {response.json()}")
 
@@ -99,6 +187,201 @@ def send_prediction_request(request_data, test_client):
         request_data["response_json"] = None
 
 
+@when(parsers.parse('I send a prediction request with the body "{body}"'))
+def send_raw_prediction_request(request_data, test_client, body):
+    """Send a prediction request with a raw body."""
+    response = test_client.post(
+        "/api/v1/predict",
+        headers={"Content-Type": "application/json"},
+        content=body.encode(),
+    )
+    request_data["response"] = response
+    request_data["status_code"] = response.status_code
+    request_data["response_json"] = response.json()
+
+
+@when(parsers.parse('I send a prediction request for model version "{version}"'))
+def send_versioned_prediction_request(request_data, test_client, version):
+    """Send prediction request routed to a model version."""
+    payload = {name: request_data[name] for name in ModelConfig.FEATURE_NAMES}
+    response = test_client.post(
+        "/api/v1/predict",
+        headers={ModelConfig.MODEL_VERSION_HEADER: version},
+        json=payload,
+    )
+
+    request_data["response"] = response
+    request_data["status_code"] = response.status_code
+    request_data["response_json"] = response.json()
+
+
+@when("I send a batch prediction request")
+def send_batch_prediction_request(request_data, test_client):
+    """Send batch prediction request to API."""
+    response = test_client.post(
+        "/api/v1/predict/batch", json={"instances": request_data["instances"]}
+    )
+
+    request_data["response"] = response
+    request_data["status_code"] = response.status_code
+
+    try:
+        request_data["response_json"] = response.json()
+    except:
+        request_data["response_json"] = None
+
+
+@when(parsers.parse('I send the batch as "{fmt}"'))
+def send_binary_batch_prediction_request(request_data, test_client, fmt):
+    """Send the batch as a raw float matrix or an Arrow IPC stream."""
+    X = np.array(
+        [[row[name] for name in ModelConfig.FEATURE_NAMES] for row in request_data["instances"]]
+    )
+    if fmt == "arrow":
+        pa = pytest.importorskip("pyarrow")
+        table = pa.table(dict(zip(ModelConfig.FEATURE_NAMES, X.T)))
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        content_type, body = ARROW_MEDIA_TYPE, sink.getvalue().to_pybytes()
+    else:
+        content_type = f"{BINARY_MEDIA_TYPE}; dtype={fmt}"
+        body = X.astype(fmt).tobytes()
+
+    response = test_client.post(
+        "/api/v1/predict/batch", headers={"Content-Type": content_type}, content=body
+    )
+    request_data["response"] = response
+    request_data["status_code"] = response.status_code
+    assert response.status_code == 200, f"Unexpected response {response.text}"
+
+
+@when(parsers.parse("I send a raw float body of {size:d} bytes"))
+def send_partial_binary_batch(request_data, test_client, size):
+    """Send a raw float body that does not hold whole rows."""
+    response = test_client.post(
+        "/api/v1/predict/batch",
+        headers={"Content-Type": BINARY_MEDIA_TYPE},
+        content=b"\0" * size,
+    )
+    request_data["response"] = response
+    request_data["status_code"] = response.status_code
+    request_data["response_json"] = response.json()
+
+
+@when(parsers.parse("I send {count:d} concurrent prediction requests for a setosa flower"))
+def send_concurrent_prediction_requests(request_data, count):
+    """Send prediction requests concurrently on one event loop."""
+    payload = {
+        "sepal_length": 5.1,
+        "sepal_width": 3.5,
+        "petal_length": 1.4,
+        "petal_width": 0.2,
+    }
+
+    async def send_all():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            responses = await asyncio.gather(
+                *(client.post("/api/v1/predict", json=payload) for _ in range(count))
+            )
+        await micro_batcher.stop()
+        return responses
+
+    batches_before = REGISTRY.get_sample_value("micro_batch_size_count") or 0
+    request_data["responses"] = asyncio.run(send_all())
+    request_data["batches"] = (
+        REGISTRY.get_sample_value("micro_batch_size_count") - batches_before
+    )
+
+
+@when("a micro-batch is being scored while the micro-batcher stops")
+def stop_micro_batcher_in_flight(request_data):
+    """Stop a micro-batcher whose model call never completes."""
+
+    async def predict_forever(rows):
+        await asyncio.Event().wait()
+
+    async def run():
+        batcher = MicroBatcher(predict_forever)
+        waiting = asyncio.ensure_future(batcher.submit({"sepal_length": 5.1}))
+        await asyncio.sleep(0.01)
+        await batcher.stop()
+        try:
+            await asyncio.wait_for(waiting, timeout=1)
+        except Exception as e:
+            return e
+
+    request_data["error"] = asyncio.run(run())
+
+
+@when("I reload the model")
+def reload_model(request_data, test_client):
+    """Reload the model through the API."""
+    response = test_client.post("/api/v1/model/reload")
+    assert response.status_code == 200, f"Reload failed: {response.text}"
+
+
+@when(
+    parsers.parse(
+        "I stream {count:d} rows alternating between setosa and virginica measurements"
+    )
+)
+def stream_rows(request_data, count):
+    """Prepare NDJSON rows alternating between two species."""
+    setosa = {
+        "sepal_length": 5.1,
+        "sepal_width": 3.5,
+        "petal_length": 1.4,
+        "petal_width": 0.2,
+    }
+    virginica = {
+        "sepal_length": 7.7,
+        "sepal_width": 3.0,
+        "petal_length": 6.1,
+        "petal_width": 2.3,
+    }
+    request_data["rows"] = [
+        setosa if index % 2 == 0 else virginica for index in range(count)
+    ]
+
+
+@when("one streamed row has a negative measurement")
+def stream_negative_row(request_data):
+    """Make one streamed row invalid."""
+    request_data["invalid_index"] = 1234
+    request_data["rows"][1234] = {**request_data["rows"][1234], "petal_width": -1.0}
+
+
+@when("one streamed row has an infinite measurement")
+def stream_infinite_row(request_data):
+    """Make one streamed row non-finite, which json.dumps writes as Infinity."""
+    request_data["infinite_index"] = 2001
+    request_data["rows"][2001] = {
+        **request_data["rows"][2001],
+        "sepal_length": float("inf"),
+    }
+
+
+@when("I send a streaming prediction request")
+def send_streaming_prediction_request(request_data, test_client):
+    """Send the rows as a chunked NDJSON request body."""
+
+    def body():
+        for row in request_data["rows"]:
+            yield json.dumps(row).encode() + b"\n"
+
+    response = test_client.post(
+        "/api/v1/predict/stream",
+        headers={"Content-Type": "application/x-ndjson"},
+        content=body(),
+    )
+    request_data["status_code"] = response.status_code
+    request_data["results"] = [json.loads(line) for line in response.text.splitlines()]
+
+
 @when("I check the API health status")
 def check_health_status(request_data, test_client):
     """Check API health status."""
@@ -138,6 +421,147 @@ def check_prediction(request_data, prediction):
     ), f"Expected prediction '{prediction}', got '{request_data['response_json']['prediction_label']}'"
 
 
+@then(parsers.parse('the batch predictions should be "{predictions}"'))
+def check_batch_predictions(request_data, predictions):
+    """Check batch prediction labels, in input order."""
+    labels = [
+        result["prediction_label"]
+        for result in request_data["response_json"]["predictions"]
+    ]
+    assert labels == predictions.split(","), f"Unexpected batch predictions {labels}"
+
+
+@then(parsers.parse('the response should be in the "{fmt}" format'))
+def check_binary_response_format(request_data, fmt):
+    """Decode a raw float or Arrow IPC response into classes and probabilities."""
+    response = request_data["response"]
+    n_classes = len(ModelConfig.PREDICTION_LABELS)
+    if fmt == "arrow":
+        import pyarrow as pa
+
+        assert response.headers["content-type"] == ARROW_MEDIA_TYPE
+        table = pa.ipc.open_stream(pa.py_buffer(response.content)).read_all()
+        predictions = table.column("prediction").to_numpy()
+        probabilities = np.column_stack(
+            [
+                table.column(f"probability_{label}").to_numpy(zero_copy_only=False)
+                for label in ModelConfig.PREDICTION_LABELS
+            ]
+        )
+    else:
+        assert response.headers["content-type"].startswith(BINARY_MEDIA_TYPE)
+        output = np.frombuffer(response.content, dtype=fmt).reshape(-1, 1 + n_classes)
+        predictions, probabilities = output[:, 0].astype(int), output[:, 1:]
+    request_data["binary_predictions"] = predictions
+    request_data["binary_probabilities"] = probabilities
+
+
+@then(parsers.parse('the binary batch predictions should be "{predictions}"'))
+def check_binary_batch_predictions(request_data, predictions):
+    """Check classes in input order, "-" for rows rejected with class -1."""
+    probabilities = request_data["binary_probabilities"]
+    for index, (prediction, expected) in enumerate(
+        zip(request_data["binary_predictions"].tolist(), predictions.split(","))
+    ):
+        if expected == "-":
+            assert prediction == -1, f"Row {index} was not rejected"
+            assert np.isnan(probabilities[index]).all()
+        else:
+            label = ModelConfig.PREDICTION_LABELS[prediction]
+            assert label == expected, f"Expected '{expected}' for row {index}, got '{label}'"
+            assert np.isclose(probabilities[index].sum(), 1, atol=1e-3)
+
+
+@then(parsers.parse('row {index:d} of the batch should be rejected with "{text}"'))
+def check_batch_error(request_data, index, text):
+    """Check a batch row is reported as invalid by its index."""
+    errors = request_data["response_json"]["errors"]
+    assert [error["index"] for error in errors] == [index], f"Unexpected errors {errors}"
+    assert text in errors[0]["detail"], f"Expected '{text}' in {errors[0]['detail']}"
+
+
+@then(parsers.parse('all concurrent predictions should be "{prediction}"'))
+def check_concurrent_predictions(request_data, prediction):
+    """Check every concurrent request received its own prediction."""
+    for response in request_data["responses"]:
+        assert response.status_code == 200, f"Unexpected response {response.text}"
+        assert response.json()["prediction_label"] == prediction
+
+
+@then("the concurrent requests should be scored in fewer model calls")
+def check_requests_coalesced(request_data):
+    """Check the micro-batcher coalesced concurrent requests."""
+    assert (
+        0 < request_data["batches"] < len(request_data["responses"])
+    ), f"Expected coalesced batches, got {request_data['batches']}"
+
+
+@then(parsers.parse('the waiting prediction should fail with "{text}"'))
+def check_waiting_prediction_failed(request_data, text):
+    """Check the in-flight caller was released with an error."""
+    assert text in str(request_data["error"]), f"Unexpected {request_data['error']!r}"
+
+
+@then(parsers.parse("the prediction cache should have {hits:d} hit"))
+def check_cache_hits(request_data, hits):
+    """Check the number of cache hits since the cache was enabled."""
+    total = REGISTRY.get_sample_value("prediction_cache_hits_total")
+    assert total - request_data["cache_hits"] == hits, "Unexpected cache hits"
+
+
+@then("the prediction cache should be empty")
+def check_cache_empty():
+    """Check the cache was invalidated."""
+    assert len(model_loader.cache) == 0, "Prediction cache was not invalidated"
+
+
+@then(parsers.parse("I should receive {count:d} streamed results in input order"))
+def check_streamed_results(request_data, count):
+    """Check every streamed row produced one result, in order."""
+    assert request_data["status_code"] == 200
+    indices = [result["index"] for result in request_data["results"]]
+    assert indices == list(range(count)), "Streamed results are out of order"
+
+
+@then(
+    parsers.parse(
+        'the streamed predictions should alternate between "{even}" and "{odd}"'
+    )
+)
+def check_streamed_predictions(request_data, even, odd):
+    """Check streamed predictions of the valid rows."""
+    for result in request_data["results"]:
+        if result["index"] in (
+            request_data["invalid_index"],
+            request_data.get("infinite_index"),
+        ):
+            continue
+        expected = even if result["index"] % 2 == 0 else odd
+        assert result["prediction_label"] == expected, f"Unexpected result {result}"
+
+
+@then(
+    parsers.parse(
+        'the streamed row with a negative measurement should mention "{text}"'
+    )
+)
+def check_streamed_error(request_data, text):
+    """Check the invalid row is reported in-band."""
+    result = request_data["results"][request_data["invalid_index"]]
+    assert text in result["error"], f"Unexpected result {result}"
+
+
+@then(
+    parsers.parse(
+        'the streamed row with an infinite measurement should mention "{text}"'
+    )
+)
+def check_streamed_infinite_error(request_data, text):
+    """Check the non-finite row is reported in-band."""
+    result = request_data["results"][request_data["infinite_index"]]
+    assert text in result["error"], f"Unexpected result {result}"
+
+
 @then("the model version should be available in the response")
 def check_model_version(request_data):
     """Check model version is in response."""
@@ -147,6 +571,19 @@ def check_model_version(request_data):
     assert request_data["response_json"]["model_version"], "Model version is empty"
 
 
+@then(parsers.parse('the model version should be "{version}"'))
+def check_model_version_value(request_data, version):
+    """Check the model version that served the request."""
+    assert request_data["response_json"]["model_version"] == version
+
+
+@then(parsers.parse('the model version "{version}" should be resident in the server'))
+def check_version_resident(test_client, version):
+    """Check the version was loaded by the server's own registry."""
+    response = test_client.get("/api/v1/models")
+    assert version in response.json()["resident"], f"Unexpected {response.json()}"
+
+
 @then(parsers.parse('the error message should mention "{text}"'))
 def check_error_message(request_data, text):
     """Check error message contains text."""
@@ -0,0 +1,154 @@
+"""
+Step definitions for profiling.feature
+"""
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from pytest_bdd import given, parsers, scenarios, then, when
+
+from app.main import app
+from app.utils import model_loader
+from model.config import ModelConfig
+from model.train import train_model
+
+# Load scenarios from feature file
+scenarios("../profiling.feature")
+
+SETOSA = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+
+
+@pytest.fixture()
+def context():
+    """Fixture to store state between steps."""
+    return {}
+
+
+def _stage_count(name, **labels):
+    """Number of observations of a stage histogram series."""
+    return REGISTRY.get_sample_value(f"{name}_count", labels) or 0
+
+
+@given("the ML model is loaded")
+def ensure_model_is_loaded():
+    """Ensure a model is loaded."""
+    if model_loader.model is None and not model_loader.reload_model():
+        train_model()
+        model_loader.reload_model()
+    assert model_loader.model is not None
+
+
+@given(parsers.parse('profiling is enabled with the token "{token}"'))
+def enable_profiling(monkeypatch, token):
+    """Enable the profiling endpoint."""
+    monkeypatch.setattr(ModelConfig, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(ModelConfig, "PROFILING_TOKEN", token)
+
+
+@given("profiling is enabled without a token")
+def enable_profiling_without_token(monkeypatch):
+    """Enable the profiling endpoint, leaving the token unset."""
+    monkeypatch.setattr(ModelConfig, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(ModelConfig, "PROFILING_TOKEN", "")
+
+
+@when("I send a prediction request for a setosa flower")
+def send_prediction(context):
+    """Send a prediction request, remembering the stage counts before it."""
+    context["before"] = {
+        ("predict", stage): _stage_count(
+            "request_stage_duration_seconds", endpoint="predict", stage=stage
+        )
+        for stage in ("parse", "response")
+    }
+    context["before"]["model"] = _stage_count(
+        "inference_stage_duration_seconds", stage="model"
+    )
+    response = TestClient(app).post("/api/v1/predict", json=SETOSA)
+    assert response.status_code == 200
+
+
+def _request_profile(context, kind, seconds, token=None, interval_ms=None):
+    """Request a profile while another thread keeps busy."""
+    stop = threading.Event()
+
+    def busy():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy, name="bdd-busy")
+    worker.start()
+    try:
+        headers = {"X-Profiling-Token": token} if token else {}
+        params = {"kind": kind, "seconds": seconds}
+        if interval_ms is not None:
+            params["interval_ms"] = interval_ms
+        context["response"] = TestClient(app).get(
+            "/api/v1/debug/profile",
+            params=params,
+            headers=headers,
+        )
+    finally:
+        stop.set()
+        worker.join()
+
+
+@when(parsers.parse('I request a "{kind}" profile of {seconds:g} seconds'))
+def request_profile(context, kind, seconds):
+    """Request a profile without a token."""
+    _request_profile(context, kind, seconds)
+
+
+@when(
+    parsers.parse(
+        'I request a "{kind}" profile of {seconds:g} seconds with the token "{token}"'
+    )
+)
+def request_profile_with_token(context, kind, seconds, token):
+    """Request a profile with a token."""
+    _request_profile(context, kind, seconds, token)
+
+
+@when(
+    parsers.parse(
+        'I request a "{kind}" profile of {seconds:g} seconds every {interval:g} ms'
+        ' with the token "{token}"'
+    )
+)
+def request_profile_with_interval(context, kind, seconds, interval, token):
+    """Request a profile sampled at an interval."""
+    _request_profile(context, kind, seconds, token, interval_ms=interval)
+
+
+@then(parsers.parse('the "{stage}" stage of the "{endpoint}" endpoint should be observed'))
+def check_request_stage(context, stage, endpoint):
+    """Check the request stage histogram counted the request."""
+    count = _stage_count(
+        "request_stage_duration_seconds", endpoint=endpoint, stage=stage
+    )
+    assert count == context["before"][(endpoint, stage)] + 1
+
+
+@then(parsers.parse('the "{stage}" inference stage should be observed'))
+def check_inference_stage(context, stage):
+    """Check the inference stage histogram counted the prediction."""
+    count = _stage_count("inference_stage_duration_seconds", stage=stage)
+    assert count > context["before"][stage]
+
+
+@then(parsers.parse("the profile response status should be {code:d}"))
+def check_profile_status(context, code):
+    """Check the status code of the profile response."""
+    assert context["response"].status_code == code, context["response"].text
+
+
+@then("the profile should be in the collapsed stack format")
+def check_collapsed_stacks(context):
+    """Check every line is a stack followed by a positive weight."""
+    lines = context["response"].text.splitlines()
+    assert lines
+    for line in lines:
+        stack, weight = line.rsplit(" ", 1)
+        assert stack
+        assert int(weight) > 0
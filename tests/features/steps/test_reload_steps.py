@@ -0,0 +1,86 @@
+"""
+Step definitions for reload.feature
+"""
+import asyncio
+import os
+
+import pytest
+from pytest_bdd import given, scenarios, then, when
+
+from app.main import inference_executor
+from app.utils import model_loader
+from app.watcher import ModelWatcher
+from model.config import ModelConfig
+from model.train import train_model
+
+# Load scenarios from feature file
+scenarios("../reload.feature")
+
+
+@pytest.fixture()
+def context():
+    """Fixture to store state between steps."""
+    return {}
+
+
+@given("the ML model is loaded")
+def ensure_model_is_loaded(context):
+    """Ensure a model is trained and loaded."""
+    if not os.path.exists(ModelConfig.LATEST_VERSION_PATH):
+        train_model()
+    if model_loader.model is None:
+        model_loader.reload_model()
+    assert model_loader.model is not None, "Model could not be loaded"
+    context["snapshot"] = model_loader.snapshot
+
+
+@given("the model watcher is watching the version pointer")
+def start_watcher(context):
+    """Create a watcher recording its reloads."""
+    reloads = []
+
+    async def reload():
+        reloads.append(await inference_executor.reload())
+        return True
+
+    context["reloads"] = reloads
+    context["watcher"] = ModelWatcher(ModelConfig.LATEST_VERSION_PATH, reload)
+
+
+@when("I reload the model in the background")
+def reload_in_background(context):
+    """Reload the model off the event loop."""
+    assert asyncio.run(inference_executor.reload()), "Reload failed"
+
+
+@when("the version pointer is republished")
+def republish_pointer(context):
+    """Bump the modification time of the version pointer."""
+    stat = os.stat(ModelConfig.LATEST_VERSION_PATH)
+    os.utime(
+        ModelConfig.LATEST_VERSION_PATH,
+        ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000),
+    )
+    context["reloaded"] = asyncio.run(context["watcher"].check())
+
+
+@then("the served snapshot should be replaced")
+def check_snapshot_replaced(context):
+    """Check a new snapshot object is being served."""
+    assert model_loader.snapshot is not context["snapshot"], "Snapshot not swapped"
+
+
+@then("the served snapshot version should match its metadata")
+def check_snapshot_consistent():
+    """Check the served model and version label belong together."""
+    snapshot = model_loader.snapshot
+    assert snapshot.model is not None
+    assert snapshot.version == snapshot.model_info["version"]
+    assert snapshot.version in snapshot.model_path
+
+
+@then("the watcher should reload the model")
+def check_watcher_reloaded(context):
+    """Check the watcher triggered exactly one successful reload."""
+    assert context["reloaded"], "Watcher did not detect the new pointer"
+    assert context["reloads"] == [True], f"Unexpected reloads {context['reloads']}"
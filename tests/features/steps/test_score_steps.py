@@ -0,0 +1,116 @@
+"""
+Step definitions for score.feature
+"""
+import os
+
+import pandas as pd
+import pytest
+from pytest_bdd import given, parsers, scenarios, then, when
+
+from model.config import ModelConfig
+from model.score import score_file
+from model.train import train_model
+
+# Load scenarios from feature file
+scenarios("../score.feature")
+
+SETOSA = [5.1, 3.5, 1.4, 0.2]
+VIRGINICA = [7.7, 3.0, 6.1, 2.3]
+
+
+@pytest.fixture()
+def context():
+    """Fixture to store state between steps."""
+    return {}
+
+
+@given("the ML model is trained and available")
+def ensure_model_is_trained():
+    """Ensure a model has been trained."""
+    if not os.path.exists(ModelConfig.LATEST_VERSION_PATH):
+        train_model()
+
+
+@given(
+    parsers.parse(
+        "a CSV file with {count:d} rows alternating between setosa and virginica measurements"
+    )
+)
+def write_input_file(context, count, tmp_path):
+    """Write an input file with an id column and the feature columns."""
+    rows = [SETOSA if index % 2 == 0 else VIRGINICA for index in range(count)]
+    frame = pd.DataFrame(rows, columns=ModelConfig.FEATURE_NAMES)
+    frame.insert(0, "id", range(count))
+    context["frame"] = frame
+    context["input_path"] = str(tmp_path / "input.csv")
+    context["output_path"] = str(tmp_path / "output.csv")
+
+
+@given("an empty CSV file")
+def write_empty_file(context, tmp_path):
+    """Write an input file without even a header."""
+    context["frame"] = None
+    context["input_path"] = str(tmp_path / "input.csv")
+    context["output_path"] = str(tmp_path / "output.csv")
+    open(context["input_path"], "w").close()
+
+
+@given(parsers.parse("row {index:d} of the file has a negative measurement"))
+def make_row_invalid(context, index):
+    """Make one input row invalid."""
+    context["frame"].loc[index, "petal_width"] = -1.0
+
+
+@when(parsers.parse("I score the file with {workers:d} workers in chunks of {size:d} rows"))
+def score_input_file(context, workers, size):
+    """Score the input file with the offline scorer."""
+    if context["frame"] is not None:
+        context["frame"].to_csv(context["input_path"], index=False)
+    context["stats"] = score_file(
+        context["input_path"], context["output_path"], workers=workers, chunk_size=size
+    )
+    context["output"] = pd.read_csv(context["output_path"], keep_default_na=False)
+
+
+@then(parsers.parse("the output should have {count:d} rows in input order"))
+def check_output_order(context, count):
+    """Check every input row was written once, in order."""
+    assert context["output"]["id"].tolist() == list(range(count))
+
+
+@then(
+    parsers.parse(
+        'the scored predictions should alternate between "{even}" and "{odd}"'
+    )
+)
+def check_scored_predictions(context, even, odd):
+    """Check the predictions of the valid rows."""
+    output = context["output"]
+    valid = output[output["error"] == ""]
+    expected = [even if index % 2 == 0 else odd for index in valid["id"]]
+    assert valid["prediction_label"].tolist() == expected
+
+
+@then(parsers.parse("row {index:d} of the output should have an error"))
+def check_row_error(context, index):
+    """Check the invalid row was reported instead of scored."""
+    row = context["output"].iloc[index]
+    assert row["error"], f"Row {index} was not rejected"
+    assert row["prediction"] == -1
+
+
+@then("the output should have no rows and the header of the scored columns")
+def check_empty_output(context):
+    """Check an output file was written with the header only."""
+    output = context["output"]
+    assert len(output) == 0
+    assert list(output.columns[:4]) == ModelConfig.FEATURE_NAMES
+    assert {"prediction", "prediction_label", "error"} <= set(output.columns)
+    assert context["stats"]["rows"] == 0
+
+
+@then("the throughput should be reported")
+def check_throughput(context):
+    """Check the scoring statistics."""
+    assert context["stats"]["rows"] == len(context["frame"])
+    assert context["stats"]["rows_per_second"] > 0
@@ -0,0 +1,138 @@
+"""
+Step definitions for startup.feature
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from pytest_bdd import given, parsers, scenarios, then, when
+
+import app.main
+from model.config import ModelConfig
+from model.train import train_model
+
+# Load scenarios from feature file
+scenarios("../startup.feature")
+
+PROJECT_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+
+@pytest.fixture()
+def context():
+    """Fixture to store state between steps."""
+    return {}
+
+
+@given("the ML model is trained")
+def ensure_model_is_trained():
+    """Ensure a model version is published."""
+    if not os.path.exists(ModelConfig.LATEST_VERSION_PATH):
+        train_model()
+
+
+@given("the warm-up is held back")
+def hold_back_warm_up(context, monkeypatch):
+    """Keep the warm-up running until it is released."""
+    release = threading.Event()
+    warm_up = app.main.warm_up
+
+    async def held_back_warm_up(*args, **kwargs):
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+        await warm_up(*args, **kwargs)
+
+    monkeypatch.setattr(app.main, "warm_up", held_back_warm_up)
+    context["release"] = release
+
+
+@when("I import the application in a new process")
+def import_application(context):
+    """Import the application and report what it loaded."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import json, sys; import app.main; "
+            "from app.utils import model_loader; "
+            "print(json.dumps({'model': model_loader.model is not None, "
+            "'sklearn': 'sklearn' in sys.modules}))",
+        ],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    context["imported"] = json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@when("the server starts")
+def start_server(context, request):
+    """Run the application lifespan."""
+    client = TestClient(app.main.app)
+    client.__enter__()
+
+    def stop():
+        context["release"].set()
+        client.__exit__(None, None, None)
+
+    request.addfinalizer(stop)
+    context["client"] = client
+
+
+@when("the warm-up is released")
+def release_warm_up(context):
+    """Let the warm-up run."""
+    context["release"].set()
+
+
+@then("no model should be loaded")
+def check_no_model(context):
+    """Check importing did not load a model."""
+    assert context["imported"]["model"] is False
+
+
+@then("sklearn should not be imported")
+def check_no_sklearn(context):
+    """Check importing did not import sklearn."""
+    assert context["imported"]["sklearn"] is False
+
+
+@then(parsers.parse('the liveness probe should report "{status}"'))
+def check_liveness(context, status):
+    """Check the liveness probe."""
+    response = context["client"].get("/api/v1/health/live")
+    assert response.status_code == 200
+    assert response.json()["status"] == status
+
+
+@then(parsers.parse('the readiness probe should report "{status}"'))
+def check_readiness(context, status):
+    """Check the readiness probe, waiting for it to become ready."""
+    deadline = time.monotonic() + 30
+    while True:
+        response = context["client"].get("/api/v1/health/ready")
+        if response.json()["status"] == status or time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+    assert response.json()["status"] == status, f"Unexpected {response.json()}"
+    assert response.status_code == (200 if status == "healthy" else 503)
+
+
+@then(parsers.parse('the start-up phases "{phases}" should be exported'))
+def check_phases(phases):
+    """Check the duration of every start-up phase was exported."""
+    for phase in phases.split(","):
+        value = REGISTRY.get_sample_value(
+            "startup_phase_duration_seconds", {"phase": phase}
+        )
+        assert value is not None and value >= 0, f"Phase {phase} not exported"
@@ -0,0 +1,176 @@
+"""
+Step definitions for training.feature
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+from pytest_bdd import given, parsers, scenarios, then, when
+from sklearn.datasets import load_iris
+from sklearn.preprocessing import StandardScaler
+
+from app.compiled import compile_pipeline
+from app.utils import ModelLoader
+from model.config import ModelConfig
+from model.train import _holdout_mask, load_search_space, train_model, train_streaming
+
+# Load scenarios from feature file
+scenarios("../training.feature")
+
+
+@pytest.fixture()
+def context():
+    """Fixture to store state between steps."""
+    return {}
+
+
+@given("a labelled CSV file of iris measurements")
+def iris_csv(context, monkeypatch, tmp_path):
+    """Write the iris dataset to a CSV file."""
+    monkeypatch.setattr(ModelConfig, "DATASET_CACHE_DIR", str(tmp_path / "cache"))
+    iris = load_iris(as_frame=True)
+    df = iris.data.copy()
+    df["target"] = iris.target
+    context["path"] = str(tmp_path / "iris.csv")
+    context["data"] = df
+    df.to_csv(context["path"], index=False)
+
+
+@given("artifacts are written to a temporary directory")
+def temporary_artifacts(monkeypatch, tmp_path):
+    """Keep the trained model out of the shared artifacts directory."""
+    monkeypatch.setattr(ModelConfig, "ARTIFACTS_DIR", str(tmp_path))
+    monkeypatch.setattr(
+        ModelConfig, "LATEST_VERSION_PATH", str(tmp_path / "latest_version.joblib")
+    )
+
+
+@given(parsers.parse('a search space of logistic regressions with C in "{values}"'))
+def logistic_search_space(monkeypatch, tmp_path, values):
+    """Search only logistic regressions."""
+    path = tmp_path / "search_space.json"
+    grid = {"model": ["logistic_regression"], "model__C": [float(v) for v in values.split(",")]}
+    path.write_text(json.dumps([grid]))
+    monkeypatch.setattr(ModelConfig, "TRAIN_SEARCH_SPACE", str(path))
+
+
+@given(parsers.parse('a search space of "{model_type}" models'))
+def unknown_search_space(context, tmp_path, model_type):
+    """Write a search space naming a model type."""
+    path = tmp_path / "search_space.json"
+    path.write_text(json.dumps([{"model": [model_type]}]))
+    context["search_space_path"] = str(path)
+
+
+@when(
+    parsers.parse("I train incrementally in chunks of {chunk_size:d} rows over {epochs:d} epochs")
+)
+def train_incrementally(context, chunk_size, epochs):
+    """Train over the CSV file in chunks."""
+    context["chunk_size"] = chunk_size
+    pipeline, accuracy, feature_names, classes = train_streaming(
+        context["path"], chunk_size=chunk_size, epochs=epochs
+    )
+    context.update(pipeline=pipeline, accuracy=accuracy, classes=classes)
+
+
+@when("I train a model with the streaming training mode")
+def train_streaming_model(monkeypatch):
+    """Train and publish a model with streaming training."""
+    monkeypatch.setattr(ModelConfig, "TRAIN_MODE", "streaming")
+    train_model()
+
+
+@when(
+    parsers.parse(
+        'I train a model with a "{search}" search over {folds:d} folds on {jobs:d} processes'
+    )
+)
+def train_with_search(monkeypatch, search, folds, jobs):
+    """Train and publish a model selected by cross-validation."""
+    monkeypatch.setattr(ModelConfig, "TRAIN_MODE", "batch")
+    monkeypatch.setattr(ModelConfig, "TRAIN_SEARCH", search)
+    monkeypatch.setattr(ModelConfig, "TRAIN_CV_FOLDS", folds)
+    monkeypatch.setattr(ModelConfig, "TRAIN_N_JOBS", jobs)
+    train_model()
+
+
+@when("I load the search space")
+def load_space(context):
+    """Load the search space, remembering the error."""
+    try:
+        load_search_space(context["search_space_path"])
+    except ValueError as e:
+        context["error"] = e
+
+
+@then("the scaler statistics should match those of the training rows")
+def check_scaler(context):
+    """Check the streamed statistics equal those fitted on all training rows."""
+    df = context["data"]
+    chunk_size = context["chunk_size"]
+    holdout = np.concatenate(
+        [
+            _holdout_mask(index, len(df[start : start + chunk_size]), 0.2, 42)
+            for index, start in enumerate(range(0, len(df), chunk_size))
+        ]
+    )
+    expected = StandardScaler().fit(df.drop(columns="target").to_numpy()[~holdout])
+    scaler = context["pipeline"].named_steps["scaler"]
+    np.testing.assert_allclose(scaler.mean_, expected.mean_)
+    np.testing.assert_allclose(scaler.var_, expected.var_)
+
+
+@then("the pipeline should be supported by compiled inference")
+def check_compiled(context):
+    """Check the fitted pipeline compiles."""
+    assert compile_pipeline(context["pipeline"]) is not None
+    assert context["classes"] == [0, 1, 2]
+
+
+@then(parsers.parse("the holdout accuracy should be above {threshold:g}"))
+def check_accuracy(context, threshold):
+    """Check the holdout accuracy."""
+    assert context["accuracy"] > threshold
+
+
+@then(parsers.parse('the model loader should serve a model of type "{model_type}"'))
+def check_served_model(context, model_type):
+    """Load the published model."""
+    loader = ModelLoader()
+    assert loader.reload_model()
+    assert loader.model_info["model_type"] == model_type
+    assert os.path.dirname(loader.model_path) == ModelConfig.ARTIFACTS_DIR
+    context["loader"] = loader
+
+
+@then("a setosa flower should be classified")
+def check_prediction(context):
+    """Score a flower with the published model."""
+    features = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+    prediction, label, probabilities = context["loader"].predict(features)
+    assert label == "setosa"
+    assert len(probabilities) == 3
+
+
+@then(parsers.parse("the model info should hold the scores of {folds:d} folds"))
+def check_cv_scores(context, folds):
+    """Check the cross-validation scores of the winner were saved."""
+    cv_scores = context["loader"].model_info["cv_scores"]
+    assert len(cv_scores["folds"]) == folds
+    assert cv_scores["mean"] == pytest.approx(np.mean(cv_scores["folds"]))
+    assert cv_scores["params"]["model"] == "logistic_regression"
+
+
+@then(parsers.parse('the selected C should be one of "{values}"'))
+def check_selected_c(context, values):
+    """Check the winner comes from the search space."""
+    selected = context["loader"].model_info["cv_scores"]["params"]["model__C"]
+    assert selected in [float(v) for v in values.split(",")]
+
+
+@then(parsers.parse('an error naming "{text}" should be raised'))
+def check_error(context, text):
+    """Check the error message."""
+    assert text in str(context["error"])
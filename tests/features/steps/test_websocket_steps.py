@@ -0,0 +1,275 @@
+"""
+Step definitions for websocket.feature
+"""
+import asyncio
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from pytest_bdd import given, parsers, scenarios, then, when
+from starlette.websockets import WebSocketDisconnect
+
+from app.channel import PredictionChannel
+from app.main import app
+from app.utils import model_loader
+from model.config import ModelConfig
+from model.train import train_model
+
+# Load scenarios from feature file
+scenarios("../websocket.feature")
+
+SETOSA = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+
+
+@pytest.fixture()
+def context():
+    """Fixture to store state between steps."""
+    return {}
+
+
+class FakeWebSocket:
+    """In-memory WebSocket whose received messages are already buffered."""
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []
+
+    def deliver(self, request_id):
+        """Buffer a prediction message from the client."""
+        message = json.dumps({"id": request_id, "features": SETOSA})
+        self.incoming.put_nowait({"type": "websocket.receive", "text": message})
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+class FakeModel:
+    """Scores every row as setosa, recording the size of each call."""
+
+    def __init__(self):
+        self.calls = []
+        self.slow_calls = set()
+        self.released = None
+
+    async def predict_array(self, X):
+        self.calls.append(len(X))
+        if len(self.calls) in self.slow_calls:
+            await asyncio.sleep(0.05)
+        if self.released is not None:
+            await self.released.wait()
+        return "test", np.zeros(len(X), dtype=int), None
+
+
+def _flow_control_waits():
+    """Number of times a connection stopped reading at its limit."""
+    return REGISTRY.get_sample_value("websocket_flow_control_waits_total") or 0
+
+
+@given("the ML model is loaded")
+def ensure_model_is_loaded():
+    """Ensure a model is loaded."""
+    if model_loader.model is None and not model_loader.reload_model():
+        train_model()
+        model_loader.reload_model()
+    assert model_loader.model is not None
+
+
+@given(
+    parsers.parse(
+        "a prediction channel allowing {in_flight:d} rows in flight "
+        "in groups of {group_size:d}"
+    )
+)
+def prediction_channel(context, in_flight, group_size):
+    """Describe a channel served by a fake model over a fake WebSocket."""
+    context["model"] = FakeModel()
+    context["limits"] = (in_flight, group_size)
+
+
+@given("the first model call is slow")
+def slow_first_call(context):
+    """Make the first model call take a while."""
+    context["model"].slow_calls.add(1)
+
+
+@given("model calls wait until released")
+def blocked_model_calls(context):
+    """Make model calls wait for a release."""
+    context["blocked"] = True
+
+
+def _run_channel(context, scenario):
+    """Run a channel and a scenario driving it on a new event loop."""
+
+    async def run():
+        model = context["model"]
+        if context.get("blocked"):
+            model.released = asyncio.Event()
+        websocket = FakeWebSocket()
+        in_flight, group_size = context["limits"]
+        channel = PredictionChannel(
+            websocket,
+            model.predict_array,
+            max_in_flight=in_flight,
+            max_group_size=group_size,
+        )
+        task = asyncio.create_task(channel.run())
+        await scenario(websocket, model)
+        websocket.incoming.put_nowait({"type": "websocket.disconnect"})
+        await asyncio.wait_for(task, 5)
+        context["websocket"] = websocket
+
+    asyncio.run(run())
+
+
+async def _wait_for_responses(websocket, count):
+    """Wait until a number of responses were sent."""
+    for _ in range(500):
+        if len(websocket.sent) >= count:
+            return
+        await asyncio.sleep(0.01)
+
+
+@when(parsers.parse("I send {count:d} setosa prediction messages over a WebSocket"))
+def send_messages(context, count):
+    """Pipeline prediction messages, then read all responses."""
+    context["ids"] = [f"request-{index}" for index in range(count)]
+    with TestClient(app).websocket_connect("/api/v1/predict/ws") as websocket:
+        for request_id in context["ids"]:
+            websocket.send_text(json.dumps({"id": request_id, "features": SETOSA}))
+        context["responses"] = [websocket.receive_json() for _ in range(count)]
+
+
+@when("I send a prediction message with a negative petal width over a WebSocket")
+def send_invalid_message(context):
+    """Send an invalid prediction message."""
+    context["ids"] = ["invalid"]
+    features = {**SETOSA, "petal_width": -1}
+    with TestClient(app).websocket_connect("/api/v1/predict/ws") as websocket:
+        websocket.send_text(json.dumps({"id": "invalid", "features": features}))
+        context["responses"] = [websocket.receive_json()]
+
+
+@when(parsers.parse('I open a WebSocket for the model version "{version}"'))
+def open_versioned_websocket(context, version):
+    """Open a WebSocket requesting a model version."""
+    headers = {ModelConfig.MODEL_VERSION_HEADER: version}
+    with pytest.raises(WebSocketDisconnect) as e:
+        with TestClient(app).websocket_connect(
+            "/api/v1/predict/ws", headers=headers
+        ) as websocket:
+            websocket.receive_json()
+    context["close_code"] = e.value.code
+
+
+@when(parsers.parse("{count:d} messages are received at once"))
+def receive_at_once(context, count):
+    """Buffer messages for the channel all at once."""
+    context["count"] = count
+
+    async def scenario(websocket, model):
+        context["waits"] = _flow_control_waits()
+        for index in range(count):
+            websocket.deliver(index)
+        if model.released is None:
+            await _wait_for_responses(websocket, count)
+            return
+        await asyncio.sleep(0.05)
+        context["unread"] = websocket.incoming.qsize()
+        context["waits_after"] = _flow_control_waits()
+        model.released.set()
+        await _wait_for_responses(websocket, count)
+
+    _run_channel(context, scenario)
+
+
+@when("a message is received, then another one while the first is scored")
+def receive_while_scoring(context):
+    """Deliver a second message once the first is being scored."""
+    context["count"] = 2
+
+    async def scenario(websocket, model):
+        websocket.deliver("first")
+        while not model.calls:
+            await asyncio.sleep(0)
+        websocket.deliver("second")
+        await _wait_for_responses(websocket, 2)
+
+    _run_channel(context, scenario)
+
+
+@then(parsers.parse("I should receive {count:d} responses tagged with the IDs I sent"))
+def check_ids(context, count):
+    """Check every request was answered once, by its ID."""
+    ids = [response["id"] for response in context["responses"]]
+    assert len(ids) == count
+    assert sorted(ids) == sorted(context["ids"])
+
+
+@then(parsers.parse('every response should predict "{label}"'))
+def check_labels(context, label):
+    """Check the predicted label of every response."""
+    for response in context["responses"]:
+        assert response["prediction_label"] == label
+        assert response["model_version"] == model_loader.snapshot.version
+
+
+@then("I should receive an error tagged with the ID I sent")
+def check_error(context):
+    """Check the invalid message was answered with an error."""
+    response = context["responses"][0]
+    assert response["id"] == "invalid"
+    assert "petal_width" in response["error"]
+
+
+@then(parsers.parse("the WebSocket should be closed with code {code:d}"))
+def check_close_code(context, code):
+    """Check the code the server closed the WebSocket with."""
+    assert context["close_code"] == code
+
+
+@then("every message should be answered")
+def check_answered(context):
+    """Check every message was answered exactly once."""
+    ids = [response["id"] for response in context["websocket"].sent]
+    assert sorted(ids) == list(range(context["count"]))
+
+
+@then(parsers.parse("no model call should score more than {size:d} rows"))
+def check_group_size(context, size):
+    """Check the size of every model call."""
+    assert max(context["model"].calls) <= size
+
+
+@then(parsers.parse("fewer than {count:d} model calls should have been made"))
+def check_grouped(context, count):
+    """Check rows were scored in groups rather than one by one."""
+    assert len(context["model"].calls) < count
+
+
+@then("the second message should be answered first")
+def check_out_of_order(context):
+    """Check responses were sent in completion order."""
+    ids = [response["id"] for response in context["websocket"].sent]
+    assert ids == ["second", "first"]
+
+
+@then(
+    parsers.parse(
+        "only {count:d} messages should have been read while the model calls waited"
+    )
+)
+def check_reads(context, count):
+    """Check the channel stopped reading at its in-flight limit."""
+    assert context["count"] - context["unread"] == count
+
+
+@then("the channel should have waited for flow control")
+def check_flow_control_metric(context):
+    """Check the flow control wait was counted."""
+    assert context["waits_after"] > context["waits"]
@@ -0,0 +1,30 @@
+Feature: Model training
+  As a data scientist
+  I want to train on datasets larger than memory
+  So that training does not run out of memory as our data grows
+
+  Scenario: Streaming training fits the pipeline chunk by chunk
+    Given a labelled CSV file of iris measurements
+    When I train incrementally in chunks of 32 rows over 5 epochs
+    Then the scaler statistics should match those of the training rows
+    And the pipeline should be supported by compiled inference
+    And the holdout accuracy should be above 0.6
+
+  Scenario: A streamed model is served like a batch trained one
+    Given artifacts are written to a temporary directory
+    When I train a model with the streaming training mode
+    Then the model loader should serve a model of type "sgd_classifier"
+    And a setosa flower should be classified
+
+  Scenario: Batch training selects the model by cross-validation
+    Given artifacts are written to a temporary directory
+    And a search space of logistic regressions with C in "0.1,1.0"
+    When I train a model with a "grid" search over 3 folds on 2 processes
+    Then the model loader should serve a model of type "logistic_regression"
+    And the model info should hold the scores of 3 folds
+    And the selected C should be one of "0.1,1.0"
+
+  Scenario: Unknown model types in the search space are rejected
+    Given a search space of "gradient_boosting" models
+    When I load the search space
+    Then an error naming "gradient_boosting" should be raised
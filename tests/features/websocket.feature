@@ -0,0 +1,41 @@
+Feature: WebSocket prediction channel
+  As a real-time client of the ML API
+  I want to pipeline single-row predictions over one connection
+  So that each row does not pay for a whole HTTP request
+
+  Scenario: Pipelined messages are answered with their IDs
+    Given the ML model is loaded
+    When I send 20 setosa prediction messages over a WebSocket
+    Then I should receive 20 responses tagged with the IDs I sent
+    And every response should predict "setosa"
+
+  Scenario: Invalid messages are answered with an error
+    Given the ML model is loaded
+    When I send a prediction message with a negative petal width over a WebSocket
+    Then I should receive an error tagged with the ID I sent
+
+  Scenario: An unknown model version closes the connection
+    Given the ML model is loaded
+    When I open a WebSocket for the model version "does-not-exist"
+    Then the WebSocket should be closed with code 1008
+
+  Scenario: Messages received together are scored in groups
+    Given a prediction channel allowing 100 rows in flight in groups of 64
+    When 250 messages are received at once
+    Then every message should be answered
+    And no model call should score more than 64 rows
+    And fewer than 10 model calls should have been made
+
+  Scenario: Responses are sent as soon as their group is scored
+    Given a prediction channel allowing 100 rows in flight in groups of 64
+    And the first model call is slow
+    When a message is received, then another one while the first is scored
+    Then the second message should be answered first
+
+  Scenario: Reading stops at the in-flight limit
+    Given a prediction channel allowing 10 rows in flight in groups of 64
+    And model calls wait until released
+    When 50 messages are received at once
+    Then only 10 messages should have been read while the model calls waited
+    And the channel should have waited for flow control
+    And every message should be answered